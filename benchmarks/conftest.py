@@ -0,0 +1,72 @@
+from configparser import ConfigParser
+
+import pytest
+from IPython import InteractiveShell
+from sql import connection
+from sql.magic import SqlMagic, _set_sql_magic
+
+from jupysql_plugin.connections_file import _config_cache
+from jupysql_plugin.widgets.engines import engines
+
+# number of sections in the generated connections files
+SIZES = [10, 100, 1_000, 10_000]
+
+
+@pytest.fixture(autouse=True)
+def isolate_benchmarks(tmp_path, monkeypatch):
+    """
+    Points the magic to a connections file in a temporary directory and
+    closes the connections opened by the benchmark
+    """
+    sql_magic = SqlMagic(InteractiveShell())
+    sql_magic.dsn_filename = str(tmp_path / "connections.ini")
+    _set_sql_magic(sql_magic)
+
+    monkeypatch.setattr(connection.ConnectionManager, "connections", {})
+    monkeypatch.setattr(connection.ConnectionManager, "current", None)
+
+    yield
+
+    connection.ConnectionManager.close_all()
+    engines.dispose_all()
+    _config_cache.clear()
+
+
+def _write_connections_file(path, n_sections):
+    """
+    Writes a connections file with n_sections sections, a mix of server and
+    file-based databases like the ones a team would store
+    """
+    config = ConfigParser()
+
+    for i in range(n_sections):
+        if i % 2:
+            config[f"postgres-{i}"] = {
+                "drivername": "postgresql",
+                "username": f"user{i}",
+                "password": "secret",
+                "host": f"db{i}.example.com",
+                "port": "5432",
+                "database": f"analytics{i}",
+            }
+        else:
+            config[f"duckdb-{i}"] = {
+                "drivername": "duckdb",
+                "database": f"/data/warehouse{i}.db",
+            }
+
+    with open(path, "w") as f:
+        config.write(f)
+
+
+@pytest.fixture
+def write_connections_file():
+    return _write_connections_file
+
+
+@pytest.fixture(params=SIZES, ids=lambda n: f"{n}-sections")
+def connections_file(request, tmp_path):
+    """Generates a connections file, returns its path and number of sections"""
+    path = tmp_path / "connections.ini"
+    _write_connections_file(path, request.param)
+    return path, request.param
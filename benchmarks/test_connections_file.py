@@ -0,0 +1,69 @@
+"""
+Benchmarks for the operations on the connections file, each one runs on files
+with 10 to 10,000 sections
+"""
+from jupysql_plugin.connections_file import _config_cache
+from jupysql_plugin.widgets.connections import ConnectorWidgetManager
+from jupysql_plugin.widgets.connector_widget import ConnectorWidget
+
+
+def test_get_connections_uncached(benchmark, connections_file):
+    manager = ConnectorWidgetManager()
+
+    connections = benchmark.pedantic(
+        manager.get_connections_from_config_file,
+        setup=_config_cache.clear,
+        rounds=10,
+    )
+
+    assert len(connections) == connections_file[1]
+
+
+def test_get_connections_cached(benchmark, connections_file):
+    manager = ConnectorWidgetManager()
+    manager.get_connections_from_config_file()
+
+    connections = benchmark(manager.get_connections_from_config_file)
+
+    assert len(connections) == connections_file[1]
+
+
+def test_save_connection(benchmark, connections_file, write_connections_file):
+    path, n_sections = connections_file
+    manager = ConnectorWidgetManager()
+
+    def setup():
+        write_connections_file(path, n_sections)
+
+    benchmark.pedantic(
+        manager.save_connection_to_config_file_and_connect,
+        args=({"connectionName": "new", "driver": "duckdb"},),
+        kwargs={"connect": False},
+        setup=setup,
+        rounds=10,
+    )
+
+    assert manager.section_name_already_exists("new")
+
+
+def test_delete_section(benchmark, connections_file, write_connections_file):
+    path, n_sections = connections_file
+    manager = ConnectorWidgetManager()
+
+    def setup():
+        write_connections_file(path, n_sections)
+
+    benchmark.pedantic(
+        manager.delete_section_with_name, args=("duckdb-0",), setup=setup, rounds=10
+    )
+
+    assert not manager.section_name_already_exists("duckdb-0")
+
+
+def test_connector_widget_init(benchmark, connections_file):
+    def setup():
+        _config_cache.clear()
+
+    widget = benchmark.pedantic(ConnectorWidget, setup=setup, rounds=10)
+
+    assert widget.connections_total == connections_file[1]
@@ -0,0 +1,83 @@
+"""
+Benchmarks for full message round trips (the widget handles a message and
+sends the reply) against local DuckDB and SQLite databases
+"""
+import pytest
+
+DATABASES = {
+    "duckdb": {"drivername": "duckdb", "database": "bench.duckdb"},
+    "sqlite": {"drivername": "sqlite", "database": "bench.sqlite"},
+}
+
+
+@pytest.fixture(params=list(DATABASES))
+def widget(request, tmp_path, write_connections_file, recording_widget):
+    path = tmp_path / "connections.ini"
+    write_connections_file(path, 100)
+
+    section = dict(DATABASES[request.param])
+    section["database"] = str(tmp_path / section["database"])
+
+    with open(path, "a") as f:
+        f.write(f"\n[{request.param}]\n")
+        f.writelines(f"{key} = {value}\n" for key, value in section.items())
+
+    class ConnectorWidgetBenchmark(recording_widget):
+        def request(self, content):
+            """Handles a message and waits for the connection attempt (if any)"""
+            self._handle_message(None, content, None)
+            self.wait_for_connection_attempt()
+            return self.messages[-1]
+
+    widget = ConnectorWidgetBenchmark()
+    widget.connect_timeout = None
+    widget.database = request.param
+    widget.database_path = section["database"]
+    return widget
+
+
+def test_connect(benchmark, widget):
+    message = benchmark(
+        widget.request, {"method": "connect", "data": {"name": widget.database}}
+    )
+
+    assert message == {"method": "connected", "message": widget.database}
+
+
+def test_submit_new_connection(benchmark, widget):
+    counter = iter(range(1_000_000))
+
+    def submit():
+        return widget.request(
+            {
+                "method": "submit_new_connection",
+                "data": {
+                    "connectionName": f"new-{next(counter)}",
+                    "driver": widget.database,
+                    "database": widget.database_path,
+                },
+            }
+        )
+
+    message = benchmark.pedantic(submit, rounds=20)
+
+    assert message["method"] == "patch_connections"
+
+
+def test_delete_connection(benchmark, widget):
+    names = iter(f"postgres-{i}" for i in range(1, 100, 2))
+
+    def delete():
+        return widget.request(
+            {"method": "delete_connection", "data": {"name": next(names)}}
+        )
+
+    message = benchmark.pedantic(delete, rounds=20)
+
+    assert message["method"] == "patch_connections"
+
+
+def test_check_config_file(benchmark, widget):
+    message = benchmark(widget.request, {"method": "check_config_file"})
+
+    assert message == {"method": "check_config_file", "message": True}
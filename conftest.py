@@ -0,0 +1,32 @@
+"""
+Fixtures shared by the tests and the benchmarks
+"""
+import pytest
+
+# https://github.com/jupyter-server/pytest-jupyter
+pytest_plugins = ["pytest_jupyter.jupyter_server"]
+
+
+@pytest.fixture
+def recording_widget():
+    """
+    Returns a ConnectorWidget subclass that records the messages sent to the
+    frontend (in widget.messages) instead of sending them
+    """
+    # imported here so the magic is initialized first (tests/conftest.py and
+    # benchmarks/conftest.py do it in an autouse fixture)
+    from jupysql_plugin.widgets.connector_widget import ConnectorWidget
+
+    class ConnectorWidgetRecording(ConnectorWidget):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.messages = []
+
+        def send(self, content, buffers=None):
+            self.messages.append(content)
+
+        def wait_for_connection_attempt(self):
+            if self._connection_attempt is not None:
+                self._connection_attempt.thread.join()
+
+    return ConnectorWidgetRecording
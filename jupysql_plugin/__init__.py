@@ -19,6 +19,9 @@ def _load_jupyter_server_extension(serverapp):
     server_app: jupyterlab.labapp.LabApp
         JupyterLab application instance
     """
+    from jupysql_plugin.handlers import setup_handlers
+
+    setup_handlers(serverapp)
     serverapp.log.info(f"Registered {_module_name} server extension")
 
 
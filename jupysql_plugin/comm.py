@@ -0,0 +1,35 @@
+"""
+Comm targets that the frontend opens in the kernel
+"""
+import importlib
+
+from IPython import get_ipython
+
+# the modules with the handlers are imported when the frontend opens the comm,
+# so registering the targets (when a notebook starts) is cheap
+_COMM_TARGETS = {
+    "jupysql_plugin_completions": "jupysql_plugin.completions",
+    "jupysql_plugin_table_widget": "jupysql_plugin.table_widget",
+}
+
+
+def _get_handler(module_name):
+    def handler(comm, open_msg):
+        module = importlib.import_module(module_name)
+        return module.comm_handler(comm, open_msg)
+
+    return handler
+
+
+def register_comm_targets():
+    """
+    Registers the comm targets in the current kernel. The frontend calls this
+    (with a silent execute request) before opening a comm
+    """
+    ipython = get_ipython()
+
+    if not hasattr(ipython, "kernel"):
+        return
+
+    for target, module_name in _COMM_TARGETS.items():
+        ipython.kernel.comm_manager.register_target(target, _get_handler(module_name))
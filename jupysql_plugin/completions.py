@@ -0,0 +1,281 @@
+"""
+Table and column names for SQL autocompletion. Completion requests are answered
+from an in-memory cache, the database catalog is only queried in the background
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import inspect
+
+try:
+    from sql.connection import ConnectionManager
+except (ModuleNotFoundError, ImportError) as e:
+    raise ModuleNotFoundError(
+        "Your jupysql version isn't compatible with this version of jupysql-plugin. "
+        "Please update: pip install jupysql --upgrade"
+    ) from e
+
+
+def _connection_key(connection):
+    return (connection.alias, connection.url)
+
+
+# backends whose URL without a database (or with :memory:) is an in-memory
+# database. Other backends use a server default (e.g., postgresql://user@host)
+# or a DSN
+_IN_MEMORY_BACKENDS = {"sqlite", "duckdb"}
+
+
+def _split_table_name(table):
+    """
+    Splits a table name into its schema and name (e.g., "schema.table"), the
+    schema is None for tables in the default schema
+    """
+    schema, _, name = table.rpartition(".")
+    return schema or None, name
+
+
+def _is_in_memory(connection):
+    """
+    Returns True if the database lives in memory, since every connection to it
+    gets a different database, it can't be inspected from another thread
+    """
+    url = connection.connection_sqlalchemy.engine.url
+    return url.get_backend_name() in _IN_MEMORY_BACKENDS and url.database in (
+        None,
+        "",
+        ":memory:",
+    )
+
+
+class SchemaCompletionCache:
+    """
+    Caches the table names and the columns of the current connection
+
+    The table list is refreshed every ttl seconds. Refreshes are incremental: the
+    columns of tables that still exist are kept (and reloaded once they expire).
+    Columns are loaded for the tables that completion requests ask for and at
+    most max_tables are kept (least recently used ones are dropped first)
+
+    Parameters
+    ----------
+    max_tables : int
+        Maximum number of tables to keep columns for
+
+    ttl : float
+        Seconds after which table and column names are reloaded
+    """
+
+    def __init__(self, *, max_tables=200, ttl=60):
+        self.max_tables = max_tables
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, key):
+        self._key = key
+        # incremented on every reset so running fills discard their results
+        self._generation = getattr(self, "_generation", 0) + 1
+        self._tables = None
+        self._tables_loaded_at = None
+        self._columns = OrderedDict()
+        self._pending_tables = OrderedDict()
+        self._refresh_tables = False
+        self._worker = None
+        self._deferred = None
+
+    def invalidate(self):
+        """Drops everything, the next completion request starts a new fill"""
+        with self._lock:
+            self._reset(None)
+
+    def get_completions(self, tables=()):
+        """
+        Returns the cached table names and the columns of the requested tables.
+        This never queries the database, missing or expired entries are loaded
+        in the background and returned by subsequent calls
+
+        Parameters
+        ----------
+        tables : list
+            Tables whose columns should be returned (e.g., tables that appear in
+            the query)
+        """
+        connection = ConnectionManager.current
+
+        # only SQLAlchemy connections can be inspected (other ones have no url)
+        if connection is None or connection.url is None:
+            return {"tables": [], "columns": {}, "loading": False}
+
+        key = _connection_key(connection)
+        now = time.monotonic()
+
+        with self._lock:
+            # the user switched to another connection
+            if key != self._key:
+                self._reset(key)
+
+            if self._tables is None or now - self._tables_loaded_at > self.ttl:
+                self._refresh_tables = True
+
+            columns = {}
+
+            for table in tables:
+                entry = self._columns.get(table)
+
+                if entry is not None:
+                    self._columns.move_to_end(table)
+                    columns[table] = entry[1]
+
+                if entry is None or now - entry[0] > self.ttl:
+                    self._pending_tables[table] = None
+
+            loading = self._refresh_tables or bool(self._pending_tables)
+            result = {
+                "tables": list(self._tables or []),
+                "columns": columns,
+                "loading": loading,
+            }
+
+            if loading:
+                self._start_fill(connection)
+
+        return result
+
+    def _start_fill(self, connection):
+        # must be called with the lock held
+        if self._worker is not None or self._deferred is not None:
+            return
+
+        if _is_in_memory(connection):
+            # the fill must use the same connection as the user, so it runs in the
+            # kernel thread once the completion reply is sent (see run_deferred)
+            self._deferred = connection
+            return
+
+        self._worker = threading.Thread(
+            target=self._fill,
+            args=(connection.connection_sqlalchemy.engine, self._generation),
+            daemon=True,
+        )
+        self._worker.start()
+
+    def run_deferred(self):
+        """Runs a fill that couldn't run in a background thread (if any)"""
+        with self._lock:
+            connection, self._deferred = self._deferred, None
+
+            if connection is None:
+                return
+
+            generation = self._generation
+
+        self._fill(connection.connection_sqlalchemy, generation, background=False)
+
+    def wait(self, timeout=None):
+        """Waits for the background fill to finish"""
+        worker = self._worker
+
+        if worker is not None:
+            worker.join(timeout)
+
+    def _fill(self, bind, generation, *, background=True):
+        try:
+            inspector = inspect(bind)
+
+            while True:
+                with self._lock:
+                    refresh_tables = self._refresh_tables
+                    pending = list(self._pending_tables)
+
+                    if generation != self._generation or not (
+                        refresh_tables or pending
+                    ):
+                        self._finish_fill(background)
+                        return
+
+                    self._refresh_tables = False
+                    self._pending_tables.clear()
+
+                if refresh_tables:
+                    tables = sorted(inspector.get_table_names())
+                    tables += sorted(inspector.get_view_names())
+                    self._store_tables(generation, tables)
+
+                for table in pending:
+                    schema, name = _split_table_name(table)
+
+                    try:
+                        columns = [
+                            c["name"]
+                            for c in inspector.get_columns(name, schema=schema)
+                        ]
+                    except Exception:
+                        # not a table (e.g., a typo or a CTE name)
+                        columns = []
+
+                    self._store_columns(generation, table, columns)
+        except Exception:
+            # completions are best-effort, we'll try again once the entries expire
+            with self._lock:
+                if generation == self._generation:
+                    self._tables = self._tables or []
+                    self._tables_loaded_at = time.monotonic()
+
+                self._finish_fill(background)
+
+    def _finish_fill(self, background):
+        # must be called with the lock held, a fill from a previous generation
+        # must not clear the worker of the current one
+        if background and self._worker is threading.current_thread():
+            self._worker = None
+
+    def _store_tables(self, generation, tables):
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            # keep the columns of the tables that still exist. The table list only
+            # has the default schema, tables in other schemas expire instead
+            existing = set(tables)
+            dropped = [
+                table
+                for table in self._columns
+                if _split_table_name(table)[0] is None and table not in existing
+            ]
+
+            for table in dropped:
+                del self._columns[table]
+
+            self._tables = tables
+            self._tables_loaded_at = time.monotonic()
+
+    def _store_columns(self, generation, table, columns):
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            self._columns[table] = (time.monotonic(), columns)
+            self._columns.move_to_end(table)
+
+            while len(self._columns) > self.max_tables:
+                self._columns.popitem(last=False)
+
+
+completion_cache = SchemaCompletionCache()
+
+
+def comm_handler(comm, open_msg):
+    """
+    Handles completion requests from the frontend. Messages look like
+    {"id": ..., "tables": [...]} and the reply contains the same id
+    """
+
+    @comm.on_msg
+    def _recv(msg):
+        data = msg["content"]["data"]
+        completions = completion_cache.get_completions(data.get("tables", []))
+        comm.send({"id": data.get("id"), **completions})
+        completion_cache.run_deferred()
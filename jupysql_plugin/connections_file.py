@@ -0,0 +1,358 @@
+"""
+Reading and updating connections files (INI format). This module doesn't depend
+on jupysql so it can be used by the server extension
+"""
+import os
+import stat
+import threading
+import uuid
+from configparser import ConfigParser
+from contextlib import contextmanager
+from pathlib import Path
+
+from jupysql_plugin.instrumentation import instrumentation
+
+try:
+    import fcntl
+except ModuleNotFoundError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+
+class _ConfigFileCache:
+    """
+    Process-wide cache of parsed connections files. Entries are keyed by the
+    absolute path and validated against the file's (mtime, size, inode), so a
+    cache hit costs a single ``stat`` call instead of a full parse
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stat_key(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def get(self, path) -> ConfigParser:
+        """
+        Returns the parsed config file, re-reading it only if it changed since
+        the last call. The returned object is shared and must not be modified
+        """
+        return self.get_with_state(path)[1]
+
+    def get_with_state(self, path):
+        """
+        Like get, but also returns the (mtime, size, inode) tuple of the file
+        that was parsed (None if the file doesn't exist)
+        """
+        path = os.path.abspath(path)
+        key = self._stat_key(path)
+
+        with self._lock:
+            entry = self._entries.get(path)
+
+            if entry is not None and entry[0] == key:
+                return entry
+
+        config = self.load(path)
+
+        with self._lock:
+            self._entries[path] = (key, config)
+
+        return key, config
+
+    @instrumentation.timed("connections_file.parse")
+    def load(self, path) -> ConfigParser:
+        """
+        Parses the config file, bypassing the cache. The returned object
+        is not shared so it's safe to modify
+        """
+        config = ConfigParser()
+        config.read(path)
+        return config
+
+    def put(self, path, config):
+        """
+        Stores a config that has just been written to disk so the next read
+        doesn't have to parse the file again
+        """
+        path = os.path.abspath(path)
+        key = self._stat_key(path)
+
+        with self._lock:
+            self._entries[path] = (key, config)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_config_cache = _ConfigFileCache()
+
+
+@contextmanager
+def _lock_config_file(path):
+    """
+    Takes an exclusive advisory lock on a sidecar file next to the config file.
+    The lock lives in a separate file because the config file itself is
+    replaced on every write
+    """
+    with open(f"{path}.lock", "a") as lock_file:
+        fd = lock_file.fileno()
+
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            # LK_LOCK gives up after ~10 seconds so we keep retrying
+            while True:
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                except OSError:
+                    continue
+                else:
+                    break
+
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def _replace_config_file(path, config):
+    """
+    Writes the config to a temporary file in the same directory and atomically
+    renames it into place so readers never see a partially written file. The
+    new file keeps the permissions (and, where allowed, the owner) of the one
+    it replaces, new files get the default permissions (umask)
+    """
+    try:
+        original = os.stat(path)
+    except FileNotFoundError:
+        original = None
+
+    # unlike tempfile.mkstemp (which always uses 0600), os.open applies the umask
+    tmp_path = path.parent / f".{path.name}.{uuid.uuid4().hex}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+
+    try:
+        with os.fdopen(fd, "w") as tmp_file:
+            if original is not None:
+                _copy_permissions(tmp_file.fileno(), original)
+
+            config.write(tmp_file)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+
+        raise
+
+
+def _copy_permissions(fd, original):
+    """
+    Sets the mode, owner and group of the file descriptor to the ones in
+    original (an os.stat_result). Changing the owner usually requires root, so
+    the group and then nothing are tried if it fails
+    """
+    if hasattr(os, "fchmod"):
+        os.fchmod(fd, stat.S_IMODE(original.st_mode))
+
+    if not hasattr(os, "fchown"):
+        return
+
+    for uid in (original.st_uid, -1):
+        try:
+            os.fchown(fd, uid, original.st_gid)
+            return
+        except PermissionError:
+            pass
+
+
+class ConnectionsFile:
+    """
+    A connections file. Reads go through a process-wide cache and writes are
+    atomic and protected by a lock
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        Path to the connections file
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+
+    def exists(self) -> bool:
+        """Returns True if the file exists, False otherwise"""
+        return Path(self.path).is_file()
+
+    def get_config(self) -> ConfigParser:
+        """
+        Returns the parsed file. The object is cached and shared across the
+        process so it must not be modified, use update to modify the file
+        """
+        return _config_cache.get(self.path)
+
+    def get_connections(self) -> list:
+        """
+        Return the list of connections (dictionaries) in the file
+        """
+        return self.get_connections_with_state()[1]
+
+    def get_connections_with_state(self):
+        """
+        Returns the state of the file ((mtime, size, inode) or None if it doesn't
+        exist) and the list of connections it contains
+        """
+        state, config = _config_cache.get_with_state(self.path)
+        connections = [
+            _config_section_to_dict(config, section) for section in config.sections()
+        ]
+        return state, connections
+
+    def list_connections(self, query="", offset=0, limit=100):
+        """
+        Returns the connections whose name or driver contains query (case
+        insensitive) from offset to offset + limit and the number of matches.
+        Only the returned sections are converted to dictionaries
+        """
+        config = _config_cache.get(self.path)
+        sections = config.sections()
+        query = query.lower()
+
+        if query:
+
+            def matches(section):
+                driver = config.get(section, "drivername", raw=True, fallback="")
+                return query in section.lower() or query in driver.lower()
+
+            sections = [section for section in sections if matches(section)]
+
+        page = sections[offset : offset + limit]
+        connections = [_config_section_to_dict(config, section) for section in page]
+        return connections, len(sections)
+
+    def get_connection(self, name):
+        """
+        Returns the connection with the given name or None if there isn't one
+        """
+        config = self.get_config()
+
+        if not config.has_section(name):
+            return None
+
+        return _config_section_to_dict(config, name)
+
+    def get_state(self):
+        """
+        Returns (mtime, size, inode) of the file or None if it doesn't exist
+        """
+        return _ConfigFileCache._stat_key(self.path)
+
+    def _get_real_path(self):
+        # resolve symlinks so we replace the target instead of the link
+        real_path = Path(os.path.realpath(self.path))
+        real_path.parent.mkdir(parents=True, exist_ok=True)
+        return real_path
+
+    @contextmanager
+    def lock(self):
+        """
+        Holds the lock that update takes and yields the current contents of the
+        file (e.g., to update a file that depends on this one), update must not
+        be called while holding it
+        """
+        real_path = self._get_real_path()
+
+        with _lock_config_file(real_path):
+            yield _config_cache.load(real_path)
+
+    def update(self, update, *, after_write=None):
+        """
+        Reads the file, calls update(config) to modify it and writes it back. The
+        whole read-modify-write cycle happens while holding a lock so concurrent
+        updates from other processes are merged instead of lost. If passed,
+        after_write(config) is called once the file is written, still holding
+        the lock
+        """
+        real_path = self._get_real_path()
+
+        with _lock_config_file(real_path):
+            config = _config_cache.load(real_path)
+            update(config)
+            _replace_config_file(real_path, config)
+            _config_cache.put(self.path, config)
+
+            if after_write is not None:
+                after_write(config)
+
+    def delete(self, name):
+        """Deletes the connection with the given name"""
+        self.update(lambda config: config.remove_section(name))
+
+
+def _config_section_to_dict(config, section):
+    return _section_to_connection(section, config.items(section))
+
+
+def _section_to_connection(name, items):
+    """
+    Converts the (key, value) pairs of a section to the dictionary the widgets
+    use: drivername is renamed to driver and the name is added
+    """
+    d = dict(items)
+    d["name"] = name
+
+    if "drivername" in d:
+        d["driver"] = d.pop("drivername")
+
+    return d
+
+
+def _diff_connections(old, new):
+    """
+    Compares two lists of connections (as returned by
+    get_connections_from_config_file) by name and returns the connections that
+    were added, the names of the ones that were removed and the connections whose
+    details changed
+    """
+    old_by_name = {connection["name"]: connection for connection in old}
+    new_names = {connection["name"] for connection in new}
+
+    added = [c for c in new if c["name"] not in old_by_name]
+    changed = [
+        c for c in new if c["name"] in old_by_name and old_by_name[c["name"]] != c
+    ]
+    removed = [c["name"] for c in old if c["name"] not in new_names]
+
+    return {"added": added, "removed": removed, "changed": changed}
+
+
+def _apply_patch(connections, patch):
+    """
+    Applies a patch returned by _diff_connections to a list of connections:
+    removed connections are dropped, changed ones are replaced in place and
+    added ones are appended
+    """
+    removed = set(patch["removed"])
+    replaced = {c["name"]: c for c in patch["changed"] + patch["added"]}
+
+    result = [
+        replaced.pop(c["name"], c) for c in connections if c["name"] not in removed
+    ]
+    return result + list(replaced.values())
@@ -0,0 +1,151 @@
+"""
+In-memory index of the stored connections kept by the server extension. A
+watcher checks the store's state and, when it changes, reads it once and pushes
+the added, removed and changed connections to the subscribers (the frontends,
+which forward them to their kernels), so open notebooks don't have to re-read
+the connections or reload to see new ones
+"""
+import os
+import threading
+
+from tornado.ioloop import IOLoop, PeriodicCallback
+
+from jupysql_plugin.connections_file import _diff_connections
+
+
+class ConnectionsIndex:
+    """
+    The connections in a store, indexed by name
+
+    Parameters
+    ----------
+    store : jupysql_plugin.stores.ConnectionStore
+        The store to index
+
+    poll_interval : float
+        Seconds between checks of the store's state (e.g., a stat call on the
+        connections file) while there are subscribers
+    """
+
+    def __init__(self, store, *, poll_interval=1.0):
+        self.store = store
+        self.poll_interval = poll_interval
+
+        # incremented every time the connections change
+        self.version = 0
+
+        self._state = None
+        self._loaded = False
+        self._connections = []
+        self._by_name = {}
+        self._lock = threading.Lock()
+
+        self._subscribers = []
+        self._watcher = None
+
+    @property
+    def path(self):
+        """Absolute path to the store (e.g., the connections file)"""
+        return os.path.abspath(self.store.path)
+
+    def refresh(self):
+        """
+        Re-reads the store if its state changed. Returns the change event (the
+        patch, the versions it goes from and to, and the number of connections)
+        or None if the connections didn't change. This blocks, use check from
+        the event loop
+        """
+        with self._lock:
+            state = self.store.get_state()
+
+            if self._loaded and state == self._state:
+                return None
+
+            # if the store changes after reading the state, the next refresh
+            # reads it again
+            connections = self.store.get_connections()
+            patch = _diff_connections(self._connections, connections)
+            loaded = self._loaded
+
+            self._state = state
+            self._loaded = True
+            self._connections = connections
+            self._by_name = {c["name"]: c for c in connections}
+
+            # the first read and writes that don't change anything (e.g., the
+            # file was touched) aren't events
+            if not loaded or not any(patch.values()):
+                return None
+
+            self.version += 1
+
+            return {
+                **patch,
+                "from_version": self.version - 1,
+                "version": self.version,
+                "total": len(connections),
+                "path": self.path,
+            }
+
+    async def check(self):
+        """
+        Refreshes the index outside of the event loop and notifies the
+        subscribers if the connections changed
+        """
+        event = await IOLoop.current().run_in_executor(None, self.refresh)
+
+        if event is not None:
+            self.publish(event)
+
+        return event
+
+    def get_connections_with_state(self):
+        """
+        Returns the state of the store the index was built from and the list of
+        connections (call check first to make sure it's up to date)
+        """
+        with self._lock:
+            return self._state, list(self._connections)
+
+    def get_connection(self, name):
+        """Returns the connection with the given name or None"""
+        return self._by_name.get(name)
+
+    def get_snapshot(self):
+        """Returns the current version, number of connections and path"""
+        with self._lock:
+            return {
+                "version": self.version,
+                "total": len(self._connections),
+                "path": self.path,
+            }
+
+    def subscribe(self, callback):
+        """
+        Calls callback(event) (in the event loop) every time the connections
+        change. The watcher runs while there are subscribers
+        """
+        self._subscribers.append(callback)
+
+        if self._watcher is None:
+            self._watcher = PeriodicCallback(self.check, self.poll_interval * 1000)
+            self._watcher.start()
+
+    def unsubscribe(self, callback):
+        """Stops notifying callback"""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+        if not self._subscribers and self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def publish(self, event):
+        """Sends an event to every subscriber"""
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception:
+                # a subscriber that went away shouldn't prevent the others from
+                # being notified
+                self.unsubscribe(callback)
@@ -0,0 +1,424 @@
+"""
+Credential providers for stored connections. A section can name a provider
+instead of storing a password, for example:
+
+    [warehouse]
+    drivername = redshift+redshift_connector
+    username = analyst
+    host = example.redshift.amazonaws.com
+    credentials = command:get-redshift-token --cluster example
+    credentials_ttl = 900
+
+JupySQL passes every key in a section to URL.create, so the INI store keeps
+credentials and credentials_ttl in a file next to the connections file (see
+stores.INIConnectionStore)
+
+Credentials are fetched when connecting (not when listing connections), cached
+until they expire and refreshed in a background thread shortly before, so
+connecting doesn't wait for the provider and tokens aren't requested on every
+connect. Engines get the current password each time they open a connection
+
+command: providers run whatever the connections file says, so they're disabled
+unless credential_cache.configure(allow_commands=True) is called or the
+JUPYSQL_PLUGIN_ALLOW_CREDENTIAL_COMMANDS environment variable is set to 1
+"""
+import json
+import os
+import shlex
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+from jupysql_plugin import exceptions
+
+# section keys that configure the provider (they're not passed to URL.create)
+CREDENTIAL_KEYS = ("credentials", "credentials_ttl")
+
+
+class Credentials:
+    """
+    Credentials returned by a provider
+
+    Parameters
+    ----------
+    password : str
+        Password or token
+
+    username : str, optional
+        Overrides the username in the section (e.g., the provider issues
+        temporary users)
+
+    expires_in : float, optional
+        Seconds until the credentials expire, defaults to the section's
+        credentials_ttl
+    """
+
+    def __init__(self, password, username=None, expires_in=None):
+        self.password = password
+        self.username = username
+        self.expires_in = expires_in
+
+    def __repr__(self):
+        # don't show the password in tracebacks
+        return f"Credentials(username={self.username!r}, password='***')"
+
+
+class EnvProvider:
+    """Reads the password from an environment variable: env:VARIABLE"""
+
+    def __init__(self, argument, username=None):
+        self.variable = argument
+
+    def fetch(self):
+        value = os.environ.get(self.variable)
+
+        if value is None:
+            raise ValueError(f"The environment variable {self.variable} isn't set")
+
+        return Credentials(value)
+
+
+class CommandProvider:
+    """
+    Runs a command and reads the password from its output: command:COMMAND.
+    If the output is a JSON object, it's read from the "password" (or "token")
+    key and the optional "username" and "expires_in" keys are used too. Since
+    anyone who can write the connections file chooses the command, it's
+    disabled unless the cache's allow_commands setting is enabled
+    """
+
+    timeout = 30
+    runs_commands = True
+
+    def __init__(self, argument, username=None):
+        self.command = argument
+
+    def fetch(self):
+        try:
+            result = subprocess.run(
+                shlex.split(self.command),
+                capture_output=True,
+                text=True,
+                timeout=self.timeout,
+            )
+        except subprocess.TimeoutExpired:
+            raise ValueError(f"The command timed out after {self.timeout} seconds")
+
+        if result.returncode:
+            raise ValueError(
+                f"The command exited with code {result.returncode}: "
+                f"{result.stderr.strip()}"
+            )
+
+        output = result.stdout.strip()
+
+        try:
+            data = json.loads(output)
+        except ValueError:
+            data = None
+
+        if not isinstance(data, dict):
+            return Credentials(output)
+
+        password = data.get("password", data.get("token"))
+
+        if password is None:
+            raise ValueError("The command output doesn't have a password or token")
+
+        return Credentials(
+            password,
+            username=data.get("username"),
+            expires_in=data.get("expires_in"),
+        )
+
+
+class KeyringProvider:
+    """
+    Reads the password for the section's username from the system keyring:
+    keyring:SERVICE (requires the keyring package)
+    """
+
+    def __init__(self, argument, username=None):
+        self.service = argument
+        self.username = username
+
+    def fetch(self):
+        try:
+            import keyring
+        except ModuleNotFoundError as e:
+            raise ModuleNotFoundError(
+                "The keyring credentials provider requires keyring. "
+                "Please install it: pip install keyring"
+            ) from e
+
+        password = keyring.get_password(self.service, self.username)
+
+        if password is None:
+            raise ValueError(
+                f"There's no password for {self.username!r} "
+                f"in the keyring service {self.service!r}"
+            )
+
+        return Credentials(password)
+
+
+PROVIDERS = {
+    "env": EnvProvider,
+    "command": CommandProvider,
+    "keyring": KeyringProvider,
+}
+
+
+def register_provider(kind, provider):
+    """
+    Registers a provider class: provider(argument, username) must return an
+    object whose fetch() method returns Credentials. Providers that run
+    commands named in the connections file must set runs_commands = True so
+    they're only used if the cache's allow_commands setting is enabled
+    """
+    PROVIDERS[kind] = provider
+
+
+def get_provider(spec, username=None):
+    """Returns the provider for a spec such as env:VARIABLE"""
+    kind, _, argument = spec.partition(":")
+    provider = PROVIDERS.get(kind.strip())
+
+    if provider is None or not argument.strip():
+        raise ValueError(
+            f"Invalid credentials provider {spec!r}, expected one of: "
+            + ", ".join(f"{kind}:..." for kind in PROVIDERS)
+        )
+
+    return provider(argument.strip(), username)
+
+
+class _Entry:
+    def __init__(self, credentials, expires_at):
+        self.credentials = credentials
+        self.expires_at = expires_at
+        self.used = False
+        self.timer = None
+
+
+class CredentialCache:
+    """
+    Caches the credentials returned by the providers until they expire.
+    Credentials that were used since they were fetched are fetched again in a
+    background thread refresh_ahead seconds before they expire, so requests
+    don't wait for the provider while connections are in use
+
+    Parameters
+    ----------
+    default_ttl : float
+        Seconds the credentials are valid if the section doesn't set
+        credentials_ttl and the provider doesn't say when they expire
+
+    refresh_ahead : float
+        Seconds before the expiration to refresh the credentials (at most half
+        of their lifetime)
+
+    allow_commands : bool
+        Whether providers that run commands (command:COMMAND) can be used
+    """
+
+    def __init__(self, *, default_ttl=900, refresh_ahead=60, allow_commands=False):
+        self.default_ttl = default_ttl
+        self.refresh_ahead = refresh_ahead
+        self.allow_commands = allow_commands
+
+        self._entries = {}
+        self._lock = threading.Lock()
+        # one lock (and the number of threads using it) per provider being
+        # fetched, so slow providers don't block each other
+        self._fetch_locks = {}
+
+    def configure(self, **settings):
+        """Updates default_ttl, refresh_ahead and/or allow_commands"""
+        unknown = set(settings) - {"default_ttl", "refresh_ahead", "allow_commands"}
+
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+
+        for key, value in settings.items():
+            setattr(self, key, value)
+
+    def get(self, spec, *, username=None, ttl=None):
+        """
+        Returns the credentials of the provider spec (e.g., env:VARIABLE),
+        fetching them if they aren't cached or expired
+
+        Raises
+        ------
+        CredentialsUnavailable
+            If the provider fails
+        """
+        key = (spec, username)
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is not None and time.monotonic() < entry.expires_at:
+                entry.used = True
+                return entry.credentials
+
+        # concurrent callers wait for a single fetch
+        with self._fetch_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+
+                if entry is not None and time.monotonic() < entry.expires_at:
+                    entry.used = True
+                    return entry.credentials
+
+            return self._fetch(key, ttl).credentials
+
+    @contextmanager
+    def _fetch_lock(self, key):
+        """
+        Holds the fetch lock of key, it's deleted when no thread is using it so
+        locks don't accumulate
+        """
+        with self._lock:
+            lock, users = self._fetch_locks.get(key, (None, 0))
+            lock = lock or threading.Lock()
+            self._fetch_locks[key] = (lock, users + 1)
+
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, users = self._fetch_locks[key]
+
+                if users == 1:
+                    del self._fetch_locks[key]
+                else:
+                    self._fetch_locks[key] = (lock, users - 1)
+
+    def _fetch(self, key, ttl):
+        spec, username = key
+
+        try:
+            provider = get_provider(spec, username)
+
+            if getattr(provider, "runs_commands", False) and not self.allow_commands:
+                raise ValueError(
+                    "Providers that run commands are disabled, enable them with "
+                    "credential_cache.configure(allow_commands=True) or by setting "
+                    "the JUPYSQL_PLUGIN_ALLOW_CREDENTIAL_COMMANDS environment "
+                    "variable to 1"
+                )
+
+            credentials = provider.fetch()
+        except Exception as e:
+            raise exceptions.CredentialsUnavailable(
+                spec, f"{type(e).__name__}: {e}"
+            ) from e
+
+        lifetime = credentials.expires_in
+
+        if lifetime is None:
+            lifetime = self.default_ttl if ttl is None else ttl
+
+        lifetime = float(lifetime)
+        entry = _Entry(credentials, time.monotonic() + lifetime)
+
+        if lifetime > 0:
+            delay = lifetime - min(self.refresh_ahead, lifetime / 2)
+            entry.timer = threading.Timer(delay, self._refresh, (key, ttl, entry))
+            entry.timer.daemon = True
+
+        with self._lock:
+            previous = self._entries.get(key)
+            self._entries[key] = entry
+
+        if previous is not None and previous.timer is not None:
+            previous.timer.cancel()
+
+        if entry.timer is not None:
+            entry.timer.start()
+
+        return entry
+
+    def _refresh(self, key, ttl, entry):
+        with self._lock:
+            # the credentials were replaced or haven't been used, they're
+            # fetched on demand if they're needed again
+            if self._entries.get(key) is not entry or not entry.used:
+                return
+
+        with self._fetch_lock(key):
+            try:
+                self._fetch(key, ttl)
+            except exceptions.CredentialsUnavailable:
+                # the current credentials are still valid, the next request
+                # after they expire retries and reports the error
+                pass
+
+    def invalidate(self, spec=None):
+        """Discards the cached credentials of spec (or all of them)"""
+        with self._lock:
+            keys = [key for key in self._entries if spec is None or key[0] == spec]
+            entries = [self._entries.pop(key) for key in keys]
+
+        for entry in entries:
+            if entry.timer is not None:
+                entry.timer.cancel()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+credential_cache = CredentialCache(
+    allow_commands=os.environ.get("JUPYSQL_PLUGIN_ALLOW_CREDENTIAL_COMMANDS", "") == "1"
+)
+
+
+class CredentialSource:
+    """
+    The provider of a stored connection. Calling it returns the current
+    credentials from the cache
+    """
+
+    def __init__(self, spec, *, username=None, ttl=None, cache=None):
+        self.spec = spec
+        self.username = username
+        self.ttl = ttl
+        self.cache = cache
+
+    def __call__(self):
+        cache = self.cache or credential_cache
+        return cache.get(self.spec, username=self.username, ttl=self.ttl)
+
+    def apply(self, url):
+        """
+        Returns the sqlalchemy.engine.URL with the current password (and
+        username, if the provider returns one)
+        """
+        credentials = self()
+        return url.set(
+            username=credentials.username or url.username,
+            password=credentials.password,
+        )
+
+
+def split_credentials(section):
+    """
+    Splits a section into the arguments for URL.create and its credentials
+    source (None if it doesn't name a provider)
+    """
+    url_args = {k: v for k, v in section.items() if k not in CREDENTIAL_KEYS}
+    spec = section.get("credentials")
+
+    if not spec:
+        return url_args, None
+
+    ttl = section.get("credentials_ttl")
+    source = CredentialSource(
+        spec,
+        username=url_args.get("username"),
+        ttl=None if ttl is None else float(ttl),
+    )
+    return url_args, source
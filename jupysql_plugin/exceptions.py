@@ -10,3 +10,40 @@ class ConnectionWithNameAlreadyExists(Exception):
             f"A connection named {name!r} already exists in your connections file"
         )
         super().__init__(self.message)
+
+
+class ConnectionCancelled(Exception):
+    """
+    Raised when a connection attempt is abandoned because the user cancelled it
+    or because it timed out
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.message = f"Connection to {name!r} was cancelled"
+        super().__init__(self.message)
+
+
+class CredentialsUnavailable(Exception):
+    """
+    Raised when the credentials provider of a connection fails (e.g., the
+    environment variable isn't set or the command failed)
+    """
+
+    def __init__(self, spec, reason):
+        self.spec = spec
+        self.message = f"Couldn't get the credentials from {spec!r}: {reason}"
+        super().__init__(self.message)
+
+
+class PreflightCheckFailed(Exception):
+    """
+    Raised when a quick check that runs before connecting fails (the driver
+    can't be imported, the host doesn't resolve or the port doesn't accept
+    connections)
+    """
+
+    def __init__(self, check, message):
+        self.check = check
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,285 @@
+"""
+REST API to manage the stored connections from the frontend without a kernel
+and a WebSocket that pushes changes to them. Connections are read and written
+through the configured store (see jupysql_plugin.stores)
+"""
+import hashlib
+import json
+
+import tornado
+from jupyter_server.base.handlers import APIHandler, JupyterHandler
+from jupyter_server.utils import url_path_join
+from tornado import websocket
+from tornado.ioloop import IOLoop
+from traitlets import Enum, Float, Unicode
+from traitlets.config import Configurable
+
+try:
+    # older versions of jupyter_server don't have a WebSocket specific decorator
+    from jupyter_server.auth.decorator import ws_authenticated
+except ImportError:
+    ws_authenticated = tornado.web.authenticated
+
+from jupysql_plugin.connections_index import ConnectionsIndex
+from jupysql_plugin.stores import StoreRegistry
+
+# keys that can be stored in a connection: URL.create arguments and the
+# credentials provider (see jupysql_plugin.credentials)
+_CONNECTION_KEYS = {
+    "driver",
+    "username",
+    "password",
+    "host",
+    "port",
+    "database",
+    "query",
+    "credentials",
+    "credentials_ttl",
+}
+
+# keys returned when reading a connection that aren't stored (the name is the
+# one in the URL), they're ignored so a connection can be read, edited and saved
+_READ_ONLY_KEYS = {"name"}
+
+# keys kept from the stored connection if a request doesn't have them (they
+# aren't shown in the connector widget's form), pass null to delete them
+_PRESERVED_KEYS = {"query", "credentials", "credentials_ttl"}
+
+
+class JupySQLPlugin(Configurable):
+    """Server extension settings"""
+
+    dsn_filename = Unicode(
+        "~/.jupysql/connections.ini",
+        config=True,
+        help="Path to the connections file, it should match SqlMagic.dsn_filename",
+    )
+
+    store_backend = Enum(
+        StoreRegistry.BACKENDS,
+        default_value="ini",
+        config=True,
+        help="Where the connections are stored, it should match the backend "
+        "selected in the kernel with jupysql_plugin.stores.stores.configure",
+    )
+
+    sqlite_path = Unicode(
+        None,
+        allow_none=True,
+        config=True,
+        help="Path to the SQLite database when store_backend is 'sqlite', "
+        "defaults to dsn_filename with the .sqlite extension",
+    )
+
+    poll_interval = Float(
+        1.0,
+        config=True,
+        help="Seconds between checks for changes in the connections while "
+        "there are open notebooks or panels listening for them",
+    )
+
+
+def _etag(state):
+    """Computes an ETag from the state of the store (see ConnectionStore.get_state)"""
+    return '"' + hashlib.sha1(repr(state).encode()).hexdigest() + '"'
+
+
+class _ConnectionsStoreHandler(APIHandler):
+    def initialize(self, store, index):
+        self.store = store
+        self.index = index
+
+    async def _run(self, fn, *args):
+        """Runs blocking store operations outside of the event loop"""
+        return await IOLoop.current().run_in_executor(None, fn, *args)
+
+    async def _set_etag(self):
+        """
+        Sets the ETag header from the store state and returns True if it matches
+        the If-None-Match header (so the request can be answered with a 304)
+        """
+        state = await self._run(self.store.get_state)
+        self.set_header("Etag", _etag(state))
+        return self.check_etag_header()
+
+    async def _check_if_match(self):
+        """
+        Returns False (and sends a 412) if the request has an If-Match header that
+        doesn't match the current state of the store
+        """
+        if_match = self.request.headers.get("If-Match")
+
+        if if_match is None or if_match == "*":
+            return True
+
+        state = await self._run(self.store.get_state)
+
+        if _etag(state) not in (tag.strip() for tag in if_match.split(",")):
+            self.set_status(412)
+            self.finish(json.dumps({"message": "The connections have changed"}))
+            return False
+
+        return True
+
+
+class ConnectionsHandler(_ConnectionsStoreHandler):
+    """Lists the stored connections"""
+
+    @tornado.web.authenticated
+    async def get(self):
+        if await self._set_etag():
+            self.set_status(304)
+            self.finish()
+            return
+
+        # the index is shared by all requests so the store is read once per change
+        await self.index.check()
+        state, connections = self.index.get_connections_with_state()
+
+        # the store might have changed since we computed the ETag
+        self.set_header("Etag", _etag(state))
+        self.finish(json.dumps({"connections": connections}))
+
+
+class ConnectionHandler(_ConnectionsStoreHandler):
+    """Reads, stores and deletes a connection"""
+
+    @tornado.web.authenticated
+    async def get(self, name):
+        if await self._set_etag():
+            self.set_status(304)
+            self.finish()
+            return
+
+        await self.index.check()
+        connection = self.index.get_connection(name)
+
+        if connection is None:
+            raise tornado.web.HTTPError(404, f"Connection {name!r} not found")
+
+        self.finish(json.dumps(connection))
+
+    @tornado.web.authenticated
+    async def put(self, name):
+        data = self.get_json_body() or {}
+        data = {k: v for k, v in data.items() if k not in _READ_ONLY_KEYS}
+        unknown = set(data) - _CONNECTION_KEYS
+
+        if unknown:
+            raise tornado.web.HTTPError(
+                400, f"Unknown connection keys: {', '.join(sorted(unknown))}"
+            )
+
+        if not data.get("driver"):
+            raise tornado.web.HTTPError(400, "Missing connection key: driver")
+
+        if not await self._check_if_match():
+            return
+
+        section = {k: str(v) for k, v in data.items() if v and k != "driver"}
+        section["drivername"] = data["driver"]
+
+        def save():
+            stored = self.store.get_section(name) or {}
+
+            for key in _PRESERVED_KEYS - set(data):
+                if key in stored:
+                    section[key] = stored[key]
+
+            self.store.save(name, section, replace=name)
+
+        await self._run(save)
+        await self._set_etag()
+
+        # subscribers are notified right away instead of on the next check
+        await self.index.check()
+        self.finish(json.dumps(self.index.get_connection(name)))
+
+    @tornado.web.authenticated
+    async def delete(self, name):
+        if not await self._check_if_match():
+            return
+
+        def delete():
+            if not self.store.has_connection(name):
+                raise KeyError(name)
+
+            self.store.delete(name)
+
+        try:
+            await self._run(delete)
+        except KeyError:
+            raise tornado.web.HTTPError(404, f"Connection {name!r} not found")
+
+        await self._set_etag()
+        await self.index.check()
+        self.set_status(204)
+        self.finish()
+
+
+class ConnectionsEventsHandler(JupyterHandler, websocket.WebSocketHandler):
+    """
+    Pushes the changes to the stored connections. Clients receive a
+    connections_snapshot message with the current version when they connect and
+    a connections_changed message (see ConnectionsIndex.refresh) every time the
+    connections change
+    """
+
+    def initialize(self, store, index):
+        self.index = index
+
+    @ws_authenticated
+    async def get(self, *args, **kwargs):
+        await self.index.check()
+        result = super().get(*args, **kwargs)
+
+        if result is not None:
+            await result
+
+    def open(self):
+        self.index.subscribe(self.send_event)
+        self.write_message(
+            json.dumps(
+                {
+                    "method": "connections_snapshot",
+                    "message": self.index.get_snapshot(),
+                }
+            )
+        )
+
+    def send_event(self, event):
+        # raises WebSocketClosedError if the client went away without closing
+        # the socket, the index unsubscribes us
+        self.write_message(
+            json.dumps({"method": "connections_changed", "message": event})
+        )
+
+    def on_close(self):
+        self.index.unsubscribe(self.send_event)
+
+
+def setup_handlers(serverapp):
+    """Registers the REST API handlers"""
+    settings = JupySQLPlugin(config=serverapp.config)
+    registry = StoreRegistry(
+        backend=settings.store_backend, sqlite_path=settings.sqlite_path
+    )
+    store = registry.get(settings.dsn_filename)
+    index = ConnectionsIndex(store, poll_interval=settings.poll_interval)
+    kwargs = {"store": store, "index": index}
+
+    web_app = serverapp.web_app
+    base_url = url_path_join(web_app.settings["base_url"], "jupysql-plugin")
+
+    web_app.add_handlers(
+        ".*$",
+        [
+            (url_path_join(base_url, "connections"), ConnectionsHandler, kwargs),
+            (url_path_join(base_url, "events"), ConnectionsEventsHandler, kwargs),
+            (
+                url_path_join(base_url, "connections", "([^/]+)"),
+                ConnectionHandler,
+                kwargs,
+            ),
+        ],
+    )
@@ -0,0 +1,195 @@
+"""
+Optional timing instrumentation for the widgets. When enabled, operations record
+counters and latency histograms (see get_stats) and emit OpenTelemetry spans if
+a tracer provider is configured. It's disabled by default and spans are then a
+shared no-op context manager, so the overhead is an attribute lookup
+
+Enable it with instrumentation.configure(enabled=True) or by setting the
+JUPYSQL_PLUGIN_INSTRUMENTATION environment variable to 1
+"""
+import functools
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# upper bounds (in milliseconds) of the latency histogram buckets
+BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000, float("inf"))
+
+_NULL_SPAN = nullcontext()
+
+
+class _Metric:
+    """Counters and latency histogram of an operation"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * len(BUCKETS_MS)
+
+    def record(self, elapsed_ms, error):
+        self.count += 1
+        self.errors += error
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+        for i, bound in enumerate(BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[i] += 1
+                break
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_ms": self.total_ms,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "max_ms": self.max_ms,
+            "buckets": {
+                f"<={bound:g}": n for bound, n in zip(BUCKETS_MS, self.buckets)
+            },
+        }
+
+
+class _Span:
+    def __init__(self, instrumentation, name, attributes):
+        self._instrumentation = instrumentation
+        self._name = name
+        self._attributes = attributes
+        self._otel_span = None
+
+    def __enter__(self):
+        tracer = self._instrumentation._get_tracer()
+
+        if tracer is not None:
+            self._otel_span = tracer.start_as_current_span(
+                self._name, attributes=self._attributes
+            )
+            self._otel_span.__enter__()
+
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed_ms = (time.perf_counter() - self._start) * 1000
+        error = exc_type is not None
+        self._instrumentation.record(self._name, elapsed_ms, error=error)
+
+        if self._otel_span is not None:
+            self._otel_span.__exit__(exc_type, exc_value, traceback)
+
+        return False
+
+
+class Instrumentation:
+    """
+    Records how long operations take
+
+    Parameters
+    ----------
+    enabled : bool
+        Whether to record operations
+
+    tracer_provider : opentelemetry.trace.TracerProvider, optional
+        Provider used to emit spans, defaults to the global one (spans are only
+        emitted if the application configured it)
+    """
+
+    def __init__(self, *, enabled=False, tracer_provider=None):
+        self.enabled = enabled
+        self.tracer_provider = tracer_provider
+
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._tracer = None
+
+    def configure(self, **settings):
+        """Updates enabled and/or tracer_provider"""
+        unknown = set(settings) - {"enabled", "tracer_provider"}
+
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+
+        for key, value in settings.items():
+            setattr(self, key, value)
+
+        self._tracer = None
+
+    def _get_tracer(self):
+        if self._tracer is None:
+            # imported here so importing the plugin doesn't load opentelemetry
+            try:
+                from opentelemetry import trace
+            except ModuleNotFoundError:
+                return None
+
+            provider = self.tracer_provider or trace.get_tracer_provider()
+
+            # there's no exporter if the application didn't set a provider
+            if isinstance(
+                provider, (trace.ProxyTracerProvider, trace.NoOpTracerProvider)
+            ):
+                return None
+
+            self._tracer = provider.get_tracer("jupysql_plugin")
+
+        return self._tracer
+
+    def span(self, name, **attributes):
+        """
+        Returns a context manager that records the time it takes to run its
+        block under name (a no-op if the instrumentation is disabled)
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+
+        return _Span(self, name, attributes)
+
+    def timed(self, name):
+        """Decorator that records the time each call takes under name"""
+
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+
+                with _Span(self, name, {}):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def record(self, name, elapsed_ms, *, error=False):
+        """Records an operation that took elapsed_ms milliseconds"""
+        with self._lock:
+            metric = self._metrics.get(name)
+
+            if metric is None:
+                metric = self._metrics[name] = _Metric()
+
+            metric.record(elapsed_ms, error)
+
+    def get_stats(self):
+        """Returns the counters and latency histograms of every operation"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "operations": {
+                    name: metric.to_dict()
+                    for name, metric in sorted(self._metrics.items())
+                },
+            }
+
+    def reset(self):
+        """Clears the recorded operations"""
+        with self._lock:
+            self._metrics.clear()
+
+
+instrumentation = Instrumentation(
+    enabled=os.environ.get("JUPYSQL_PLUGIN_INSTRUMENTATION", "") == "1"
+)
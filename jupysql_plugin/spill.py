@@ -0,0 +1,510 @@
+"""
+Stores query results as Arrow data so the table widget can page through them
+without keeping millions of Python objects in the kernel. Large results are
+written to a scratch directory and read back through a memory map
+"""
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+
+import pyarrow as pa
+
+
+def _is_native(type_):
+    """
+    Returns True if values of this Arrow type are displayed the same way as in
+    JupySQL's JSON rows (other types are stored as strings)
+    """
+    return (
+        pa.types.is_boolean(type_)
+        or pa.types.is_integer(type_)
+        or pa.types.is_floating(type_)
+        or pa.types.is_string(type_)
+    )
+
+
+# errors raised when values don't fit an Arrow type (pyarrow raises OverflowError
+# for integers that don't fit in 64 bits)
+_CONVERSION_ERRORS = (
+    pa.ArrowInvalid,
+    pa.ArrowTypeError,
+    pa.ArrowNotImplementedError,
+    OverflowError,
+)
+
+
+def _to_strings(values):
+    return pa.array(
+        [None if value is None else str(value) for value in values], type=pa.string()
+    )
+
+
+def _to_array(values, type_=None):
+    """
+    Converts a column to an Arrow array. If type_ is passed (the type the column
+    had in the previous chunks of a result), chunks with only NULLs get it,
+    other values keep their own type (see unify_batches) since converting them
+    could truncate them (e.g., floats to integers)
+    """
+    if type_ is not None and pa.types.is_string(type_):
+        return _to_strings(values)
+
+    try:
+        array = pa.array(values)
+    except _CONVERSION_ERRORS:
+        array = None
+
+    if array is not None and type_ is not None and pa.types.is_null(array.type):
+        return pa.nulls(len(values), type=type_)
+
+    if array is not None and _is_native(array.type):
+        return array
+
+    # dates, decimals, mixed types, etc. are formatted like JupySQL does, columns
+    # with only NULLs are stored as text too
+    return _to_strings(values)
+
+
+def _common_type(type_, other):
+    """
+    Returns a type that can hold the values of both types: the wider integer,
+    a float if there are floats or text otherwise
+    """
+    if type_ == other:
+        return type_
+
+    if (
+        pa.types.is_integer(type_)
+        and pa.types.is_integer(other)
+        and pa.types.is_signed_integer(type_) == pa.types.is_signed_integer(other)
+    ):
+        return type_ if type_.bit_width >= other.bit_width else other
+
+    numeric = (pa.types.is_integer, pa.types.is_floating)
+
+    if any(f(type_) for f in numeric) and any(f(other) for f in numeric):
+        return pa.float64()
+
+    return pa.string()
+
+
+def _cast(array, type_):
+    """
+    Casts an array, values that don't fit (e.g., integers that can't be
+    represented exactly as floats) are converted to text instead
+    """
+    if array.type == type_:
+        return array
+
+    if not pa.types.is_string(type_):
+        try:
+            return array.cast(type_)
+        except _CONVERSION_ERRORS:
+            pass
+
+    return _to_strings(array.to_pylist())
+
+
+def unify_batches(batches):
+    """
+    Casts record batches with the same columns to a common schema: columns
+    whose type changed between batches (e.g., a chunk of a result had floats or
+    integers too large for the type of the previous chunks) are widened (see
+    _common_type) or converted to text
+    """
+    names = batches[0].schema.names
+    arrays = [[batch.column(i) for batch in batches] for i in range(len(names))]
+
+    for i, column in enumerate(arrays):
+        type_ = column[0].type
+
+        for array in column[1:]:
+            type_ = _common_type(type_, array.type)
+
+        column = [_cast(array, type_) for array in column]
+
+        # some values didn't fit the common type
+        if any(array.type != type_ for array in column):
+            column = [_cast(array, pa.string()) for array in column]
+
+        arrays[i] = column
+
+    return [
+        pa.RecordBatch.from_arrays([column[j] for column in arrays], names=names)
+        for j in range(len(batches))
+    ]
+
+
+def _cast_to_schema(batch, schema):
+    """
+    Casts a record batch to the schema of the previous chunks of a result if
+    it can hold its values, returns None if the schema has to be widened
+    """
+    arrays = []
+
+    for array, field in zip(batch.columns, schema):
+        if _common_type(field.type, array.type) != field.type:
+            return None
+
+        array = _cast(array, field.type)
+
+        # some values didn't fit (e.g., large integers as floats)
+        if array.type != field.type:
+            return None
+
+        arrays.append(array)
+
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def rows_to_batch(rows, columns, schema=None):
+    """
+    Converts rows to an Arrow record batch. If schema is passed (the schema of
+    the previous chunks), columns with only NULLs get its types
+    """
+    arrays = [
+        _to_array(
+            [row[i] for row in rows],
+            schema.field(i).type if schema is not None else None,
+        )
+        for i in range(len(columns))
+    ]
+
+    return pa.RecordBatch.from_arrays(arrays, names=list(columns))
+
+
+class SpilledResult:
+    """
+    A query result stored as an Arrow table, either in memory or in a memory
+    mapped Arrow IPC file
+    """
+
+    def __init__(self, query, table, path=None, source=None):
+        self.query = query
+        self.path = path
+        self._table = table
+        self._source = source
+
+    @property
+    def num_rows(self):
+        return self._table.num_rows
+
+    @property
+    def nbytes(self):
+        """Size of the file (0 if the result is in memory)"""
+        return os.path.getsize(self.path) if self.path else 0
+
+    @property
+    def memory_nbytes(self):
+        """Memory used by the result (0 if it's memory mapped)"""
+        if self.path or self._table is None:
+            return 0
+
+        return self._table.nbytes
+
+    def page(self, offset, limit):
+        """Returns the rows in [offset, offset + limit) (zero copy)"""
+        return self._table.slice(offset, limit)
+
+    def close(self):
+        """Releases the memory map and deletes the file (if any)"""
+        self._table = None
+
+        if self._source is not None:
+            try:
+                self._source.close()
+            except (OSError, pa.ArrowException):
+                # pages still point to the mapped memory, it's released when
+                # they're garbage collected
+                pass
+
+            self._source = None
+
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class SpillStore:
+    """
+    Runs queries and keeps their results (one per key, e.g., a table widget) as
+    Arrow data. Rows are fetched from the cursor in chunks, results larger than
+    threshold_bytes are written to an Arrow IPC file that is memory mapped, so
+    they're paged by the operating system instead of living in the kernel's
+    memory
+
+    Parameters
+    ----------
+    directory : str, optional
+        Scratch directory, defaults to a temporary directory that is deleted
+        when the kernel exits
+
+    threshold_bytes : int
+        Results up to this size are kept in memory
+
+    chunk_size : int
+        Number of rows to fetch from the cursor at a time
+
+    disk_budget : int
+        Maximum size of the files
+
+    memory_budget : int
+        Maximum size of the results kept in memory
+
+    max_results : int
+        Maximum number of results (in memory or in files)
+
+    When a budget or max_results is exceeded, the least recently used results
+    are deleted, so results of widgets that were closed without notifying the
+    kernel don't accumulate
+    """
+
+    def __init__(
+        self,
+        *,
+        directory=None,
+        threshold_bytes=64 * 2**20,
+        chunk_size=10_000,
+        disk_budget=10 * 2**30,
+        memory_budget=256 * 2**20,
+        max_results=32,
+    ):
+        self.directory = directory
+        self.threshold_bytes = threshold_bytes
+        self.chunk_size = chunk_size
+        self.disk_budget = disk_budget
+        self.memory_budget = memory_budget
+        self.max_results = max_results
+
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self._counter = 0
+
+    def configure(self, **settings):
+        """
+        Updates directory, threshold_bytes, chunk_size, disk_budget,
+        memory_budget and/or max_results, they apply to results stored afterwards
+        """
+        unknown = set(settings) - {
+            "directory",
+            "threshold_bytes",
+            "chunk_size",
+            "disk_budget",
+            "memory_budget",
+            "max_results",
+        }
+
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+
+        for key, value in settings.items():
+            setattr(self, key, value)
+
+    def _get_directory(self):
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="jupysql-plugin-")
+            weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+        os.makedirs(self.directory, exist_ok=True)
+        return self.directory
+
+    def get(self, key):
+        """Returns the result stored for key (or None)"""
+        with self._lock:
+            result = self._results.get(key)
+
+            if result is not None:
+                self._results.move_to_end(key)
+
+            return result
+
+    def store(self, key, query, result):
+        """
+        Stores a SQLAlchemy result (or any object with keys() and fetchmany())
+        under key, replacing the previous one
+        """
+        columns = list(result.keys())
+        batches = []
+        in_memory = 0
+        schema = None
+        writer = sink = path = None
+
+        try:
+            while True:
+                rows = result.fetchmany(self.chunk_size)
+
+                if not rows:
+                    break
+
+                batch = rows_to_batch(rows, columns, schema)
+
+                if schema is not None and not batch.schema.equals(schema):
+                    cast = _cast_to_schema(batch, schema)
+
+                    if cast is not None:
+                        batch = cast
+
+                # a column doesn't fit the type of the previous chunks
+                if schema is not None and not batch.schema.equals(schema):
+                    if writer is not None:
+                        writer.close()
+                        sink.close()
+                        writer = None
+                        spilled_path = path
+
+                        try:
+                            sink, writer, path, schema = self._rewrite(path, batch)
+                        finally:
+                            os.remove(spilled_path)
+
+                        continue
+
+                    *batches, batch = unify_batches(batches + [batch])
+
+                schema = batch.schema
+
+                if writer is not None:
+                    writer.write_batch(batch)
+                    continue
+
+                batches.append(batch)
+                in_memory += batch.nbytes
+
+                # the result is too large, move it to a file
+                if in_memory > self.threshold_bytes:
+                    path = self._new_path()
+                    sink = pa.OSFile(path, "wb")
+                    writer = pa.ipc.new_file(sink, schema)
+
+                    for batch in batches:
+                        writer.write_batch(batch)
+
+                    batches = []
+        except BaseException:
+            if writer is not None:
+                writer.close()
+                sink.close()
+                os.remove(path)
+
+            raise
+
+        if writer is not None:
+            writer.close()
+            sink.close()
+
+            source = pa.memory_map(path, "r")
+            table = pa.ipc.open_file(source).read_all()
+            spilled = SpilledResult(query, table, path=path, source=source)
+        else:
+            if schema is None:
+                schema = pa.schema([(name, pa.string()) for name in columns])
+
+            table = pa.Table.from_batches(batches, schema=schema)
+            spilled = SpilledResult(query, table)
+
+        with self._lock:
+            previous = self._results.pop(key, None)
+            self._results[key] = spilled
+
+        if previous is not None:
+            previous.close()
+
+        self._enforce_budget(keep=key)
+        return spilled
+
+    def _rewrite(self, path, batch):
+        """
+        Writes the batches in the file at path followed by batch to a new file,
+        with the columns cast to a common schema (see unify_batches). Returns
+        the sink, writer, path and schema of the new file
+        """
+        new_path = self._new_path()
+        sink = pa.OSFile(new_path, "wb")
+
+        try:
+            with pa.memory_map(path, "r") as source:
+                spilled = pa.ipc.open_file(source).read_all().to_batches()
+                batches = unify_batches(spilled + [batch])
+                writer = pa.ipc.new_file(sink, batches[0].schema)
+
+                for unified in batches:
+                    writer.write_batch(unified)
+        except BaseException:
+            sink.close()
+            os.remove(new_path)
+            raise
+
+        return sink, writer, new_path, batches[0].schema
+
+    def _new_path(self):
+        with self._lock:
+            self._counter += 1
+            counter = self._counter
+
+        return os.path.join(
+            self._get_directory(), f"result-{os.getpid()}-{counter}.arrow"
+        )
+
+    def _enforce_budget(self, keep):
+        """
+        Deletes the least recently used results until they fit the budgets and
+        max_results
+        """
+        with self._lock:
+            disk = sum(result.nbytes for result in self._results.values())
+            memory = sum(result.memory_nbytes for result in self._results.values())
+            evicted = []
+
+            for key in list(self._results):
+                too_many = len(self._results) > self.max_results
+                over_disk = disk > self.disk_budget
+                over_memory = memory > self.memory_budget
+
+                if not (too_many or over_disk or over_memory):
+                    break
+
+                result = self._results[key]
+
+                # only evict results that help getting under the limits
+                if key == keep or not (
+                    too_many
+                    or (over_disk and result.nbytes)
+                    or (over_memory and result.memory_nbytes)
+                ):
+                    continue
+
+                del self._results[key]
+                disk -= result.nbytes
+                memory -= result.memory_nbytes
+                evicted.append(result)
+
+        for result in evicted:
+            result.close()
+
+    def evict(self, key):
+        """Deletes the result stored under key (e.g., the widget was closed)"""
+        with self._lock:
+            result = self._results.pop(key, None)
+
+        if result is not None:
+            result.close()
+
+    def evict_all(self):
+        """Deletes every result"""
+        with self._lock:
+            results = list(self._results.values())
+            self._results.clear()
+
+        for result in results:
+            result.close()
+
+    def __contains__(self, key):
+        return key in self._results
+
+    def __len__(self):
+        return len(self._results)
+
+
+spill_store = SpillStore()
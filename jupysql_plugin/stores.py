@@ -0,0 +1,638 @@
+"""
+Storage backends for the stored connections. The default one is the INI
+connections file (dsn_filename), the SQLite one keeps the connections in a table
+indexed by name and driver so looking up and saving a connection doesn't read
+or rewrite every other one. This module doesn't depend on jupysql
+
+Select the backend with stores.configure(backend="sqlite") in the kernel and
+JupySQLPlugin.store_backend in the server extension. JupySQL itself only reads
+the connections file: connections saved to the SQLite store can be opened from
+the connector widget (or ConnectorWidgetManager), %sql --section doesn't see them
+"""
+import abc
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from jupysql_plugin import exceptions
+from jupysql_plugin.connections_file import ConnectionsFile, _section_to_connection
+from jupysql_plugin.credentials import CREDENTIAL_KEYS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS connections (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    driver TEXT,
+    section TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS connections_driver ON connections (driver);
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class ConnectionStore(abc.ABC):
+    """
+    Interface of the connection storage backends. Connections are stored as
+    sections: dictionaries with the arguments of sqlalchemy.engine.URL.create
+    (drivername, username, password, host, port, database, query). Stores
+    have a path attribute with the location of the connections
+    """
+
+    @abc.abstractmethod
+    def exists(self) -> bool:
+        """Returns True if the store has been created, False otherwise"""
+
+    @abc.abstractmethod
+    def get_connections(self) -> list:
+        """Returns the list of connections (dictionaries)"""
+
+    @abc.abstractmethod
+    def list_connections(self, query="", offset=0, limit=100):
+        """
+        Returns the connections whose name or driver contains query (case
+        insensitive) from offset to offset + limit and the number of matches
+        """
+
+    @abc.abstractmethod
+    def get_connection(self, name):
+        """
+        Returns the connection with the given name or None if there isn't one
+        """
+
+    @abc.abstractmethod
+    def get_section(self, name):
+        """
+        Returns the section of the connection with the given name or None if
+        there isn't one
+        """
+
+    def has_connection(self, name) -> bool:
+        """Returns True if there's a connection with the given name"""
+        return self.get_section(name) is not None
+
+    @abc.abstractmethod
+    def get_names(self) -> list:
+        """Returns the names of the connections"""
+
+    @abc.abstractmethod
+    def save(self, name, section, *, replace=None):
+        """
+        Stores a connection. If replace is passed, the connection with that
+        name is replaced (e.g., the connection was edited and renamed)
+
+        Raises
+        ------
+        ConnectionWithNameAlreadyExists
+            If another connection has the same name
+        """
+
+    @abc.abstractmethod
+    def save_many(self, sections, *, overwrite=False):
+        """
+        Stores several connections (a dictionary that maps names to sections) in
+        a single write. Returns the names that weren't stored because there's
+        already a connection with that name (unless overwrite is True)
+        """
+
+    @abc.abstractmethod
+    def delete(self, name):
+        """Deletes the connection with the given name"""
+
+    @abc.abstractmethod
+    def get_state(self):
+        """
+        Returns a value that changes every time the connections are modified
+        (None if the store doesn't exist)
+        """
+
+
+class INIConnectionStore(ConnectionStore):
+    """
+    Stores the connections in an INI connections file (see ConnectionsFile).
+    JupySQL passes every key in a section to URL.create, so the credentials
+    provider keys (see jupysql_plugin.credentials) are kept in a separate file
+    next to it (connections.credentials.ini for connections.ini) and added back
+    when reading
+
+    Both files are updated while holding the connections file's lock: providers
+    are added before the connections file is written and removed after it, so
+    if the process dies in between, a connection never loses its provider. At
+    worst a provider is left without its connection, it's removed when read
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        Path to the connections file
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.connections_file = ConnectionsFile(path)
+        self.credentials_file = ConnectionsFile(_get_credentials_path(path))
+
+    def _get_credentials(self, name):
+        """Returns the credentials provider keys of a connection (if any)"""
+        # most connections files don't have one, don't parse a missing file
+        if not self.credentials_file.exists():
+            return {}
+
+        config = self.credentials_file.get_config()
+        return dict(config.items(name)) if config.has_section(name) else {}
+
+    def _add_credentials(self, connections):
+        if self.credentials_file.exists():
+            self._remove_orphaned_credentials()
+
+            for connection in connections:
+                connection.update(self._get_credentials(connection["name"]))
+
+        return connections
+
+    def _remove_orphaned_credentials(self):
+        """
+        Removes the providers of connections that aren't in the connections file
+        (e.g., the process died after storing a provider but before storing its
+        connection) so a connection added later with that name doesn't get it
+        """
+        names = self.connections_file.get_config().sections()
+
+        if set(self.credentials_file.get_config().sections()) <= set(names):
+            return
+
+        try:
+            # a save in another process holds the lock from storing the provider
+            # until its connection is stored, so it isn't mistaken for an orphan
+            with self.connections_file.lock() as config:
+                self._remove_credentials(config)
+        except OSError:
+            # e.g., a read-only directory, orphans are never read anyway
+            pass
+
+    def exists(self) -> bool:
+        return self.connections_file.exists()
+
+    def get_connections(self) -> list:
+        return self._add_credentials(self.connections_file.get_connections())
+
+    def list_connections(self, query="", offset=0, limit=100):
+        connections, total = self.connections_file.list_connections(
+            query, offset, limit
+        )
+        return self._add_credentials(connections), total
+
+    def get_connection(self, name):
+        connection = self.connections_file.get_connection(name)
+
+        if connection is None:
+            return None
+
+        return self._add_credentials([connection])[0]
+
+    def get_section(self, name):
+        config = self.connections_file.get_config()
+
+        if not config.has_section(name):
+            return None
+
+        if self.credentials_file.exists():
+            self._remove_orphaned_credentials()
+
+        return {**dict(config.items(name)), **self._get_credentials(name)}
+
+    def has_connection(self, name) -> bool:
+        return self.connections_file.get_config().has_section(name)
+
+    def get_names(self) -> list:
+        return self.connections_file.get_config().sections()
+
+    def save(self, name, section, *, replace=None):
+        section, credentials = _split_credential_keys(section)
+
+        def update(config):
+            # another process might have stored a connection with the same name
+            # since we last checked
+            if replace != name and config.has_section(name):
+                raise exceptions.ConnectionWithNameAlreadyExists(name)
+
+            if credentials:
+                self.credentials_file.update(
+                    lambda existing: _set_sections(existing, {name: credentials})
+                )
+
+            # assigning an existing section replaces it in place, so edited
+            # connections keep their position (renamed ones are moved to the end,
+            # like _apply_patch does with the patches sent to the widgets)
+            if replace and replace != name:
+                config.remove_section(replace)
+
+            config[name] = section
+
+        def remove_credentials(config):
+            # the connection's previous provider (if it no longer has one) and
+            # the provider of the renamed connection (an orphan now)
+            self._remove_credentials(config, [] if credentials else [name])
+
+        self.connections_file.update(update, after_write=remove_credentials)
+
+    def save_many(self, sections, *, overwrite=False):
+        skipped = []
+        credentials = {
+            name: _split_credential_keys(section)[1]
+            for name, section in sections.items()
+        }
+
+        def update(config):
+            skipped[:] = [
+                name for name in sections if config.has_section(name) and not overwrite
+            ]
+            added = {
+                name: credentials[name]
+                for name in sections
+                if name not in skipped and credentials[name]
+            }
+
+            # the file is only created once a connection has a provider
+            if added:
+                self.credentials_file.update(
+                    lambda existing: _set_sections(existing, added)
+                )
+
+            for name, section in sections.items():
+                if name not in skipped:
+                    config[name] = _split_credential_keys(section)[0]
+
+        def remove_credentials(config):
+            self._remove_credentials(
+                config,
+                [
+                    name
+                    for name in sections
+                    if name not in skipped and not credentials[name]
+                ],
+            )
+
+        self.connections_file.update(update, after_write=remove_credentials)
+        return skipped
+
+    def delete(self, name):
+        # the connection's provider is an orphan once it's deleted
+        self.connections_file.update(
+            lambda config: config.remove_section(name),
+            after_write=self._remove_credentials,
+        )
+
+    def _remove_credentials(self, config, names=()):
+        """
+        Removes the providers of names and of the connections that aren't in
+        config (the connections file), must be called holding its lock
+        """
+        if not self.credentials_file.exists():
+            return
+
+        stale = [
+            name
+            for name in self.credentials_file.get_config().sections()
+            if name in names or not config.has_section(name)
+        ]
+
+        if stale:
+
+            def remove(existing):
+                for name in stale:
+                    existing.remove_section(name)
+
+            self.credentials_file.update(remove)
+
+    def get_state(self):
+        state = self.connections_file.get_state()
+
+        if state is None:
+            return None
+
+        return state, self.credentials_file.get_state()
+
+
+def _set_sections(config, sections):
+    """Adds sections to config, replacing the existing ones"""
+    for name, section in sections.items():
+        config[name] = section
+
+
+def _get_credentials_path(path):
+    """
+    Returns the path of the file that keeps the credentials provider keys of the
+    connections in path (e.g., connections.credentials.ini for connections.ini)
+    """
+    path = Path(path)
+    return path.with_name(f"{path.stem}.credentials{path.suffix or '.ini'}")
+
+
+def _split_credential_keys(section):
+    """
+    Splits a section into the URL.create arguments (what JupySQL reads) and the
+    credentials provider keys
+    """
+    url_args = {k: v for k, v in section.items() if k not in CREDENTIAL_KEYS}
+    credentials = {k: v for k, v in section.items() if k in CREDENTIAL_KEYS and v}
+    return url_args, credentials
+
+
+class SQLiteConnectionStore(ConnectionStore):
+    """
+    Stores the connections in a SQLite database. Names are unique and indexed,
+    drivers are indexed too, and every update runs in a transaction so
+    concurrent updates from other kernels are serialized by SQLite
+
+    Parameters
+    ----------
+    path : str or pathlib.Path
+        Path to the database
+
+    migrate_from : str or pathlib.Path, optional
+        Connections file whose connections are copied to the database the first
+        time it's opened (connections already in the database are kept)
+    """
+
+    def __init__(self, path, *, migrate_from=None):
+        self.path = str(path)
+        self.migrate_from = None if migrate_from is None else str(migrate_from)
+
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._db is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+            # transactions are managed explicitly (see _transaction) and the
+            # lock serializes the threads that share the connection
+            db = sqlite3.connect(
+                self.path, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            db.executescript(SCHEMA)
+            self._db = db
+
+            if self.migrate_from is not None:
+                self._migrate(self.migrate_from)
+
+        return self._db
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Runs the block in a write transaction and increments the version
+        returned by get_state if it succeeds
+        """
+        with self._lock:
+            db = self._connect()
+            # take the write lock upfront so the checks in the block can't be
+            # invalidated by another process
+            db.execute("BEGIN IMMEDIATE")
+
+            try:
+                yield db
+                db.execute(
+                    "INSERT INTO metadata (key, value) VALUES ('version', '1') "
+                    "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+                )
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+            db.execute("COMMIT")
+
+    def _read(self, sql, parameters=()):
+        with self._lock:
+            return self._connect().execute(sql, parameters).fetchall()
+
+    def _migrate(self, path):
+        """Copies the connections in the connections file at path (once)"""
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+
+        try:
+            migrated = db.execute(
+                "SELECT 1 FROM metadata WHERE key = 'migrated_from'"
+            ).fetchone()
+
+            ini_store = INIConnectionStore(path)
+
+            if migrated is None and ini_store.exists():
+                db.executemany(
+                    "INSERT OR IGNORE INTO connections (name, driver, section) "
+                    "VALUES (?, ?, ?)",
+                    [
+                        _to_row(name, ini_store.get_section(name))
+                        for name in ini_store.get_names()
+                    ],
+                )
+                db.execute(
+                    "INSERT INTO metadata (key, value) VALUES ('migrated_from', ?)",
+                    (os.path.abspath(path),),
+                )
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+        db.execute("COMMIT")
+
+    def exists(self) -> bool:
+        return Path(self.path).is_file()
+
+    def get_connections(self) -> list:
+        rows = self._read("SELECT name, section FROM connections ORDER BY id")
+        return [_from_row(name, section) for name, section in rows]
+
+    def list_connections(self, query="", offset=0, limit=100):
+        where = ""
+        parameters = ()
+
+        if query:
+            # LIKE is case insensitive (for ASCII characters)
+            pattern = "%{}%".format(
+                query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            )
+            where = "WHERE name LIKE ? ESCAPE '\\' OR driver LIKE ? ESCAPE '\\'"
+            parameters = (pattern, pattern)
+
+        with self._lock:
+            db = self._connect()
+            (total,) = db.execute(
+                f"SELECT COUNT(*) FROM connections {where}", parameters
+            ).fetchone()
+            rows = db.execute(
+                f"SELECT name, section FROM connections {where} "
+                "ORDER BY id LIMIT ? OFFSET ?",
+                parameters + (limit, offset),
+            ).fetchall()
+
+        return [_from_row(name, section) for name, section in rows], total
+
+    def get_connection(self, name):
+        section = self.get_section(name)
+        return None if section is None else _section_to_connection(name, section)
+
+    def get_section(self, name):
+        rows = self._read("SELECT section FROM connections WHERE name = ?", (name,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def get_names(self) -> list:
+        rows = self._read("SELECT name FROM connections ORDER BY id")
+        return [name for (name,) in rows]
+
+    def save(self, name, section, *, replace=None):
+        row = _to_row(name, section)
+
+        with self._transaction() as db:
+            if replace != name and db.execute(
+                "SELECT 1 FROM connections WHERE name = ?", (name,)
+            ).fetchone():
+                raise exceptions.ConnectionWithNameAlreadyExists(name)
+
+            # edited connections keep their position in the list, renamed ones
+            # are moved to the end (like in the connections file)
+            if replace == name:
+                cursor = db.execute(
+                    "UPDATE connections SET driver = ?, section = ? WHERE name = ?",
+                    row[1:] + (replace,),
+                )
+
+                if cursor.rowcount:
+                    return
+            elif replace:
+                db.execute("DELETE FROM connections WHERE name = ?", (replace,))
+
+            db.execute(
+                "INSERT INTO connections (name, driver, section) VALUES (?, ?, ?)",
+                row,
+            )
+
+    def save_many(self, sections, *, overwrite=False):
+        skipped = []
+        conflict = "DO UPDATE SET driver = excluded.driver, section = excluded.section"
+
+        with self._transaction() as db:
+            if not overwrite:
+                for name in sections:
+                    if db.execute(
+                        "SELECT 1 FROM connections WHERE name = ?", (name,)
+                    ).fetchone():
+                        skipped.append(name)
+
+                conflict = "DO NOTHING"
+
+            db.executemany(
+                "INSERT INTO connections (name, driver, section) VALUES (?, ?, ?) "
+                f"ON CONFLICT (name) {conflict}",
+                [_to_row(name, section) for name, section in sections.items()],
+            )
+
+        return skipped
+
+    def delete(self, name):
+        with self._transaction() as db:
+            db.execute("DELETE FROM connections WHERE name = ?", (name,))
+
+    def get_state(self):
+        if not self.exists():
+            return None
+
+        rows = self._read("SELECT value FROM metadata WHERE key = 'version'")
+        return int(rows[0][0]) if rows else 0
+
+    def close(self):
+        """Closes the connection to the database"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def _to_row(name, section):
+    return name, section.get("drivername"), json.dumps(section)
+
+
+def _from_row(name, section):
+    return _section_to_connection(name, json.loads(section).items())
+
+
+class StoreRegistry:
+    """
+    Returns the store of a connections file according to the selected backend
+
+    Parameters
+    ----------
+    backend : str
+        "ini" stores the connections in the connections file, "sqlite" in a
+        SQLite database whose connections are migrated from the connections file
+        the first time it's used
+
+    sqlite_path : str, optional
+        Path to the SQLite database, defaults to the path of the connections
+        file with the .sqlite extension
+    """
+
+    BACKENDS = ("ini", "sqlite")
+
+    def __init__(self, *, backend="ini", sqlite_path=None):
+        self.backend = backend
+        self.sqlite_path = sqlite_path
+
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    def configure(self, **settings):
+        """Updates backend and/or sqlite_path"""
+        unknown = set(settings) - {"backend", "sqlite_path"}
+
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+
+        backend = settings.get("backend", self.backend)
+
+        if backend not in self.BACKENDS:
+            raise ValueError(
+                f"Unknown backend: {backend!r}, "
+                f"expected one of {', '.join(self.BACKENDS)}"
+            )
+
+        for key, value in settings.items():
+            setattr(self, key, value)
+
+    def get(self, dsn_filename) -> ConnectionStore:
+        """Returns the store for the connections file dsn_filename"""
+        path = os.path.abspath(os.path.expanduser(dsn_filename))
+
+        if self.backend == "ini":
+            return INIConnectionStore(path)
+
+        sqlite_path = os.path.abspath(
+            os.path.expanduser(self.sqlite_path or Path(path).with_suffix(".sqlite"))
+        )
+
+        with self._lock:
+            store = self._stores.get((sqlite_path, path))
+
+            if store is None:
+                store = SQLiteConnectionStore(sqlite_path, migrate_from=path)
+                self._stores[(sqlite_path, path)] = store
+
+        return store
+
+    def close_all(self):
+        """Closes the SQLite databases"""
+        with self._lock:
+            stores = list(self._stores.values())
+            self._stores.clear()
+
+        for store in stores:
+            store.close()
+
+
+stores = StoreRegistry()
@@ -0,0 +1,595 @@
+"""
+Serves the rows of JupySQL's table widget over a comm that stays open for the
+lifetime of the kernel. Its requests contain the table, the page, the number of
+rows per page (nRows) and optionally a sort column. Pages are sent as JSON
+strings, not Arrow buffers: JupySQL's widget renders rows by parsing a JSON
+string, so decoding Arrow in the frontend would only add a second encoding step
+
+Filtering, counting and paging through queries (instead of tables) are used by
+DataTableWidget (see jupysql_plugin.widgets.data_table). Query results are
+stored in the spill store if pyarrow is installed
+(pip install "jupysql-plugin[spill]"), otherwise the rows are kept in memory
+"""
+import datetime
+import json
+import operator
+import threading
+import time
+from collections import OrderedDict
+
+import sqlalchemy
+from sqlalchemy.exc import NoSuchTableError
+
+from jupysql_plugin.instrumentation import instrumentation
+
+try:
+    from jupysql_plugin import spill
+except ModuleNotFoundError:
+    # pyarrow isn't installed, query results are kept in memory (see _MemoryStore)
+    spill = None
+
+try:
+    from sql.connection import ConnectionManager
+    from sql.inspect import fetch_sql_with_pagination
+    from sql.util import parse_sql_results_to_json
+except (ModuleNotFoundError, ImportError) as e:
+    raise ModuleNotFoundError(
+        "Your jupysql version isn't compatible with this version of jupysql-plugin. "
+        "Please update: pip install jupysql --upgrade"
+    ) from e
+
+
+def _seek_condition(columns, values, descending):
+    """
+    Returns the condition that selects the rows after (or before, if descending)
+    the given key: (a, b) > (x, y) is written as a > x OR (a = x AND b > y) since
+    not every database supports comparing tuples
+    """
+    conditions = []
+
+    for i, (column, value) in enumerate(zip(columns, values)):
+        equal = [c == v for c, v in zip(columns[:i], values[:i])]
+        after = column < value if descending else column > value
+        conditions.append(sqlalchemy.and_(*equal, after))
+
+    return sqlalchemy.or_(*conditions)
+
+
+class KeysetPaginator:
+    """
+    Fetches table pages with keyset (seek) pagination: pages are ordered by a
+    unique key and the last key of every page is remembered, so the next page
+    is selected with WHERE key > last_key instead of skipping rows with OFFSET.
+    Sorting and filtering are compiled with SQLAlchemy so they run in the database
+
+    The key is the primary key, or the sort column followed by the primary key
+    (to break ties). Tables without a primary key, nullable sort columns, sorting
+    by multiple columns and non-SQLAlchemy connections use OFFSET pagination
+
+    Parameters
+    ----------
+    max_entries : int
+        Number of (table, sort, page size) combinations to remember keys for
+
+    ttl : float
+        Seconds to cache the reflected table definitions
+    """
+
+    def __init__(self, *, max_entries=32, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        self._tables = OrderedDict()
+        self._bookmarks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+        """Forgets the table definitions and the keys of every page"""
+        with self._lock:
+            self._tables.clear()
+            self._bookmarks.clear()
+
+    def _remember(self, cache, key, value):
+        # must be called with the lock held
+        cache[key] = value
+        cache.move_to_end(key)
+
+        while len(cache) > self.max_entries:
+            cache.popitem(last=False)
+
+    def _reflect(self, connection, connection_key, table):
+        with self._lock:
+            entry = self._tables.get((connection_key, table))
+
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                self._tables.move_to_end((connection_key, table))
+                return entry[1]
+
+        schema, _, name = table.rpartition(".")
+        reflected = sqlalchemy.Table(
+            name.strip("\"'"),
+            sqlalchemy.MetaData(),
+            schema=schema.strip("\"'") or None,
+            autoload_with=connection,
+        )
+
+        with self._lock:
+            self._remember(
+                self._tables, (connection_key, table), (time.monotonic(), reflected)
+            )
+
+        return reflected
+
+    def _get_key_columns(self, table, order):
+        """
+        Returns the columns that uniquely identify the rows in the requested
+        order or None if there are none
+        """
+        if len(order) > 1:
+            return None
+
+        primary_key = list(table.primary_key.columns)
+
+        if not order:
+            return primary_key or None
+
+        column = order[0][0]
+
+        # NULLs can't be compared so they'd be skipped
+        if not primary_key or column.nullable:
+            return None
+
+        return [column] + [c for c in primary_key if c is not column]
+
+    def get_page(self, table, page, n_rows, *, sort=None, filters=None, count=False):
+        """
+        Returns the rows and column names of a page (and the number of rows that
+        match the filters if count is True)
+
+        Parameters
+        ----------
+        table : str
+            Table name
+
+        page : int
+            Page number (starting at 0)
+
+        n_rows : int
+            Rows per page
+
+        sort : list, optional
+            (column, order) tuples, order is "ASC" or "DESC"
+
+        filters : list, optional
+            Filters (see _filter_condition), rows must match all of them
+
+        count : bool
+            If True, also returns the number of rows that match the filters
+        """
+        sort = sort or []
+        filters = filters or []
+        current = ConnectionManager.current
+
+        def fetch_with_offset():
+            if len(sort) > 1 or filters or count:
+                raise ValueError(
+                    "Sorting by multiple columns, filtering and counting are only "
+                    "supported for SQLAlchemy connections"
+                )
+
+            column, order = sort[0] if sort else (None, None)
+            return fetch_sql_with_pagination(
+                table, page * n_rows, n_rows, sort_column=column, sort_order=order
+            )
+
+        # only SQLAlchemy connections can be inspected (other ones have no url)
+        if current is None or current.url is None:
+            return fetch_with_offset()
+
+        connection = current.connection_sqlalchemy
+        connection_key = (current.alias, current.url)
+
+        # reflection runs on the user's connection and begins a transaction that
+        # _execute would then leave open, roll it back here (it could hold locks)
+        in_transaction = connection.in_transaction()
+
+        try:
+            try:
+                reflected = self._reflect(connection, connection_key, table)
+            except NoSuchTableError:
+                # JupySQL raises a helpful error
+                return fetch_with_offset()
+
+            return self._fetch_page(
+                connection,
+                connection_key,
+                table,
+                reflected,
+                page,
+                n_rows,
+                sort=sort,
+                filters=filters,
+                count=count,
+            )
+        finally:
+            if not in_transaction and connection.in_transaction():
+                connection.rollback()
+
+    def _fetch_page(
+        self,
+        connection,
+        connection_key,
+        table,
+        reflected,
+        page,
+        n_rows,
+        *,
+        sort,
+        filters,
+        count,
+    ):
+        order = [
+            (_get_column(reflected, column), (order or "").upper() == "DESC")
+            for column, order in sort
+        ]
+        conditions = [_filter_condition(reflected, spec) for spec in filters]
+        query = sqlalchemy.select(reflected).where(*conditions).limit(n_rows)
+
+        total = None
+
+        if count:
+            count_query = (
+                sqlalchemy.select(sqlalchemy.func.count())
+                .select_from(reflected)
+                .where(*conditions)
+            )
+            total = _execute(connection, count_query)[0][0][0]
+
+        key_columns = self._get_key_columns(reflected, order)
+
+        if key_columns is None:
+            query = query.order_by(
+                *[c.desc() if descending else c.asc() for c, descending in order]
+            )
+
+            if page:
+                query = query.offset(page * n_rows)
+
+            rows, columns = _execute(connection, query)
+            return (rows, columns, total) if count else (rows, columns)
+
+        descending = order[0][1] if order else False
+        state_key = (
+            connection_key,
+            table,
+            tuple((c.name, d) for c, d in order),
+            json.dumps(filters, sort_keys=True, default=str),
+            n_rows,
+        )
+
+        # start from the closest page we know the last key of
+        with self._lock:
+            bookmarks = self._bookmarks.get(state_key, {})
+
+            if page - 1 in bookmarks:
+                previous = page - 1
+            else:
+                previous = max((p for p in bookmarks if p < page), default=None)
+
+            last_key = bookmarks.get(previous)
+
+        query = query.order_by(
+            *[c.desc() if descending else c.asc() for c in key_columns]
+        )
+
+        if last_key is None:
+            skip = page
+        else:
+            query = query.where(_seek_condition(key_columns, last_key, descending))
+            skip = page - previous - 1
+
+        if skip:
+            query = query.offset(skip * n_rows)
+
+        rows, columns = _execute(connection, query)
+
+        if rows:
+            positions = [columns.index(c.name) for c in key_columns]
+
+            with self._lock:
+                bookmarks = self._bookmarks.get(state_key, {})
+                bookmarks[page] = tuple(rows[-1][i] for i in positions)
+                self._remember(self._bookmarks, state_key, bookmarks)
+
+        return (rows, columns, total) if count else (rows, columns)
+
+
+def _execute(connection, query):
+    """Runs a query and returns the rows and the column names"""
+    in_transaction = connection.in_transaction()
+
+    try:
+        result = connection.execute(query)
+        columns = list(result.keys())
+        rows = result.fetchall()
+    finally:
+        # don't leave a transaction open (it could hold locks)
+        if not in_transaction and connection.in_transaction():
+            connection.rollback()
+
+    return rows, columns
+
+
+def _get_column(table, name):
+    column = table.columns.get(name)
+
+    if column is None:
+        raise ValueError(f"Table {table.name!r} has no column {name!r}")
+
+    return column
+
+
+def _to_column_type(column, value):
+    """
+    Converts ISO strings to dates and times (the JSON messages can't contain
+    them) so they can be compared to temporal columns
+    """
+    if not isinstance(value, str):
+        return value
+
+    python_type = None
+
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        pass
+
+    if python_type in (datetime.date, datetime.datetime, datetime.time):
+        return python_type.fromisoformat(value)
+
+    return value
+
+
+# filter operators that take a value
+_OPERATORS = {
+    "eq": operator.eq,
+    "ne": operator.ne,
+    "lt": operator.lt,
+    "le": operator.le,
+    "gt": operator.gt,
+    "ge": operator.ge,
+    "in": lambda column, values: column.in_(values),
+    "contains": lambda column, value: column.contains(value, autoescape=True),
+    "startswith": lambda column, value: column.startswith(value, autoescape=True),
+    "endswith": lambda column, value: column.endswith(value, autoescape=True),
+}
+
+
+def _filter_condition(table, spec):
+    """
+    Compiles a filter such as {"column": "x", "op": "gt", "value": 1} to a
+    SQLAlchemy condition, values are sent as bound parameters. Supported
+    operators are eq, ne, lt, le, gt, ge, in, contains, startswith, endswith,
+    is_null and not_null
+    """
+    column = _get_column(table, spec.get("column"))
+    op = spec.get("op", "eq")
+
+    if op == "is_null":
+        return column.is_(None)
+
+    if op == "not_null":
+        return column.is_not(None)
+
+    if op not in _OPERATORS:
+        raise ValueError(f"Unsupported filter operator: {op!r}")
+
+    value = spec.get("value")
+
+    if op == "in":
+        value = [_to_column_type(column, v) for v in value]
+    elif op in {"contains", "startswith", "endswith"}:
+        # text search on non-text columns compares their text representation
+        if not isinstance(column.type, sqlalchemy.String):
+            column = sqlalchemy.cast(column, sqlalchemy.String)
+
+        value = str(value)
+    else:
+        value = _to_column_type(column, value)
+
+    return _OPERATORS[op](column, value)
+
+
+paginator = KeysetPaginator()
+
+
+def _parse_sort(sort):
+    """
+    Returns a list of (column, order) tuples, sort is a {"column": ...,
+    "order": ...} dictionary (what JupySQL's table widget sends) or a list of them
+    """
+    if not sort:
+        return []
+
+    if isinstance(sort, dict):
+        sort = [sort]
+
+    return [(spec["column"], spec.get("order", "ASC")) for spec in sort]
+
+
+class _MemoryResult:
+    """A query result kept as rows, used when pyarrow isn't installed"""
+
+    def __init__(self, query, columns, rows):
+        self.query = query
+        self.columns = columns
+        self.rows = rows
+
+    @property
+    def num_rows(self):
+        return len(self.rows)
+
+    def page(self, offset, limit):
+        """Returns the rows in [offset, offset + limit) and the column names"""
+        return self.rows[offset : offset + limit], self.columns
+
+
+class _MemoryStore:
+    """
+    Keeps query results in memory when pyarrow isn't installed (so they can't be
+    spilled), the least recently used results are deleted when there are more
+    than max_results
+    """
+
+    def __init__(self, *, max_results=8):
+        self.max_results = max_results
+
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the result stored for key (or None)"""
+        with self._lock:
+            result = self._results.get(key)
+
+            if result is not None:
+                self._results.move_to_end(key)
+
+            return result
+
+    def store(self, key, query, result):
+        """Stores a SQLAlchemy result under key, replacing the previous one"""
+        stored = _MemoryResult(query, list(result.keys()), result.fetchall())
+
+        with self._lock:
+            self._results[key] = stored
+            self._results.move_to_end(key)
+
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+        return stored
+
+    def evict(self, key):
+        """Deletes the result stored under key (e.g., the widget was closed)"""
+        with self._lock:
+            self._results.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._results
+
+
+memory_store = _MemoryStore()
+
+
+def _get_result_store():
+    return memory_store if spill is None else spill.spill_store
+
+
+def _store_query(key, query):
+    """
+    Runs a query and stores its result in the spill store (or in memory if
+    pyarrow isn't installed)
+    """
+    current = ConnectionManager.current
+
+    if current is None or current.url is None:
+        raise ValueError("Paging through queries requires a SQLAlchemy connection")
+
+    connection = current.connection_sqlalchemy
+    in_transaction = connection.in_transaction()
+
+    try:
+        # stream_results uses a server side cursor (where supported), so rows are
+        # fetched in chunks
+        result = connection.execute(
+            sqlalchemy.text(query), execution_options={"stream_results": True}
+        )
+
+        try:
+            return _get_result_store().store(key, query, result)
+        finally:
+            result.close()
+    finally:
+        if not in_transaction and connection.in_transaction():
+            connection.rollback()
+
+
+def get_query_page(data):
+    """
+    Returns the rows and columns of a page of a query's result and the number of
+    rows. The query runs once per widget (data["key"]), its result is stored in
+    the spill store (or in memory) and the following pages are sliced from it
+    """
+    if data.get("sort") or data.get("filters"):
+        raise ValueError("Sorting and filtering are only supported for tables")
+
+    key, query = data["key"], data["query"]
+    result = _get_result_store().get(key)
+
+    if result is None or result.query != query:
+        result = _store_query(key, query)
+
+    n_rows = data["nRows"]
+    page = result.page(data["page"] * n_rows, n_rows)
+
+    if spill is None:
+        rows, columns = page
+    else:
+        rows = list(zip(*(column.to_pylist() for column in page.columns)))
+        columns = page.column_names
+
+    return rows, columns, result.num_rows
+
+
+def evict_query(key):
+    """Deletes the stored result of a query (e.g., its widget was closed)"""
+    _get_result_store().evict(key)
+
+
+def get_page(data):
+    """
+    Returns the rows and columns requested by the table widget. data contains the
+    table, the page, the number of rows per page (nRows) and optionally the
+    sort (a column and order or a list of them), filters (see _filter_condition)
+    and count (to also return the number of rows that match the filters)
+    """
+    return paginator.get_page(
+        data["table"],
+        data["page"],
+        data["nRows"],
+        sort=_parse_sort(data.get("sort")),
+        filters=data.get("filters"),
+        count=data.get("count", False),
+    )
+
+
+def comm_handler(comm, open_msg):
+    """
+    Handles page requests from the frontend. The comm stays open for the lifetime
+    of the kernel, so replies contain the id of the request they answer
+    """
+
+    @comm.on_msg
+    def _recv(msg):
+        with instrumentation.span("table_widget.serve_page"):
+            _serve_page(comm, msg)
+
+
+def _serve_page(comm, msg):
+    data = msg["content"]["data"]
+    reply = {"id": data.get("id")}
+
+    try:
+        rows, columns = paginator.get_page(
+            data["table"],
+            data["page"],
+            data["nRows"],
+            sort=_parse_sort(data.get("sort")),
+        )
+    except Exception as e:
+        comm.send({**reply, "error": f"{type(e).__name__}: {e}"})
+        return
+
+    rows_json = parse_sql_results_to_json(rows, columns)
+    comm.send({**reply, "rows": rows_json})
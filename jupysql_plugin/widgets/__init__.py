@@ -1,3 +1,24 @@
-from jupysql_plugin.widgets.connector_widget import ConnectorWidget
+"""
+Widgets are imported on first access, so importing this package doesn't load
+ipywidgets, SQLAlchemy or JupySQL
+"""
+import importlib
 
-__all__ = ["ConnectorWidget"]
+_WIDGETS = {
+    "ConnectorWidget": "jupysql_plugin.widgets.connector_widget",
+    "DataTableWidget": "jupysql_plugin.widgets.data_table",
+    "SchemaBrowserWidget": "jupysql_plugin.widgets.schema_browser",
+}
+
+__all__ = ["ConnectorWidget", "DataTableWidget", "SchemaBrowserWidget"]
+
+
+def __getattr__(name):
+    if name not in _WIDGETS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    return getattr(importlib.import_module(_WIDGETS[name]), name)
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,8 +1,14 @@
+import ast
 import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from configparser import ConfigParser
 from pathlib import Path
 
-from sqlalchemy.engine.url import URL
+import sqlalchemy
+from sqlalchemy.engine.url import URL, make_url
+from sqlalchemy.pool import QueuePool
 
 try:
     # renamed in jupysql 0.9.0
@@ -13,6 +19,8 @@ try:
 
     # this was renamed in jupysql 0.10.0
     from sql.parse import connection_str_from_dsn_section
+
+    from sql import exceptions as sql_exceptions
 except (ModuleNotFoundError, ImportError) as e:
     raise ModuleNotFoundError(
         "Your jupysql version isn't compatible with this version of jupysql-plugin. "
@@ -21,6 +29,51 @@ except (ModuleNotFoundError, ImportError) as e:
 
 
 from jupysql_plugin import exceptions
+from jupysql_plugin.completions import completion_cache
+from jupysql_plugin.connections_file import (  # noqa: F401
+    ConnectionsFile,
+    _apply_patch,
+    _diff_connections,
+)
+from jupysql_plugin.credentials import (
+    CREDENTIAL_KEYS,
+    get_provider,
+    split_credentials,
+)
+from jupysql_plugin.instrumentation import instrumentation
+from jupysql_plugin.stores import ConnectionStore, INIConnectionStore, stores
+from jupysql_plugin.widgets.engines import engines
+from jupysql_plugin.widgets.preflight import preflight
+
+
+class PendingConnection:
+    """
+    A connection that has been opened (see ConnectorWidgetManager.connect_to_database)
+    but that JupySQL doesn't know about yet
+
+    Parameters
+    ----------
+    register : callable
+        Makes it JupySQL's current connection
+
+    close : callable, optional
+        Releases it if it won't be registered
+    """
+
+    def __init__(self, register, close=None):
+        self._register = register
+        self._close = close
+
+    def register(self):
+        """Makes the connection the one %sql uses"""
+        # the completions belong to the previous connection
+        completion_cache.invalidate()
+        self._register()
+
+    def close(self):
+        """Releases the connection (it must not have been registered)"""
+        if self._close is not None:
+            self._close()
 
 
 class ConnectorWidgetManager:
@@ -35,18 +88,43 @@ class ConnectorWidgetManager:
         """
         return _get_sql_magic().dsn_filename
 
+    def _get_connections_file(self) -> ConnectionsFile:
+        return ConnectionsFile(self.get_path_to_config_file())
+
+    def _get_store(self) -> ConnectionStore:
+        """
+        Returns the store that keeps the connections (the connections file by
+        default, see jupysql_plugin.stores)
+        """
+        return stores.get(self.get_path_to_config_file())
+
     def is_config_exist(self) -> bool:
         """Returns True if the config file exists, False otherwise"""
-        return Path(self.get_path_to_config_file()).is_file()
+        return self._get_store().exists()
+
+    def is_connections_store(self, path) -> bool:
+        """
+        Returns True if the connections are stored at path (e.g., the store the
+        server extension watches)
+        """
+        return os.path.realpath(os.path.expanduser(path)) == os.path.realpath(
+            self._get_store().path
+        )
 
     def _get_config(self) -> ConfigParser:
         """
-        Returns current config file
+        Returns current config file. The object is cached and shared across
+        the process so it must not be modified, use _write_config to update the
+        file
         """
-        config = ConfigParser()
+        return self._get_connections_file().get_config()
 
-        config.read(self.get_path_to_config_file())
-        return config
+    def _write_config(self, update):
+        """
+        Reads the config file, calls update(config) to modify it and writes it
+        back (see ConnectionsFile.update)
+        """
+        self._get_connections_file().update(update)
 
     def _get_connection_string_from_section_in_config_file(
         self, connection_name
@@ -55,47 +133,101 @@ class ConnectorWidgetManager:
         Reads the desired section from the config file and returns the connection
         string
         """
+        connection_str, credentials = self._get_connection_string_and_credentials(
+            connection_name
+        )
+        return _with_password(connection_str, credentials)
+
+    @instrumentation.timed("connections.get_connection_string")
+    def _get_connection_string_and_credentials(self, connection_name):
+        """
+        Reads the desired section from the config file and returns the connection
+        string and the credentials source (None if the section doesn't name a
+        credentials provider, see jupysql_plugin.credentials). If there's a
+        source, the credentials are fetched (or read from the cache) and the
+        connection string contains the username but not the password
+        """
+        store = self._get_store()
+        section = store.get_section(connection_name)
+
+        if section is not None:
+            try:
+                url, credentials = _parse_section(section)
+            except ValueError as e:
+                error = e
+            else:
+                if credentials is not None:
+                    url = url.set(username=credentials().username or url.username)
+
+                connection_str = str(url.render_as_string(hide_password=False))
+                return connection_str, credentials
+
+        # jupysql's errors refer to the connections file, which doesn't have the
+        # connections kept in the SQLite store
+        if not isinstance(store, INIConnectionStore):
+            if section is None:
+                raise sql_exceptions.KeyError(
+                    f"The connection {connection_name!r} does not exist in the "
+                    f"connections database {store.path!r}"
+                )
+
+            raise sql_exceptions.ValueError(
+                f"The connection {connection_name!r} in the connections database "
+                f"{store.path!r} is invalid. {error}"
+            )
 
+        # the section is missing or invalid, jupysql raises a helpful error
         class Config:
             dsn_filename = Path(self.get_path_to_config_file())
 
-        connection_string = connection_str_from_dsn_section(
+        connection_str = connection_str_from_dsn_section(
             section=connection_name, config=Config()
         )
 
-        return connection_string
+        return connection_str, None
 
     def section_name_already_exists(self, connection_name) -> bool:
-        config = ConnectorWidgetManager()._get_config()
-        return connection_name in config.sections()
+        return self._get_store().has_connection(connection_name)
 
     def get_connections_from_config_file(self) -> list:
         """
         Return the list of connections (dictionaries) from the configuration file
         """
-        connections = []
-        config = self._get_config()
-
-        def _config_section_to_dict(config, section):
-            d = dict(config.items(section))
-            d["name"] = section
-
-            if "drivername" in d:
-                d["driver"] = d.pop("drivername")
+        return self._get_store().get_connections()
 
-            return d
+    def get_connection_names(self) -> list:
+        """Returns the names of the stored connections"""
+        return self._get_store().get_names()
 
-        connections = [
-            _config_section_to_dict(config, section) for section in config.sections()
-        ]
+    def get_connection(self, connection_name):
+        """
+        Returns the stored connection (dictionary) with the given name or None if
+        there isn't one
+        """
+        return self._get_store().get_connection(connection_name)
 
-        return connections
+    def list_connections(self, query="", offset=0, limit=100) -> dict:
+        """
+        Returns a page of the connections whose name or driver contains query
+        and the number of matches (see ConnectionStore.list_connections)
+        """
+        connections, total = self._get_store().list_connections(
+            query, offset, limit
+        )
+        return {
+            "query": query,
+            "offset": offset,
+            "total": total,
+            "connections": connections,
+        }
 
     def save_connection_to_config_file_and_connect(
         self,
         connection_data,
         *,
         connect=True,
+        before_save=None,
+        register=None,
     ):
         """
         Connects to the database specified in the connection_data. If connection
@@ -109,6 +241,14 @@ class ConnectorWidgetManager:
         connect: bool
             If True, will attempt to connect to the database
 
+        before_save: callable, optional
+            Called after connecting and before updating the config file, it
+            can raise an exception to prevent the connection from being stored
+
+        register: callable, optional
+            Receives the connection instead of registering it (see
+            connect_to_database)
+
         Returns
         -------
         connection_name: str
@@ -143,14 +283,38 @@ class ConnectorWidgetManager:
             "port": port,
         }
 
+        # the password is fetched from a provider (e.g., a token)
+        if connection_data.get("credentials"):
+            url_data["password"] = None
+            url_data["credentials"] = connection_data["credentials"]
+            url_data["credentials_ttl"] = connection_data.get("credentialsTtl")
+        elif existing_alias and not password:
+            # the form doesn't show the provider, keep the edited connection's
+            # one (unless a password was entered instead)
+            stored = self._get_store().get_section(existing_alias) or {}
+            url_data.update({k: stored[k] for k in CREDENTIAL_KEYS if k in stored})
+
         # before updating the config file, we need to make sure that the connection
         # details are valid
         if connect:
+            url_args, credentials = split_credentials(url_data)
+
+            if credentials is not None:
+                url_args["username"] = credentials().username or user_name
+
             connection_str = str(
-                URL.create(**url_data).render_as_string(hide_password=False)
+                URL.create(**url_args).render_as_string(hide_password=False)
             )
 
-            self.connect_to_database(connection_str, connection_name)
+            self.connect_to_database(
+                connection_str,
+                connection_name,
+                credentials=credentials,
+                register=register,
+            )
+
+        if before_save is not None:
+            before_save()
 
         self._save_new_section_to_config_file(connection_name, url_data, existing_alias)
 
@@ -162,52 +326,564 @@ class ConnectorWidgetManager:
         """
         Stores connection in the config file
         """
-        config = ConnectorWidgetManager()._get_config()
+        self._get_store().save(
+            connection_name,
+            {k: v for k, v in connection_data.items() if v},
+            replace=existing_alias,
+        )
 
-        if existing_alias:
-            del config[existing_alias]
+    def connect_to_database_in_section(self, *, connection_name, register=None):
+        """
+        Connect to a database by reading a given section from the connections file.
+        If register is passed, it receives the connection instead of registering
+        it (see connect_to_database)
+        """
+        connection_string, credentials = self._get_connection_string_and_credentials(
+            connection_name
+        )
 
-        config[connection_name] = {k: v for k, v in connection_data.items() if v}
+        self.connect_to_database(
+            connection_string,
+            connection_name,
+            credentials=credentials,
+            register=register,
+        )
 
-        path_to_config_file = Path(ConnectorWidgetManager().get_path_to_config_file())
+    def connect_to_database(
+        self, connection_str, connection_name, *, credentials=None, register=None
+    ):
+        """
+        Connect to a database using a connection string and alias. Engines are
+        kept in a registry so reconnecting reuses the existing connection pool.
+        If credentials is passed, the engine gets the password from it (see
+        EngineRegistry.get). Unless the connection is already open, quick checks
+        run before connecting so a missing driver or a wrong host or port fail
+        right away (see jupysql_plugin.widgets.preflight)
+
+        The connection becomes the current one right away, unless register is
+        passed: it's called with a PendingConnection instead (e.g., so a
+        connection opened in a worker thread is registered in the kernel's)
+        """
+        try:
+            engine = engines.get(
+                connection_name, connection_str, credentials=credentials
+            )
+        except Exception:
+            engines.dispose(connection_name)
+            _run_preflight(connection_str)
+
+            def register_connection_str():
+                # ConnectionManager.set contains the error handling logic that
+                # helps the user diagnose connection errors (e.g., missing
+                # drivers) so we let it raise the error
+                with instrumentation.span("connection_manager.set"):
+                    ConnectionManager.set(
+                        _with_password(connection_str, credentials),
+                        alias=connection_name,
+                        displaycon=False,
+                    )
+
+            pending = PendingConnection(register_connection_str)
+        else:
+            if not _is_open(connection_name, engine):
+                _run_preflight(connection_str)
+
+                # opening a server connection is what takes time, the pool keeps
+                # it for JupySQL (other pools keep one connection per thread)
+                if isinstance(engine.pool, QueuePool):
+                    with instrumentation.span("connections.open"):
+                        engine.connect().close()
+
+            def register_engine():
+                existing = ConnectionManager.connections.get(connection_name)
+
+                # the connection is already open, just make it the current one
+                if _is_open(connection_name, engine):
+                    ConnectionManager.current = existing
+                    return
+
+                if existing is not None:
+                    ConnectionManager.close_connection_with_descriptor(
+                        connection_name
+                    )
+
+                with instrumentation.span("connection_manager.set"):
+                    ConnectionManager.set(
+                        engine, alias=connection_name, displaycon=False
+                    )
+
+            def close_engine():
+                if not _is_open(connection_name, engine):
+                    engines.dispose(connection_name)
+
+            pending = PendingConnection(register_engine, close_engine)
+
+        if register is None:
+            pending.register()
+        else:
+            register(pending)
+
+    def is_connected(self, connection_name) -> bool:
+        """Returns True if there's an open connection with the given alias"""
+        return connection_name in ConnectionManager.connections
+
+    def get_current_connection(self):
+        """Returns the connection that %sql is currently using (if any)"""
+        return ConnectionManager.current
+
+    def close_connection(self, connection_name, *, fallback=None):
+        """
+        Closes the connection with the given alias (if it's open). If it was the
+        current connection, fallback becomes the current one
+        """
+        connection = ConnectionManager.connections.get(connection_name)
 
-        if not path_to_config_file.parent.exists():
-            path_to_config_file.parent.mkdir(parents=True)
+        if connection is None:
+            return
 
-        with open(path_to_config_file, "w") as config_file:
-            config.write(config_file)
+        ConnectionManager.close_connection_with_descriptor(connection_name)
 
-    def connect_to_database_in_section(self, *, connection_name):
+        if ConnectionManager.current is connection:
+            ConnectionManager.current = fallback
+
+    def check_connection(self, connection_name) -> dict:
         """
-        Connect to a database by reading a given section from the connections file.
+        Connects to a stored connection and runs a trivial query. Returns a
+        dictionary with the status ("ok" or "error") and the time it took to
+        connect and to run the query (in milliseconds). This doesn't change the
+        connections that %sql uses: the check uses its own engine (without a
+        pool), so it doesn't leave connections open or replace the engine of
+        an open connection
         """
-        connection_string = self._get_connection_string_from_section_in_config_file(
-            connection_name
+        try:
+            (
+                connection_str,
+                credentials,
+            ) = self._get_connection_string_and_credentials(connection_name)
+            engine = _create_throwaway_engine(
+                _with_password(connection_str, credentials)
+            )
+
+            try:
+                start = time.perf_counter()
+
+                with engine.connect() as conn:
+                    connected = time.perf_counter()
+                    conn.execute(sqlalchemy.select(sqlalchemy.literal(1))).fetchall()
+                    finished = time.perf_counter()
+            finally:
+                engine.dispose()
+        except Exception as e:
+            return {
+                "name": connection_name,
+                "status": "error",
+                "error": f"{type(e).__name__}: {e}",
+            }
+
+        return {
+            "name": connection_name,
+            "status": "ok",
+            "connect_ms": round((connected - start) * 1000, 1),
+            "roundtrip_ms": round((finished - connected) * 1000, 1),
+        }
+
+    def check_connections(self, connection_names=None, *, max_workers=8, timeout=10):
+        """
+        Checks stored connections concurrently and yields the result of each one
+        (see check_connection) as soon as it's available
+
+        Parameters
+        ----------
+        connection_names: list, optional
+            Connections to check, defaults to all the connections in the file
+
+        max_workers: int
+            Maximum number of connections to check at the same time
+
+        timeout: float
+            Seconds to wait for each connection once its check started, slower
+            connections are reported with status "timeout"
+        """
+        if connection_names is None:
+            connection_names = self._get_store().get_names()
+
+        def on_timeout(name):
+            return {
+                "name": name,
+                "status": "timeout",
+                "error": f"Timed out after {timeout} seconds",
+            }
+
+        yield from _run_concurrently(
+            self.check_connection,
+            connection_names,
+            max_workers=max_workers,
+            timeout=timeout,
+            on_timeout=on_timeout,
         )
 
-        self.connect_to_database(connection_string, connection_name)
+    def import_connections(
+        self,
+        source,
+        *,
+        connect=True,
+        overwrite=False,
+        allow_commands=False,
+        max_workers=8,
+        timeout=10,
+    ) -> list:
+        """
+        Validates many connections concurrently and stores the valid ones in a
+        single write of the connections file
+
+        Parameters
+        ----------
+        source: list or str
+            A list of connections (dictionaries with a name or connectionName,
+            a driver and the other connection details) or the path to an INI or
+            YAML file with connections
+
+        connect: bool
+            If True, connects to each database (and runs a trivial query) to
+            validate it, otherwise only the connection details are validated
+
+        overwrite: bool
+            If True, replaces stored connections with the same name, otherwise
+            they're reported as errors
+
+        allow_commands: bool
+            If True, connections whose credentials provider runs a command
+            (command:...) can be imported (and the command runs to validate
+            them if connect is True), otherwise they're reported as invalid.
+            The credential cache must allow commands too
+
+        max_workers: int
+            Maximum number of connections to validate at the same time
+
+        timeout: float
+            Seconds to wait for each connection once its validation started
+
+        Returns
+        -------
+        results: list
+            One dictionary per entry (in the same order) with the name, the
+            status ("imported", "invalid", "error" or "timeout") and the error
+        """
+        entries = _load_connections_to_import(source)
+        results = [None] * len(entries)
+        stored = set() if overwrite else set(self._get_store().get_names())
+        seen = set()
+        sections = {}
+
+        for i, entry in enumerate(entries):
+            try:
+                name, section = _to_section(entry)
+
+                if not allow_commands:
+                    _check_no_commands(section)
+            except ValueError as e:
+                name = entry.get("name") if isinstance(entry, dict) else None
+                results[i] = _import_result(name, "invalid", e)
+                continue
+
+            if name in seen:
+                error = ValueError(f"Duplicated connection name: {name!r}")
+                results[i] = _import_result(name, "invalid", error)
+            elif name in stored:
+                error = exceptions.ConnectionWithNameAlreadyExists(name)
+                results[i] = _import_result(name, "error", error)
+            else:
+                sections[i] = (name, section)
+
+            seen.add(name)
+
+        def validate(i):
+            name, section = sections[i]
+
+            try:
+                _validate_section(section, connect=connect)
+            except (ValueError, TypeError, SyntaxError) as e:
+                return i, _import_result(name, "invalid", e)
+            except Exception as e:
+                return i, _import_result(name, "error", e)
+
+            return i, None
+
+        def on_timeout(i):
+            error = TimeoutError(f"Timed out after {timeout} seconds")
+            return i, _import_result(sections[i][0], "timeout", error)
+
+        for i, result in _run_concurrently(
+            validate,
+            list(sections),
+            max_workers=max_workers,
+            timeout=timeout,
+            on_timeout=on_timeout,
+        ):
+            results[i] = result
+
+        valid = [i for i in sections if results[i] is None]
+
+        if valid:
+            skipped = set(
+                self._get_store().save_many(
+                    {sections[i][0]: sections[i][1] for i in valid},
+                    overwrite=overwrite,
+                )
+            )
+        else:
+            skipped = set()
+
+        for i in valid:
+            name = sections[i][0]
 
-    def connect_to_database(self, connection_str, connection_name):
-        """Connect to a database using a connection string and alias"""
-        # this method contains the error handling logic that helps the user diagnose
-        # connection errors so we use this instead of the SQLAlchemy/DBAPIConnection
-        # constructor
-        ConnectionManager.set(connection_str, alias=connection_name, displaycon=False)
+            if name in skipped:
+                # another process stored a connection with this name meanwhile
+                error = exceptions.ConnectionWithNameAlreadyExists(name)
+                results[i] = _import_result(name, "error", error)
+            else:
+                results[i] = {"name": name, "status": "imported"}
+
+        return results
 
     def delete_section_with_name(self, section_name):
         """
         Deletes section from connections file
         """
+        self._get_store().delete(section_name)
+
+
+def _run_concurrently(fn, items, *, max_workers, timeout, on_timeout):
+    """
+    Calls fn(item) for each item in a pool of max_workers threads and yields the
+    results as soon as they're available. Calls that take longer than timeout
+    seconds once they started yield on_timeout(item) instead
+    """
+    if not items:
+        return
+
+    started = {}
+
+    def run(item_id):
+        started[item_id] = time.monotonic()
+        return fn(items[item_id])
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    futures = {executor.submit(run, i): i for i in range(len(items))}
+    pending = set(futures)
+
+    try:
+        while pending:
+            done, pending = wait(
+                pending, timeout=min(timeout, 0.1), return_when=FIRST_COMPLETED
+            )
+
+            for future in done:
+                yield future.result()
+
+            now = time.monotonic()
+            timed_out = {
+                future
+                for future in pending
+                if futures[future] in started
+                and now - started[futures[future]] > timeout
+            }
+
+            # the drivers can't be interrupted so the threads are left running,
+            # their results are ignored
+            for future in timed_out:
+                yield on_timeout(items[futures[future]])
+
+            pending -= timed_out
+    finally:
+        executor.shutdown(wait=False)
+
+
+# keys that can be imported, and the key they're stored as
+_IMPORT_KEYS = {
+    "name": "name",
+    "connectionName": "name",
+    "driver": "drivername",
+    "drivername": "drivername",
+    "username": "username",
+    "password": "password",
+    "host": "host",
+    "port": "port",
+    "database": "database",
+    "query": "query",
+    "credentials": "credentials",
+    "credentials_ttl": "credentials_ttl",
+    "credentialsTtl": "credentials_ttl",
+}
+
+
+def _load_connections_to_import(source):
+    """
+    Returns the list of connections (dictionaries) to import from a list or an
+    INI or YAML file
+    """
+    if not isinstance(source, (str, os.PathLike)):
+        return list(source)
+
+    path = Path(source).expanduser()
+
+    if path.suffix.lower() in {".yaml", ".yml"}:
+        try:
+            import yaml
+        except ModuleNotFoundError as e:
+            raise ModuleNotFoundError(
+                "Importing connections from YAML files requires PyYAML. "
+                "Please install it: pip install pyyaml"
+            ) from e
+
+        data = yaml.safe_load(path.read_text()) or []
+
+        # a mapping of names to connection details or a list of connections
+        if isinstance(data, dict):
+            return [{**(details or {}), "name": name} for name, details in data.items()]
+
+        if not isinstance(data, list):
+            raise ValueError(f"Expected a list or a mapping of connections in {path}")
+
+        return data
+
+    if not path.is_file():
+        raise FileNotFoundError(f"{path} doesn't exist")
+
+    config = ConfigParser()
+    config.read(path)
+    return [{**dict(config.items(name)), "name": name} for name in config.sections()]
+
+
+def _to_section(entry):
+    """
+    Returns the name and section (what's stored in the connections file) of a
+    connection to import
+    """
+    if not isinstance(entry, dict):
+        raise ValueError(f"Expected a dictionary, got {type(entry).__name__}")
+
+    unknown = set(entry) - set(_IMPORT_KEYS)
+
+    if unknown:
+        raise ValueError(f"Unknown connection keys: {', '.join(sorted(unknown))}")
+
+    section = {}
+
+    for key, value in entry.items():
+        if value is not None and value != "":
+            section[_IMPORT_KEYS[key]] = str(value)
+
+    name = section.pop("name", None)
+
+    if not name:
+        raise ValueError("Missing connection key: name")
+
+    if not section.get("drivername"):
+        raise ValueError("Missing connection key: driver")
+
+    return name, section
+
+
+def _parse_section(section):
+    """
+    Returns the URL and the credentials provider (None if there isn't one, see
+    split_credentials) of a section
+
+    Raises
+    ------
+    ValueError
+        If the section isn't a valid URL (e.g., its query isn't a dictionary)
+    """
+    url_args, credentials = split_credentials(section)
+
+    try:
+        if "query" in url_args:
+            url_args["query"] = ast.literal_eval(url_args["query"])
+
+        url = URL.create(**url_args)
+    except (ValueError, SyntaxError, TypeError) as e:
+        raise ValueError(f"Invalid connection: {type(e).__name__}: {e}") from e
+
+    return url, credentials
+
+
+def _check_no_commands(section):
+    """
+    Raises a ValueError if the section's credentials provider runs a command
+    (files being imported might not be trusted)
+    """
+    spec = section.get("credentials")
+
+    if spec and getattr(get_provider(spec), "runs_commands", False):
+        raise ValueError(
+            "Credentials providers that run commands can't be imported unless "
+            "they're explicitly allowed"
+        )
+
+
+def _validate_section(section, *, connect):
+    """
+    Raises an exception if the section isn't a valid connection. If connect is
+    True, also connects to the database and runs a trivial query
+    """
+    url, credentials = _parse_section(section)
+
+    if not connect:
+        return
+
+    preflight.check(url)
+
+    if credentials is not None:
+        url = credentials.apply(url)
+
+    engine = _create_throwaway_engine(url)
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(sqlalchemy.select(sqlalchemy.literal(1))).fetchall()
+    finally:
+        engine.dispose()
+
+
+def _is_open(connection_name, engine):
+    """Returns True if JupySQL has an open connection with the alias and engine"""
+    existing = ConnectionManager.connections.get(connection_name)
+    connection = getattr(existing, "_connection", None)
+    return connection is not None and connection.engine is engine
+
+
+def _run_preflight(connection_str):
+    """Runs the pre-flight checks on a connection string"""
+    try:
+        url = make_url(connection_str)
+    except Exception:
+        # ConnectionManager.set reports invalid connection strings
+        return
+
+    with instrumentation.span("preflight"):
+        preflight.check(url)
+
+
+def _create_throwaway_engine(url):
+    """
+    Returns an engine that doesn't keep connections open (for checks that
+    shouldn't use or change the engines in the registry)
+    """
+    return sqlalchemy.create_engine(url, poolclass=sqlalchemy.pool.NullPool)
+
 
-        config = ConnectorWidgetManager()._get_config()
+def _import_result(name, status, error):
+    return {"name": name, "status": status, "error": f"{type(error).__name__}: {error}"}
 
-        with open(ConnectorWidgetManager().get_path_to_config_file(), "r") as f:
-            config.readfp(f)
 
-        config.remove_section(section_name)
+def _with_password(connection_str, credentials):
+    """Adds the current password from credentials to the connection string"""
+    if credentials is None:
+        return connection_str
 
-        with open(ConnectorWidgetManager().get_path_to_config_file(), "w") as f:
-            config.write(f)
+    url = credentials.apply(make_url(connection_str))
+    return str(url.render_as_string(hide_password=False))
 
 
 def _serialize_connections(connections):
@@ -1,14 +1,129 @@
 from jupysql_plugin import __version__, _module_name
 from jupysql_plugin.widgets.db_templates import CONNECTIONS_TEMPLATES, DRIVER_TO_DBNAME
-from jupysql_plugin.widgets.connections import (
-    _serialize_connections,
-    ConnectorWidgetManager,
-)
 from jupysql_plugin import exceptions
+from jupysql_plugin.instrumentation import instrumentation
 
 from ipywidgets import DOMWidget
-from traitlets import Unicode, Dict
+from traitlets import Unicode, Dict, Float, Int
+import asyncio
 import json
+import threading
+
+
+# the methods handled by ConnectorWidget._dispatch_message, spans of other
+# methods share a name so frontend input can't create arbitrary span names
+_METHODS = frozenset(
+    {
+        "cancel_connect",
+        "check_all_connections",
+        "check_config_file",
+        "connect",
+        "connections_changed",
+        "delete_connection",
+        "get_stats",
+        "import_connections",
+        "list_connections",
+        "resync_connections",
+        "submit_new_connection",
+    }
+)
+
+
+class _ConnectionAttempt:
+    """
+    A connection that's being established in a worker thread. The worker and
+    the timeout/cancel handlers race to settle it, only the first one wins. The
+    worker opens the connection (see ConnectorWidgetManager.connect_to_database)
+    and complete registers it in the kernel's thread, so connections that nobody
+    waits for anymore never become the current one
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.thread = None
+        self.timer = None
+        self._lock = threading.Lock()
+        self._outcome = None
+        self._pending = None
+
+    def _settle(self, outcome):
+        with self._lock:
+            if self._outcome is None:
+                self._outcome = outcome
+
+            return self._outcome == outcome
+
+    def set_pending(self, pending):
+        """Called by the worker with the connection it opened"""
+        self._pending = pending
+
+    def _take_pending(self):
+        pending, self._pending = self._pending, None
+        return pending
+
+    def complete(self):
+        """
+        Called in the kernel's thread once the worker finished: registers the
+        connection, or closes it and returns False if the attempt had already
+        been abandoned
+        """
+        pending = self._take_pending()
+
+        if not self._settle("completed"):
+            if pending is not None:
+                pending.close()
+
+            return False
+
+        if pending is not None:
+            pending.register()
+
+        return True
+
+    def fail(self):
+        """
+        Called by the worker if connecting (or storing the connection) failed,
+        closes the connection (if it was opened) and returns False if the
+        attempt had already been abandoned
+        """
+        pending = self._take_pending()
+
+        if pending is not None:
+            pending.close()
+
+        # the worker itself settles the attempt as completed before storing the
+        # connection (see ensure_not_abandoned), the error still has to be sent
+        with self._lock:
+            if self._outcome is None:
+                self._outcome = "failed"
+
+            return self._outcome != "abandoned"
+
+    def abandon(self):
+        """
+        Called on timeout or cancellation, returns False if the worker had
+        already finished
+        """
+        return self._settle("abandoned")
+
+    def ensure_not_abandoned(self):
+        """
+        Raises ConnectionCancelled if the attempt has been abandoned, otherwise
+        it can't be anymore (the connection is registered by complete)
+        """
+        if not self._settle("completed"):
+            raise exceptions.ConnectionCancelled(self.name)
+
+
+def _get_kernel_loop():
+    """
+    Returns the event loop of the thread that handles the messages (None if
+    there isn't one, e.g., when messages are handled outside a kernel)
+    """
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
 
 
 class ConnectorWidget(DOMWidget):
@@ -23,16 +138,57 @@ class ConnectorWidget(DOMWidget):
     _view_module = Unicode(_module_name).tag(sync=True)
     _view_module_version = Unicode(__version__).tag(sync=True)
 
+    # the first page of connections, the frontend requests the other ones with
+    # the list_connections message
     connections = Unicode().tag(sync=True)
+    connections_total = Int().tag(sync=True)
     connections_templates = Unicode().tag(sync=True)
     driver_to_dbname = Dict().tag(sync=True)
 
+    connect_timeout = Float(
+        60.0,
+        allow_none=True,
+        help="Seconds to wait for a connection before giving up (None to wait "
+        "indefinitely)",
+    )
+
+    check_timeout = Float(
+        10.0, help="Seconds to wait for each connection when checking all of them"
+    )
+
+    check_max_workers = Int(
+        8, help="Maximum number of connections to check at the same time"
+    )
+
+    page_size = Int(100, help="Number of connections sent to the frontend at a time")
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
+        self._connection_attempt = None
+        self._check_thread = None
+        self._import_thread = None
+        # the frontend starts with version 0 (the connections trait) and keeps
+        # track of the version of the patches it applies
+        self._connections_version = 0
+        self._connections_lock = threading.Lock()
+        # version of the server extension's index of the connections file the
+        # frontend is in sync with (see connections_changed)
+        self._server_version = None
+        # changes this widget sent that the server extension hasn't reported
+        # yet: name -> connection (None if it was removed)
+        self._unconfirmed = {}
+
+        # imported here so importing the widget (JupySQL does it when it's
+        # loaded) doesn't import the connection management code
+        from jupysql_plugin.widgets.connections import ConnectorWidgetManager
+
         self.widget_manager = ConnectorWidgetManager()
-        self.stored_connections = self.widget_manager.get_connections_from_config_file()
-        self.connections = _serialize_connections(self.stored_connections)
+
+        # the other connections are read from the store when they're requested
+        page = self.widget_manager.list_connections(limit=self.page_size)
+        self.connections = json.dumps(page["connections"])
+        self.connections_total = page["total"]
         self.connections_templates = json.dumps(CONNECTIONS_TEMPLATES)
         self.driver_to_dbname = DRIVER_TO_DBNAME
 
@@ -42,6 +198,14 @@ class ConnectorWidget(DOMWidget):
         """
         Handles messages from front
         """
+        method = content.get("method")
+        known = isinstance(method, str) and method in _METHODS
+        name = method if known else "unknown_method"
+
+        with instrumentation.span(f"connector_widget.{name}", method=str(method)):
+            self._dispatch_message(content)
+
+    def _dispatch_message(self, content):
         if "method" in content:
             method = content["method"]
 
@@ -54,60 +218,353 @@ class ConnectorWidget(DOMWidget):
                 connection = content["data"]
                 self.widget_manager.delete_section_with_name(connection["name"])
                 self.send({"method": "deleted", "message": connection["name"]})
+                self._send_connections_patch(removed=[connection["name"]])
 
-                self.stored_connections = (
-                    self.widget_manager.get_connections_from_config_file()
+            # the frontend is out of sync, send the first page
+            elif method == "resync_connections":
+                self._send_all_connections()
+
+            # the server extension found changes in the connections file, the
+            # frontend forwards them so we don't have to re-read the file
+            elif method == "connections_changed":
+                self._apply_server_event(content["data"])
+
+            # the frontend is showing (or searching) a part of the list
+            elif method == "list_connections":
+                data = content.get("data", {})
+                page = self.widget_manager.list_connections(
+                    query=data.get("query", ""),
+                    offset=data.get("offset", 0),
+                    limit=min(data.get("limit", self.page_size), self.page_size),
                 )
-                connections = _serialize_connections(self.stored_connections)
-                self.send({"method": "update_connections", "message": connections})
+                self.send({"method": "connections_page", "message": page})
 
             # user wants to connect to a database that's been stored in the config file
             elif method == "connect":
                 connection = content["data"]
 
-                try:
+                def connect(attempt):
                     self.widget_manager.connect_to_database_in_section(
-                        connection_name=connection["name"]
+                        connection_name=attempt.name, register=attempt.set_pending
                     )
-                except Exception as e:
-                    self.send_error_message_to_frontend(
-                        method="connection_error", error=e
-                    )
-                else:
-                    self.send({"method": "connected", "message": connection["name"]})
+
+                self._start_connection_attempt(connection["name"], connect)
 
             # store a new connection in the config file and connect to it
             elif method == "submit_new_connection":
                 new_connection_data = content["data"]
-                connection_name = new_connection_data.get("connectionName")
 
-                try:
-                    connection_name = (
-                        self.widget_manager.save_connection_to_config_file_and_connect(
-                            new_connection_data
-                        )
-                    )
-                except exceptions.ConnectionWithNameAlreadyExists as e:
-                    self.send_error_message_to_frontend(
-                        method="connection_name_exists_error", error=e
+                def connect(attempt):
+                    self.widget_manager.save_connection_to_config_file_and_connect(
+                        new_connection_data,
+                        before_save=attempt.ensure_not_abandoned,
+                        register=attempt.set_pending,
                     )
-                except Exception as e:
-                    self.send_error_message_to_frontend(
-                        method="connection_error", error=e
-                    )
-                else:
-                    self.send({"method": "connected", "message": connection_name})
-                    self.stored_connections = (
-                        self.widget_manager.get_connections_from_config_file()
+
+                self._start_connection_attempt(
+                    new_connection_data.get("connectionName"),
+                    connect,
+                    on_connected=lambda: self._send_saved_connection(
+                        new_connection_data.get("connectionName"),
+                        new_connection_data.get("existingConnectionAlias"),
+                    ),
+                )
+
+            # check that all stored connections work, results are streamed back
+            elif method == "check_all_connections":
+                self._check_thread = threading.Thread(
+                    target=self._check_all_connections,
+                    name="jupysql-plugin-check-connections",
+                    daemon=True,
+                )
+                self._check_thread.start()
+
+            # validate and store many connections at once, the results are sent
+            # when all of them have been validated
+            elif method == "import_connections":
+                self._import_thread = threading.Thread(
+                    target=self._import_connections,
+                    args=(content.get("data", {}),),
+                    name="jupysql-plugin-import-connections",
+                    daemon=True,
+                )
+                self._import_thread.start()
+
+            # timing statistics (see jupysql_plugin.instrumentation)
+            elif method == "get_stats":
+                self.send({"method": "stats", "message": instrumentation.get_stats()})
+
+            # user gave up on the connection that's being established
+            elif method == "cancel_connect":
+                attempt = self._connection_attempt
+
+                if attempt is not None and attempt.abandon():
+                    self.send(
+                        {"method": "connection_cancelled", "message": attempt.name}
                     )
-                    connections = _serialize_connections(self.stored_connections)
-                    self.send({"method": "update_connections", "message": connections})
 
             else:
                 raise ValueError(f"Method {method} is not supported")
         else:
             raise ValueError("Method is not specified")
 
+    def _send_saved_connection(self, name, existing_alias):
+        """Sends the frontend the connection that was stored (or edited)"""
+        connection = self.widget_manager.get_connection(name)
+
+        if connection is None:
+            # e.g., another process deleted it meanwhile
+            self._send_all_connections()
+        elif existing_alias == name:
+            self._send_connections_patch(changed=[connection])
+        elif existing_alias:
+            self._send_connections_patch(removed=[existing_alias], added=[connection])
+        else:
+            self._send_connections_patch(added=[connection])
+
+    def _send_connections_patch(
+        self, *, added=(), removed=(), changed=(), from_server=False
+    ):
+        """
+        Sends the frontend the connections that were added, removed or changed
+        (by this widget unless from_server is True). The frontend applies the
+        patch only if it has the version the patch is based on, otherwise it
+        asks for a resync
+        """
+        with self._connections_lock:
+            self._connections_version += 1
+            patch = {
+                "added": list(added),
+                "removed": list(removed),
+                "changed": list(changed),
+                "from_version": self._connections_version - 1,
+                "version": self._connections_version,
+            }
+
+            # the server extension reports them too, they're skipped then
+            if self._server_version is not None and not from_server:
+                for connection in patch["added"] + patch["changed"]:
+                    self._unconfirmed[connection["name"]] = connection
+
+                for name in patch["removed"]:
+                    self._unconfirmed[name] = None
+
+        self.send({"method": "patch_connections", "message": patch})
+
+    def _apply_server_event(self, event):
+        """
+        Forwards a change pushed by the server extension's index of the stored
+        connections (see jupysql_plugin.connections_index) without the changes
+        this widget already sent. If we missed an event, the frontend gets the
+        first page again. Events about another store are ignored
+        """
+        path = event.get("path")
+
+        if path is None or not self.widget_manager.is_connections_store(path):
+            with self._connections_lock:
+                self._server_version = None
+                self._unconfirmed.clear()
+
+            return
+
+        with self._connections_lock:
+            subscribed = self._server_version is not None
+            in_sync = "added" in event and event.get("from_version") == (
+                self._server_version
+            )
+            self._server_version = event.get("version")
+
+            # the snapshot sent when the frontend subscribes, the connections it
+            # has were read after the version it describes
+            if "added" not in event and not subscribed:
+                return
+
+            if in_sync:
+                patch = self._skip_unconfirmed(event)
+
+        if not in_sync:
+            self._send_all_connections()
+            return
+
+        # e.g., the change was made by this widget and we already sent it
+        if any(patch.values()):
+            self._send_connections_patch(**patch, from_server=True)
+
+    def _skip_unconfirmed(self, event):
+        """
+        Returns the part of a server event the frontend doesn't have: the
+        changes this widget sent are removed (must be called with the lock held)
+        """
+        patch = {"added": [], "removed": [], "changed": []}
+        missing = object()
+
+        for key in ("added", "changed"):
+            for connection in event[key]:
+                sent = self._unconfirmed.pop(connection["name"], missing)
+
+                if sent is missing:
+                    patch[key].append(connection)
+                elif sent is None:
+                    # we removed it, another process stored it again
+                    patch["added"].append(connection)
+                elif sent != connection:
+                    patch["changed"].append(connection)
+
+        for name in event["removed"]:
+            if self._unconfirmed.pop(name, missing) is not None:
+                patch["removed"].append(name)
+
+        return patch
+
+    def _send_all_connections(self):
+        page = self.widget_manager.list_connections(limit=self.page_size)
+
+        with self._connections_lock:
+            self._connections_version += 1
+            self._unconfirmed.clear()
+            version = self._connections_version
+
+        self.send(
+            {
+                "method": "update_connections",
+                "message": json.dumps(page["connections"]),
+                "version": version,
+                "total": page["total"],
+            }
+        )
+
+    def _start_connection_attempt(self, name, connect, *, on_connected=None):
+        """
+        Runs connect(attempt) in a worker thread so the kernel can keep executing
+        cells while the connection is established. The frontend receives a
+        "connecting" message, followed by "connected" or "connection_error"
+        """
+        # only one connection can be in progress, the user moved on from the
+        # previous one
+        if self._connection_attempt is not None:
+            self._connection_attempt.abandon()
+
+        attempt = _ConnectionAttempt(name)
+        self._connection_attempt = attempt
+
+        self.send({"method": "connecting", "message": name})
+
+        attempt.thread = threading.Thread(
+            target=self._run_connection_attempt,
+            args=(attempt, connect, on_connected, _get_kernel_loop()),
+            name=f"jupysql-plugin-connect-{name}",
+            daemon=True,
+        )
+
+        if self.connect_timeout is not None:
+            attempt.timer = threading.Timer(
+                self.connect_timeout, self._on_connection_timeout, args=(attempt,)
+            )
+            attempt.timer.daemon = True
+            attempt.timer.start()
+
+        attempt.thread.start()
+
+    def _run_connection_attempt(self, attempt, connect, on_connected, loop):
+        try:
+            connect(attempt)
+        except Exception as e:
+            if attempt.fail() and not isinstance(e, exceptions.ConnectionCancelled):
+                self._cancel_timer(attempt)
+
+                if isinstance(e, exceptions.ConnectionWithNameAlreadyExists):
+                    method = "connection_name_exists_error"
+                else:
+                    method = "connection_error"
+
+                self.send_error_message_to_frontend(method=method, error=e)
+
+            return
+
+        # cells might be using the current connection, it's changed in the
+        # kernel's thread (between cells)
+        if loop is None:
+            self._finish_connection_attempt(attempt, on_connected)
+        else:
+            loop.call_soon_threadsafe(
+                self._finish_connection_attempt, attempt, on_connected
+            )
+
+    def _finish_connection_attempt(self, attempt, on_connected):
+        try:
+            connected = attempt.complete()
+        except Exception as e:
+            self._cancel_timer(attempt)
+            self.send_error_message_to_frontend(method="connection_error", error=e)
+            return
+
+        if connected:
+            self._cancel_timer(attempt)
+            self.send({"method": "connected", "message": attempt.name})
+
+            if on_connected is not None:
+                on_connected()
+
+    def _check_all_connections(self):
+        try:
+            names = self.widget_manager.get_connection_names()
+            self.send({"method": "connection_check_started", "message": names})
+
+            results = self.widget_manager.check_connections(
+                names, max_workers=self.check_max_workers, timeout=self.check_timeout
+            )
+
+            for result in results:
+                self.send({"method": "connection_status", "message": result})
+        except Exception as e:
+            self.send_error_message_to_frontend(
+                method="connection_check_error", error=e
+            )
+        finally:
+            # the frontend re-enables the button
+            self.send({"method": "connection_check_finished"})
+
+    def _import_connections(self, data):
+        try:
+            results = self.widget_manager.import_connections(
+                data["path"] if "path" in data else data.get("connections", []),
+                connect=data.get("connect", True),
+                overwrite=data.get("overwrite", False),
+                allow_commands=data.get("allowCommands", False),
+                max_workers=self.check_max_workers,
+                timeout=self.check_timeout,
+            )
+        except Exception as e:
+            self.send_error_message_to_frontend(method="import_error", error=e)
+            return
+
+        self.send({"method": "connections_imported", "message": results})
+        imported = [r["name"] for r in results if r["status"] == "imported"]
+
+        if not imported:
+            return
+
+        # overwritten connections would have to be looked up to know whether
+        # they were added or changed, the frontend reloads the list instead
+        if data.get("overwrite", False) or len(imported) > self.page_size:
+            self._send_all_connections()
+        else:
+            added = [self.widget_manager.get_connection(name) for name in imported]
+            self._send_connections_patch(added=[c for c in added if c is not None])
+
+    def _on_connection_timeout(self, attempt):
+        if attempt.abandon():
+            error = TimeoutError(
+                f"Could not connect to {attempt.name!r} "
+                f"after {self.connect_timeout} seconds"
+            )
+            self.send_error_message_to_frontend(method="connection_error", error=error)
+
+    @staticmethod
+    def _cancel_timer(attempt):
+        if attempt.timer is not None:
+            attempt.timer.cancel()
+
     def send_error_message_to_frontend(self, *, method, error):
         """Display an error message in the frontend
 
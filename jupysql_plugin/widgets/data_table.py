@@ -0,0 +1,95 @@
+from ipywidgets import DOMWidget
+from traitlets import Int, Unicode
+
+from jupysql_plugin import __version__, _module_name, table_widget
+
+try:
+    from sql.util import parse_sql_results_to_json
+except (ModuleNotFoundError, ImportError) as e:
+    raise ModuleNotFoundError(
+        "Your jupysql version isn't compatible with this version of jupysql-plugin. "
+        "Please update: pip install jupysql --upgrade"
+    ) from e
+
+
+class DataTableWidget(DOMWidget):
+    """
+    Pages through a table or the result of a query. Sorting and filtering a
+    table run in the database, a query runs once and its result is stored in
+    the spill store (see jupysql_plugin.table_widget) until the widget is closed
+    """
+
+    _model_name = Unicode("DataTableModel").tag(sync=True)
+    _model_module = Unicode(_module_name).tag(sync=True)
+    _model_module_version = Unicode(__version__).tag(sync=True)
+    _view_name = Unicode("DataTableView").tag(sync=True)
+    _view_module = Unicode(_module_name).tag(sync=True)
+    _view_module_version = Unicode(__version__).tag(sync=True)
+
+    table = Unicode(None, allow_none=True).tag(sync=True)
+    query = Unicode(None, allow_none=True).tag(sync=True)
+    page_size = Int(10).tag(sync=True)
+
+    def __init__(self, table=None, *, query=None, **kwargs):
+        if (table is None) == (query is None):
+            raise ValueError("Pass either a table or a query")
+
+        super().__init__(table=table, query=query, **kwargs)
+        self.on_msg(self._handle_message)
+
+    def _get_page(self, data):
+        """Returns the rows, columns and number of rows (or None) of a page"""
+        request = {
+            "page": data.get("page", 0),
+            "nRows": data.get("nRows", self.page_size),
+            "sort": data.get("sort"),
+            "filters": data.get("filters"),
+        }
+
+        if self.query is not None:
+            return table_widget.get_query_page(
+                {**request, "query": self.query, "key": self.model_id}
+            )
+
+        count = data.get("count", False)
+        rows, columns, *total = table_widget.get_page(
+            {**request, "table": self.table, "count": count}
+        )
+        return rows, columns, total[0] if total else None
+
+    def _handle_message(self, widget, content, buffers):
+        """
+        Handles messages from front
+        """
+        method = content.get("method")
+
+        if method != "get_page":
+            raise ValueError(f"Method {method} is not supported")
+
+        data = content.get("data", {})
+
+        try:
+            rows, columns, total = self._get_page(data)
+        except Exception as e:
+            self.send(
+                {
+                    "method": "error",
+                    "request": data,
+                    "message": f"{type(e).__name__}: {e}",
+                }
+            )
+        else:
+            page = {
+                "columns": list(columns),
+                # JSON string, formatted like JupySQL's table widget rows
+                "rows": parse_sql_results_to_json(rows, columns),
+                "total": total,
+            }
+            self.send({"method": "page", "request": data, "message": page})
+
+    def close(self):
+        # the widget's stored result (if any) is no longer needed
+        if self.query is not None and self.comm is not None:
+            table_widget.evict_query(self.model_id)
+
+        super().close()
@@ -0,0 +1,164 @@
+import threading
+import time
+
+import sqlalchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+class EngineRegistry:
+    """
+    Keeps one SQLAlchemy engine per stored connection so reconnecting to a
+    connection reuses its (warm) connection pool instead of creating a new engine
+
+    Parameters
+    ----------
+    pool_size : int
+        Number of connections to keep in each pool (only applies to dialects that
+        use a QueuePool)
+
+    pool_pre_ping : bool
+        If True, connections are tested before being checked out from the pool so
+        stale ones are replaced transparently
+
+    idle_timeout : float or None
+        Engines that haven't been used for this many seconds (and have no
+        checked out connections) are disposed. None disables eviction
+    """
+
+    def __init__(self, *, pool_size=5, pool_pre_ping=True, idle_timeout=600):
+        self.pool_size = pool_size
+        self.pool_pre_ping = pool_pre_ping
+        self.idle_timeout = idle_timeout
+
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    def configure(self, **settings):
+        """
+        Updates pool_size, pool_pre_ping and/or idle_timeout. pool_size and
+        pool_pre_ping only apply to engines created afterwards
+        """
+        unknown = set(settings) - {"pool_size", "pool_pre_ping", "idle_timeout"}
+
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+
+        for key, value in settings.items():
+            setattr(self, key, value)
+
+    def get(self, name, connection_str, *, credentials=None):
+        """
+        Returns the engine for the connection with the given name, creating it if
+        needed. If the connection string changed (e.g., the connection was
+        edited), the previous engine is disposed
+
+        If credentials (a jupysql_plugin.credentials.CredentialSource) is passed,
+        the connection string doesn't contain the password: the engine asks for
+        the current one every time it opens a connection, so refreshed tokens
+        don't require a new engine
+        """
+        self.evict_idle()
+
+        with self._lock:
+            entry = self._engines.get(name)
+
+            if entry is not None and entry["connection_str"] == connection_str:
+                entry["credentials"] = credentials
+                entry["last_used"] = time.monotonic()
+                return entry["engine"]
+
+            new_entry = {
+                "connection_str": connection_str,
+                "credentials": credentials,
+                "last_used": time.monotonic(),
+            }
+            new_entry["engine"] = self._create_engine(connection_str, new_entry)
+
+            if entry is not None:
+                entry["engine"].dispose()
+
+            self._engines[name] = new_entry
+
+        return new_entry["engine"]
+
+    def _create_engine(self, connection_str, entry):
+        url = make_url(connection_str)
+        kwargs = {"pool_pre_ping": self.pool_pre_ping}
+
+        pool_class = url.get_dialect().get_pool_class(url)
+
+        # other pools (e.g., SingletonThreadPool for in-memory SQLite) do not
+        # support a fixed size
+        if issubclass(pool_class, QueuePool):
+            kwargs["pool_size"] = self.pool_size
+
+        engine = sqlalchemy.create_engine(url, **kwargs)
+
+        def set_credentials(dialect, connection_record, cargs, cparams):
+            if entry["credentials"] is not None:
+                _set_credentials(dialect, url, entry["credentials"], cargs, cparams)
+
+        event.listen(engine, "do_connect", set_credentials)
+        return engine
+
+    def evict_idle(self):
+        """Disposes engines that have been idle for longer than idle_timeout"""
+        if self.idle_timeout is None:
+            return
+
+        now = time.monotonic()
+
+        with self._lock:
+            idle = [
+                name
+                for name, entry in self._engines.items()
+                if now - entry["last_used"] > self.idle_timeout
+                and not _has_checked_out_connections(entry["engine"])
+            ]
+
+            for name in idle:
+                self._engines.pop(name)["engine"].dispose()
+
+    def dispose(self, name):
+        """Disposes the engine for the connection with the given name (if any)"""
+        with self._lock:
+            entry = self._engines.pop(name, None)
+
+        if entry is not None:
+            entry["engine"].dispose()
+
+    def dispose_all(self):
+        """Disposes all engines"""
+        with self._lock:
+            entries = list(self._engines.values())
+            self._engines.clear()
+
+        for entry in entries:
+            entry["engine"].dispose()
+
+    def __contains__(self, name):
+        return name in self._engines
+
+    def __len__(self):
+        return len(self._engines)
+
+
+def _set_credentials(dialect, url, credentials, cargs, cparams):
+    """
+    Replaces the arguments passed to the DBAPI's connect with the ones for the
+    URL with the current credentials (so it works with any dialect)
+    """
+    args, params = dialect.create_connect_args(credentials.apply(url))
+    cargs[:] = args
+    cparams.clear()
+    cparams.update(params)
+
+
+def _has_checked_out_connections(engine):
+    checkedout = getattr(engine.pool, "checkedout", None)
+    return checkedout is not None and checkedout() > 0
+
+
+engines = EngineRegistry()
@@ -0,0 +1,180 @@
+"""
+Quick checks that run before connecting so common mistakes (a driver that isn't
+installed, a typo in the host or the port) fail right away with a specific
+message instead of after the driver's connection timeout. Checks that run out
+of time are inconclusive (e.g., a slow DNS server or a distant database) and
+let the connection go ahead under the driver's own timeout
+"""
+import socket
+import threading
+
+from sqlalchemy.exc import NoSuchModuleError
+
+from jupysql_plugin import exceptions
+
+# backends that connect to a network endpoint and the port they use when the
+# connection doesn't have one. Other backends only check the driver since their
+# host might not be a network host (e.g., a Snowflake account identifier or a
+# BigQuery project)
+DEFAULT_PORTS = {
+    "mariadb": 3306,
+    "mssql": 1433,
+    "mysql": 3306,
+    "oracle": 1521,
+    "postgresql": 5432,
+    "redshift": 5439,
+}
+
+
+class Preflight:
+    """
+    Checks that the driver can be imported, that the host resolves and that
+    the port accepts TCP connections. The network checks only run for the
+    backends in DEFAULT_PORTS that have a host, and they only fail if the host
+    doesn't exist or the connection is refused
+
+    Parameters
+    ----------
+    enabled : bool
+        Whether to run the checks
+
+    timeout : float
+        Seconds to wait for the host to resolve and, separately, for the TCP
+        connection before giving up on the check
+    """
+
+    def __init__(self, *, enabled=True, timeout=0.5):
+        self.enabled = enabled
+        self.timeout = timeout
+
+    def configure(self, **settings):
+        """Updates enabled and/or timeout"""
+        unknown = set(settings) - {"enabled", "timeout"}
+
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+
+        for key, value in settings.items():
+            setattr(self, key, value)
+
+    def check(self, url):
+        """
+        Runs the checks on url (a sqlalchemy.engine.URL)
+
+        Raises
+        ------
+        PreflightCheckFailed
+            If a check fails, its check attribute is "driver", "dns" or "tcp"
+        """
+        if not self.enabled:
+            return
+
+        self.check_driver(url)
+
+        backend = url.get_backend_name()
+
+        # unix sockets (e.g., host=/var/run/postgresql) aren't checked
+        if backend not in DEFAULT_PORTS or not url.host or url.host.startswith("/"):
+            return
+
+        port = url.port or DEFAULT_PORTS[backend]
+        addresses = self.check_host(url.host, port)
+
+        if addresses is not None:
+            self.check_port(url.host, port, addresses)
+
+    def check_driver(self, url):
+        """Imports the dialect and its DBAPI module"""
+        try:
+            dialect_cls = url.get_dialect()
+
+            # renamed in SQLAlchemy 2.0
+            if hasattr(dialect_cls, "import_dbapi"):
+                dialect_cls.import_dbapi()
+            else:
+                dialect_cls.dbapi()
+        except (ImportError, NoSuchModuleError) as e:
+            message = f"Couldn't load the driver for {url.drivername!r}: {e}"
+            suggestion = _get_missing_package_suggestion(e)
+
+            if suggestion:
+                message = f"{message}\n\n{suggestion}"
+
+            raise exceptions.PreflightCheckFailed("driver", message) from e
+
+    def check_host(self, host, port):
+        """
+        Resolves host and returns its addresses (getaddrinfo tuples) or None if
+        it didn't resolve in time
+        """
+        # getaddrinfo doesn't have a timeout, so it runs in a thread that's
+        # abandoned if it takes too long
+        result = {}
+
+        def resolve():
+            try:
+                result["addresses"] = socket.getaddrinfo(
+                    host, port, type=socket.SOCK_STREAM
+                )
+            except OSError as e:
+                result["error"] = e
+
+        thread = threading.Thread(target=resolve, daemon=True)
+        thread.start()
+        thread.join(self.timeout)
+
+        if thread.is_alive():
+            return None
+
+        if "error" in result:
+            raise exceptions.PreflightCheckFailed(
+                "dns", f"Couldn't resolve host {host!r}: {result['error']}"
+            ) from result["error"]
+
+        return result["addresses"]
+
+    def check_port(self, host, port, addresses):
+        """
+        Opens (and closes) a TCP connection to one of the host's addresses. Fails
+        only if every address refuses the connection
+        """
+        error = None
+
+        for family, type_, proto, _, address in addresses:
+            sock = socket.socket(family, type_, proto)
+            sock.settimeout(self.timeout)
+
+            try:
+                sock.connect(address)
+                return
+            except OSError as e:
+                error = e
+            finally:
+                sock.close()
+
+            # a slow handshake or an unreachable network isn't conclusive (e.g.,
+            # a VPN that's still connecting), the driver will try again
+            if not isinstance(error, ConnectionRefusedError):
+                return
+
+        raise exceptions.PreflightCheckFailed(
+            "tcp",
+            f"Couldn't connect to {host}:{port}: the connection was refused, "
+            "is the port correct?",
+        ) from error
+
+
+def _get_missing_package_suggestion(error):
+    """
+    Returns JupySQL's suggestion for a missing driver (e.g., the pip install
+    command) or None if it doesn't have one
+    """
+    try:
+        from sql.connection.connection import get_missing_package_suggestion_str
+
+        return get_missing_package_suggestion_str(error)
+    except Exception:
+        return None
+
+
+preflight = Preflight()
@@ -0,0 +1,374 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+from ipywidgets import DOMWidget
+from sqlalchemy import case, column, func, inspect, select, table
+from traitlets import Unicode, Int, Float
+
+from jupysql_plugin import __version__, _module_name
+
+try:
+    from sql.connection import ConnectionManager
+except (ModuleNotFoundError, ImportError) as e:
+    raise ModuleNotFoundError(
+        "Your jupysql version isn't compatible with this version of jupysql-plugin. "
+        "Please update: pip install jupysql --upgrade"
+    ) from e
+
+
+# dialects whose tables and views are paginated and searched in the database
+# (see _select_tables), the others list every table and paginate in memory
+_INFORMATION_SCHEMA_DIALECTS = {"duckdb", "mariadb", "mysql", "postgresql"}
+_PAGINATED_DIALECTS = _INFORMATION_SCHEMA_DIALECTS | {"sqlite"}
+
+
+class _MetadataCache:
+    """
+    Caches metadata query results per connection, entries expire after ttl
+    seconds and the least recently used ones are dropped when there are more
+    than max_entries
+
+    Parameters
+    ----------
+    max_entries : int
+        Maximum number of results to keep (across connections)
+    """
+
+    def __init__(self, *, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, **settings):
+        """Updates max_entries"""
+        unknown = set(settings) - {"max_entries"}
+
+        if unknown:
+            raise ValueError(f"Unknown settings: {', '.join(sorted(unknown))}")
+
+        with self._lock:
+            for key, value in settings.items():
+                setattr(self, key, value)
+
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, connection_key, key, compute, *, ttl):
+        """
+        Returns the cached value for key, calling compute() if it's missing or
+        expired
+        """
+        now = time.monotonic()
+
+        entry_key = (connection_key, key)
+
+        with self._lock:
+            entry = self._entries.get(entry_key)
+
+            if entry is not None and now - entry[0] < ttl:
+                self._entries.move_to_end(entry_key)
+                return entry[1]
+
+        value = compute()
+
+        with self._lock:
+            self._entries[entry_key] = (now, value)
+            self._entries.move_to_end(entry_key)
+            self._evict()
+
+        return value
+
+    def clear(self, connection_key=None):
+        """Clears the entries for a connection (or all of them)"""
+        with self._lock:
+            if connection_key is None:
+                self._entries.clear()
+            else:
+                for entry_key in [k for k in self._entries if k[0] == connection_key]:
+                    del self._entries[entry_key]
+
+
+_metadata_cache = _MetadataCache()
+
+
+def _paginate(items, *, query, offset, limit):
+    """
+    Filters items whose name contains query (case insensitive) and returns the
+    requested page
+    """
+    if query:
+        query = query.lower()
+        items = [item for item in items if query in item["name"].lower()]
+
+    return {
+        "items": items[offset : offset + limit],
+        "total": len(items),
+        "offset": offset,
+        "limit": limit,
+    }
+
+
+def _select_tables(dialect, schema):
+    """
+    Returns a query with the name and type ("table" or "view") of the tables and
+    views in schema, so they can be paginated and searched in the database
+    (dialect must be one of _PAGINATED_DIALECTS)
+    """
+    if dialect == "sqlite":
+        master = table("sqlite_master", column("name"), column("type"), schema=schema)
+        return select(master.c.name, master.c.type).where(
+            master.c.type.in_(["table", "view"]),
+            ~master.c.name.startswith("sqlite_", autoescape=True),
+        )
+
+    tables = table(
+        "tables",
+        column("table_catalog"),
+        column("table_schema"),
+        column("table_name"),
+        column("table_type"),
+        schema="information_schema",
+    )
+    type_ = case((tables.c.table_type == "VIEW", "view"), else_="table")
+    query = select(tables.c.table_name.label("name"), type_.label("type")).where(
+        tables.c.table_schema == schema
+    )
+
+    # DuckDB lists the tables in every attached database
+    if dialect == "duckdb":
+        query = query.where(tables.c.table_catalog == func.current_database())
+
+    return query
+
+
+def _query_tables_page(inspector, tables, *, query, offset, limit):
+    """
+    Runs the tables query returned by _select_tables with the search filter and
+    the page's LIMIT and OFFSET, and counts the matches
+    """
+    tables = tables.subquery()
+    condition = []
+
+    if query:
+        condition.append(
+            func.lower(tables.c.name).contains(query.lower(), autoescape=True)
+        )
+
+    total = inspector.bind.execute(
+        select(func.count()).select_from(tables).where(*condition)
+    ).scalar()
+    rows = inspector.bind.execute(
+        select(tables.c.name, tables.c.type)
+        .where(*condition)
+        .order_by(tables.c.name)
+        .offset(offset)
+        .limit(limit)
+    ).all()
+
+    return {
+        "items": [{"name": name, "type": type_} for name, type_ in rows],
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+    }
+
+
+class SchemaInspector:
+    """
+    Lists the schemas, tables and columns of a connection. Every method runs a
+    single metadata query for the requested level (never a full catalog scan)
+    and caches the result. Tables are paginated and searched in the database
+    when the dialect allows it, the other levels are served from memory
+
+    Parameters
+    ----------
+    connection_name : str, optional
+        Alias of the connection to inspect, defaults to the current connection
+
+    ttl : float
+        Seconds to keep metadata in the cache
+    """
+
+    def __init__(self, connection_name=None, *, ttl=300):
+        self.connection_name = connection_name
+        self.ttl = ttl
+
+    def _get_connection(self):
+        if self.connection_name:
+            connection = ConnectionManager.connections.get(self.connection_name)
+        else:
+            connection = ConnectionManager.current
+
+        if connection is None:
+            raise RuntimeError(
+                "No active connection. Connect to a database with %sql or the "
+                "connector widget"
+            )
+
+        return connection
+
+    def _cached(self, key, compute):
+        connection = self._get_connection()
+        connection_key = (connection.alias, connection.url)
+
+        def compute_with_inspector():
+            # the inspector runs on the user's connection, don't leave a
+            # transaction open (it could hold locks, see table_widget._execute)
+            bind = connection.connection_sqlalchemy
+            in_transaction = bind.in_transaction()
+
+            try:
+                return compute(inspect(bind))
+            finally:
+                if not in_transaction and bind.in_transaction():
+                    bind.rollback()
+
+        return _metadata_cache.get(
+            connection_key, key, compute_with_inspector, ttl=self.ttl
+        )
+
+    def list_schemas(self, *, query="", offset=0, limit=50):
+        """Returns a page of schemas"""
+
+        def compute(inspector):
+            default = inspector.default_schema_name
+            return [
+                {"name": name, "default": name == default}
+                for name in inspector.get_schema_names()
+            ]
+
+        schemas = self._cached(("schemas",), compute)
+        return _paginate(schemas, query=query, offset=offset, limit=limit)
+
+    def list_tables(self, schema, *, query="", offset=0, limit=50):
+        """Returns a page of the tables and views in a schema"""
+        connection = self._get_connection()
+        dialect = connection.connection_sqlalchemy.dialect.name
+
+        if dialect in _PAGINATED_DIALECTS:
+
+            def compute_page(inspector):
+                return _query_tables_page(
+                    inspector,
+                    _select_tables(dialect, schema or inspector.default_schema_name),
+                    query=query,
+                    offset=offset,
+                    limit=limit,
+                )
+
+            return self._cached(("tables", schema, query, offset, limit), compute_page)
+
+        def compute(inspector):
+            tables = [
+                {"name": name, "type": "table"}
+                for name in inspector.get_table_names(schema=schema)
+            ]
+            views = [
+                {"name": name, "type": "view"}
+                for name in inspector.get_view_names(schema=schema)
+            ]
+            return sorted(tables + views, key=lambda item: item["name"])
+
+        tables = self._cached(("tables", schema), compute)
+        return _paginate(tables, query=query, offset=offset, limit=limit)
+
+    def list_columns(self, schema, table, *, query="", offset=0, limit=50):
+        """Returns a page of the columns in a table"""
+
+        def compute(inspector):
+            return [
+                {
+                    "name": column["name"],
+                    "type": str(column["type"]),
+                    "nullable": column.get("nullable", True),
+                }
+                for column in inspector.get_columns(table, schema=schema)
+            ]
+
+        columns = self._cached(("columns", schema, table), compute)
+        return _paginate(columns, query=query, offset=offset, limit=limit)
+
+    def refresh(self):
+        """Clears the cached metadata for the connection"""
+        connection = self._get_connection()
+        _metadata_cache.clear((connection.alias, connection.url))
+
+
+class SchemaBrowserWidget(DOMWidget):
+    """
+    Browse the schemas, tables and columns of a connection. Each level is loaded
+    when the user expands a node
+    """
+
+    _model_name = Unicode("SchemaBrowserModel").tag(sync=True)
+    _model_module = Unicode(_module_name).tag(sync=True)
+    _model_module_version = Unicode(__version__).tag(sync=True)
+    _view_name = Unicode("SchemaBrowserView").tag(sync=True)
+    _view_module = Unicode(_module_name).tag(sync=True)
+    _view_module_version = Unicode(__version__).tag(sync=True)
+
+    connection_name = Unicode(allow_none=True).tag(sync=True)
+    page_size = Int(50).tag(sync=True)
+    cache_ttl = Float(300.0, help="Seconds to keep metadata in the cache")
+
+    def __init__(self, connection_name=None, **kwargs):
+        super().__init__(connection_name=connection_name, **kwargs)
+        self.on_msg(self._handle_message)
+
+    def _get_inspector(self):
+        return SchemaInspector(self.connection_name, ttl=self.cache_ttl)
+
+    def _handle_message(self, widget, content, buffers):
+        """
+        Handles messages from front
+        """
+        if "method" not in content:
+            raise ValueError("Method is not specified")
+
+        method = content["method"]
+        data = content.get("data", {})
+
+        page = {
+            "query": data.get("query", ""),
+            "offset": data.get("offset", 0),
+            "limit": data.get("limit", self.page_size),
+        }
+
+        inspector = self._get_inspector()
+
+        if method == "list_schemas":
+            load = partial(inspector.list_schemas, **page)
+        elif method == "list_tables":
+            load = partial(inspector.list_tables, data["schema"], **page)
+        elif method == "list_columns":
+            load = partial(
+                inspector.list_columns, data["schema"], data["table"], **page
+            )
+        # user wants to reload the metadata, we start from the schemas again
+        elif method == "refresh":
+            method = "list_schemas"
+
+            def load():
+                inspector.refresh()
+                return inspector.list_schemas(**page)
+
+        else:
+            raise ValueError(f"Method {method} is not supported")
+
+        try:
+            result = load()
+        except Exception as e:
+            self.send(
+                {
+                    "method": "error",
+                    "request": {"method": method, "data": data},
+                    "message": f"{type(e).__name__}: {e}",
+                }
+            )
+        else:
+            self.send({"method": method, "request": data, "message": result})
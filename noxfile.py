@@ -1,6 +1,10 @@
 import nox
 
 from os import environ
+from pathlib import Path
+
+# a benchmark fails if its median is this much slower than the baseline's
+BENCHMARK_GATE = "median:20%"
 
 
 def _setup(session):
@@ -32,6 +36,37 @@ def test(session):
     session.run("jlpm", "test")
 
 
+@nox.session(
+    python=environ.get("PYTHON_VERSION", "3.11"),
+)
+def benchmark(session):
+    """
+    Runs the benchmarks and compares them to the latest baseline stored in
+    benchmarks/.baselines, failing if a benchmark's median is over 20% slower
+    (the median is less sensitive than the mean to the outliers of shared CI
+    runners). If there isn't a baseline yet, the run is saved as the baseline
+    instead. CI restores the baseline saved by the last run on main (see
+    ci.yaml). To store a new baseline:
+    nox --session benchmark -- --benchmark-save=baseline
+    """
+    session.install("-r", "requirements.txt")
+    session.install("-r", "requirements.dev.txt")
+    session.install("-e", ".")
+
+    storage = Path("benchmarks", ".baselines")
+    args = [f"--benchmark-storage={storage}"]
+
+    if list(storage.glob("*/*.json")):
+        args += ["--benchmark-compare", f"--benchmark-compare-fail={BENCHMARK_GATE}"]
+    else:
+        session.warn("There's no baseline to compare to, saving this run as one")
+
+        if not any(arg.startswith("--benchmark-save") for arg in session.posargs):
+            args.append("--benchmark-save=baseline")
+
+    session.run("pytest", "benchmarks", *args, *session.posargs)
+
+
 @nox.session(
     python=environ.get("PYTHON_VERSION", "3.11"),
 )
@@ -0,0 +1,89 @@
+import { CompletionIndex } from '../completer/completionindex';
+
+/**
+ * The ranking the completer used before the index: filter every item and sort
+ * them by the position of the token and then alphabetically
+ */
+function reference(labels: string[], token: string, limit: number): string[] {
+  const query = token.toLowerCase();
+
+  return labels
+    .filter(label => label.toLowerCase().includes(query))
+    .map(label => {
+      const lower = label.toLowerCase();
+      const position = lower.indexOf(query);
+      return { label, lower, position, suffix: lower.slice(position) };
+    })
+    .sort((a, b) => {
+      if (a.position !== b.position) {
+        return a.position - b.position;
+      }
+
+      if (a.suffix !== b.suffix) {
+        return a.suffix < b.suffix ? -1 : 1;
+      }
+
+      return a.lower < b.lower ? -1 : a.lower > b.lower ? 1 : 0;
+    })
+    .slice(0, limit)
+    .map(match => match.label);
+}
+
+const labels = [
+  'SELECT',
+  'FROM',
+  'ORDER BY',
+  'orders',
+  'order_items',
+  'customer_orders',
+  'customers',
+  'created_at',
+  'updated_at',
+  'DELETE FROM',
+];
+
+function search(index: CompletionIndex, token: string, limit?: number): string[] {
+  return index.search(token, limit).map(item => item.label);
+}
+
+describe('CompletionIndex', () => {
+  const index = new CompletionIndex(labels.map(label => ({ label })));
+
+  it.each(['', 'o', 'OR', 'order', 'ders', 'rder_', 'from', '_at', 'missing'])(
+    'ranks matches like the completer did (token: %p)',
+    token => {
+      expect(search(index, token)).toEqual(reference(labels, token, 500));
+    }
+  );
+
+  it('ranks prefix matches first', () => {
+    expect(search(index, 'order')).toEqual([
+      'ORDER BY',
+      'order_items',
+      'orders',
+      'customer_orders',
+    ]);
+  });
+
+  it('limits the number of matches', () => {
+    expect(search(index, 'o', 2)).toEqual(reference(labels, 'o', 2));
+    expect(search(index, 'ers', 1)).toEqual(['orders']);
+  });
+
+  it('matches random identifiers', () => {
+    const words = ['order', 'customer', 'id', 'name', 'at', 'total', 'item', 'ts'];
+    const identifiers: string[] = [];
+
+    for (let i = 0; i < 2000; i++) {
+      const first = words[i % words.length];
+      const second = words[(i * 7) % words.length];
+      identifiers.push(`${first}_${second}_${i}`);
+    }
+
+    const big = new CompletionIndex(identifiers.map(label => ({ label })));
+
+    ['1', 'r_i', 'ts_', 'tomer_n', '_99', 'ORDER_TS'].forEach(token => {
+      expect(search(big, token, 50)).toEqual(reference(identifiers, token, 50));
+    });
+  });
+});
@@ -0,0 +1,80 @@
+/**
+ * Per-keystroke latency of the language selection extension on a large %%sql
+ * cell, compared to reconfiguring the language on every transaction. Run it
+ * with: jlpm benchmark
+ */
+import { Compartment, EditorState, Extension } from '@codemirror/state';
+import { ensureSyntaxTree } from '@codemirror/language';
+import { python } from '@codemirror/lang-python';
+import { sql } from '@codemirror/lang-sql';
+
+import { languageSelection } from '../editor/editor';
+
+const N_LINES = 5000;
+const N_KEYSTROKES = 200;
+
+// the extension before it tracked the language of each editor
+function reconfigureEveryTransaction(): Extension {
+  const languageConf = new Compartment();
+
+  return [
+    languageConf.of(python()),
+    EditorState.transactionExtender.of(tr => {
+      const isSQL = tr.newDoc.sliceString(0, 5) === '%%sql';
+      return { effects: languageConf.reconfigure(isSQL ? sql() : python()) };
+    }),
+  ];
+}
+
+function cell(): string {
+  const lines = ['%%sql'];
+
+  for (let i = 0; i < N_LINES; i++) {
+    lines.push(`SELECT id, name, amount * ${i} AS total FROM orders WHERE id = ${i} UNION ALL`);
+  }
+
+  lines.push('SELECT 1, 2, 3');
+  return lines.join('\n');
+}
+
+/**
+ * Types characters and moves the cursor at the end of the cell, parsing the
+ * visible part of the document after every keystroke like the editor does
+ */
+function type(extension: Extension): number[] {
+  let state = EditorState.create({ doc: cell(), extensions: extension });
+  const latencies: number[] = [];
+
+  for (let i = 0; i < N_KEYSTROKES; i++) {
+    const start = performance.now();
+    const end = state.doc.length;
+    const spec = i % 2
+      ? { selection: { anchor: end - 1 } }
+      : { changes: { from: end, insert: 'x' } };
+
+    state = state.update(spec).state;
+    ensureSyntaxTree(state, state.doc.length, 50);
+    latencies.push(performance.now() - start);
+  }
+
+  return latencies;
+}
+
+function summarize(latencies: number[]): { [key: string]: string } {
+  const sorted = [...latencies].sort((a, b) => a - b);
+  const mean = sorted.reduce((a, b) => a + b, 0) / sorted.length;
+
+  return {
+    'mean (ms)': mean.toFixed(3),
+    'p95 (ms)': sorted[Math.floor(sorted.length * 0.95)].toFixed(3),
+  };
+}
+
+describe('language selection benchmark', () => {
+  it(`types in a cell with ${N_LINES} lines`, () => {
+    console.table({
+      'change-only': summarize(type(languageSelection())),
+      'every transaction': summarize(type(reconfigureEveryTransaction())),
+    });
+  });
+});
@@ -0,0 +1,49 @@
+import { EditorState, StateEffect } from '@codemirror/state';
+
+import { languageSelection } from '../editor/editor';
+
+const languageName = (state: EditorState): string => {
+  const data = state.languageDataAt<any>('commentTokens', 0)[0];
+  // python comments start with #, SQL comments with --
+  return data.line === '#' ? 'python' : 'sql';
+};
+
+describe('languageSelection', () => {
+  it('switches the language when the magic is added or removed', () => {
+    let state = EditorState.create({ doc: 'select 1', extensions: languageSelection() });
+    expect(languageName(state)).toEqual('python');
+
+    state = state.update({ changes: { from: 0, insert: '%%sql\n' } }).state;
+    expect(languageName(state)).toEqual('sql');
+
+    state = state.update({ changes: { from: 0, to: 1 } }).state;
+    expect(languageName(state)).toEqual('python');
+  });
+
+  it('only reconfigures when the language changes', () => {
+    let state = EditorState.create({ doc: '%%sql\nselect 1', extensions: languageSelection() });
+
+    // the first transaction sets the language
+    let tr = state.update({ selection: { anchor: 1 } });
+    expect(tr.reconfigured).toBe(true);
+    state = tr.state;
+
+    tr = state.update({ changes: { from: state.doc.length, insert: ' + 1' } });
+    expect(tr.reconfigured).toBe(false);
+
+    tr = tr.state.update({ selection: { anchor: 3 } });
+    expect(tr.reconfigured).toBe(false);
+  });
+
+  it('keeps the language in sync after the editor is reconfigured', () => {
+    let state = EditorState.create({ doc: '%%sql\nselect 1', extensions: languageSelection() });
+    state = state.update({ selection: { anchor: 1 } }).state;
+    expect(languageName(state)).toEqual('sql');
+
+    // resets the language compartment to python
+    state = state.update({ effects: StateEffect.reconfigure.of(languageSelection()) }).state;
+
+    state = state.update({ selection: { anchor: 3 } }).state;
+    expect(languageName(state)).toEqual('sql');
+  });
+});
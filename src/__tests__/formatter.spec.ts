@@ -0,0 +1,73 @@
+import { FormatCache, formatCells, formatSources, hashSource } from '../formatter/batch';
+
+const formatBatch = (calls: string[][]) => async (sources: string[]) => {
+  calls.push(sources);
+  return formatCells(sources);
+};
+
+describe('formatSources', () => {
+  it('formats %%sql cells and skips the other ones', async () => {
+    const calls: string[][] = [];
+    const sources = ['%%sql\nselect * from t', 'print(1)', '%%sql\nSELECT\n  *\nFROM\n  t'];
+
+    const changed = await formatSources(sources, new FormatCache(), formatBatch(calls));
+
+    // the last cell is already formatted, so it isn't rewritten
+    expect(Array.from(changed.entries())).toEqual([[0, '%%sql\nSELECT\n  *\nFROM\n  t']]);
+    expect(calls).toEqual([['%%sql\nselect * from t', '%%sql\nSELECT\n  *\nFROM\n  t']]);
+  });
+
+  it('only formats cells that changed', async () => {
+    const calls: string[][] = [];
+    const cache = new FormatCache();
+
+    const first = await formatSources(['%%sql\nselect 1', '%%sql\nselect 2'], cache, formatBatch(calls));
+    const formatted = [first.get(0), first.get(1)];
+
+    // the cells were formatted, then the second one was edited
+    const second = await formatSources(
+      [formatted[0], '%%sql\nselect 3'], cache, formatBatch(calls)
+    );
+
+    expect(calls).toEqual([['%%sql\nselect 1', '%%sql\nselect 2'], ['%%sql\nselect 3']]);
+    expect(Array.from(second.keys())).toEqual([1]);
+  });
+
+  it('formats in batches and formats identical cells once', async () => {
+    const calls: string[][] = [];
+    const sources = Array.from({ length: 5 }, (_, i) => `%%sql\nselect ${i % 3}`);
+
+    const changed = await formatSources(sources, new FormatCache(), formatBatch(calls), 2);
+
+    expect(calls.map(batch => batch.length)).toEqual([2, 1]);
+    expect(changed.get(3)).toEqual(changed.get(0));
+    expect(changed.size).toEqual(5);
+  });
+
+  it('ignores cells that cannot be formatted', async () => {
+    const changed = await formatSources(
+      ['%%sql\nselect 1'], new FormatCache(), async sources => sources.map(() => null)
+    );
+
+    expect(changed.size).toEqual(0);
+  });
+});
+
+describe('FormatCache', () => {
+  it('drops the least recently used entries', () => {
+    const cache = new FormatCache(2);
+    cache.set('a', null);
+    cache.set('b', null);
+    cache.get('a');
+    cache.set('c', null);
+
+    expect(cache.get('a')).toBeNull();
+    expect(cache.get('b')).toBeUndefined();
+    expect(cache.get('c')).toBeNull();
+  });
+
+  it('hashes sources', () => {
+    expect(hashSource('select 1')).toEqual(hashSource('select 1'));
+    expect(hashSource('select 1')).not.toEqual(hashSource('select 2'));
+  });
+});
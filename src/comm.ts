@@ -1,47 +1,257 @@
-// Opens a comm from the frontend to the kernel
+// Opens comms from the frontend to the kernel
 import { NotebookPanel, INotebookModel } from '@jupyterlab/notebook';
 import { IDisposable, DisposableDelegate } from '@lumino/disposable';
 import { DocumentRegistry } from '@jupyterlab/docregistry';
+import { Kernel } from '@jupyterlab/services';
 
 
-export const registerCommTargets = (context: DocumentRegistry.IContext<INotebookModel>): void => {
-  const sessionContext = context.sessionContext;
-  const kernel = sessionContext.session?.kernel;
+// registers jupysql-plugin's comm targets, errors are ignored since the kernel
+// might not have jupysql or jupysql-plugin installed
+const REGISTER_CODE = `
+try:
+    from jupysql_plugin.comm import register_comm_targets as _jupysql_plugin_register
+    _jupysql_plugin_register()
+    del _jupysql_plugin_register
+except Exception:
+    pass
+`;
 
-  if (!kernel)
+const TABLE_WIDGET_TARGET = 'jupysql_plugin_table_widget';
+
+/**
+ * Calls fn when the kernel restarts (comms and comm targets are lost)
+ */
+export const onKernelRestart = (kernel: Kernel.IKernelConnection, fn: () => void): void => {
+  kernel.statusChanged.connect((_, status) => {
+    if (status === 'restarting' || status === 'autorestarting') {
+      fn();
+    }
+  });
+};
+
+/**
+ * Registers jupysql-plugin's comm targets in the kernel (once per kernel)
+ */
+export const registerKernelCommTargets = (kernel: Kernel.IKernelConnection): Promise<void> => {
+  let registered = registeredKernels.get(kernel.id);
+
+  if (!registered) {
+    registered = kernel.requestExecute({
+      code: REGISTER_CODE,
+      silent: true,
+      store_history: false,
+    }).done.then(() => undefined);
+
+    registeredKernels.set(kernel.id, registered);
+    kernel.disposed.connect(() => registeredKernels.delete(kernel.id));
+    onKernelRestart(kernel, () => registeredKernels.delete(kernel.id));
+  }
+
+  return registered;
+};
+
+const registeredKernels = new Map<string, Promise<void>>();
+
+
+export interface TableWidgetSort {
+  column: string,
+  order: 'ASC' | 'DESC',
+}
+
+/**
+ * A page request from JupySQL's table widget, sorting runs in the database
+ * (filtering and paging through queries are used by DataTableWidget, see
+ * widgets/data_table.ts, which has its own comm)
+ */
+export interface TableWidgetRequest {
+  table: string,
+  page: number,
+  nRows: number,
+  sort?: TableWidgetSort,
+}
+
+export interface TableWidgetPage {
+  // JSON string, JupySQL's table widget parses it
+  rows: string,
+}
+
+/**
+ * A comm to the table widget handler that stays open for the lifetime of the
+ * kernel, requests are matched to replies by id
+ */
+export class TableWidgetComm {
+  constructor(kernel: Kernel.IKernelConnection) {
+    this._kernel = kernel;
+    onKernelRestart(kernel, () => this._reset());
+  }
+
+  /**
+   * Returns the comm for the kernel (opening it if needed)
+   */
+  static forKernel(kernel: Kernel.IKernelConnection): TableWidgetComm {
+    let comm = TableWidgetComm._instances.get(kernel.id);
+
+    if (!comm) {
+      comm = new TableWidgetComm(kernel);
+      TableWidgetComm._instances.set(kernel.id, comm);
+      kernel.disposed.connect(() => TableWidgetComm._instances.delete(kernel.id));
+    }
+
+    return comm;
+  }
+
+  /**
+   * Opens the comm, called when the kernel is ready so the first page doesn't
+   * wait for the handshake
+   */
+  open(): Promise<Kernel.IComm> {
+    if (!this._comm) {
+      this._comm = this._open().catch(error => {
+        this._comm = null;
+        throw error;
+      });
+    }
+
+    return this._comm;
+  }
+
+  /**
+   * Requests a page of rows. JupySQL's table widget renders rows from a JSON
+   * string, so the rows are passed through without decoding
+   */
+  async fetchRows(data: TableWidgetRequest): Promise<TableWidgetPage> {
+    const comm = await this.open();
+    const id = ++this._requestId;
+
+    const reply = new Promise<TableWidgetPage>((resolve, reject) => {
+      this._pending.set(id, { resolve, reject });
+    });
+
+    comm.send({ ...data, id });
+    return reply;
+  }
+
+  private async _open(): Promise<Kernel.IComm> {
+    await registerKernelCommTargets(this._kernel);
+
+    const comm = this._kernel.createComm(TABLE_WIDGET_TARGET);
+
+    comm.onMsg = msg => {
+      const data = <any>msg.content.data;
+      const pending = this._pending.get(data.id);
+
+      if (!pending) {
+        return;
+      }
+
+      this._pending.delete(data.id);
+
+      if (data.error) {
+        pending.reject(new Error(data.error));
+      } else {
+        pending.resolve({ rows: data.rows });
+      }
+    };
+
+    comm.onClose = () => this._reset();
+
+    await comm.open().done;
+    return comm;
+  }
+
+  private _reset(): void {
+    this._comm = null;
+    this._pending.forEach(({ reject }) => reject(new Error('The comm was closed')));
+    this._pending.clear();
+  }
+
+  private _kernel: Kernel.IKernelConnection;
+  private _comm: Promise<Kernel.IComm> | null = null;
+  private _requestId = 0;
+  private _pending = new Map<number, { resolve: (page: TableWidgetPage) => void, reject: (error: Error) => void }>();
+
+  private static _instances = new Map<string, TableWidgetComm>();
+}
+
+
+// open notebooks, the table widget events don't say which notebook they come
+// from so we use the one the user interacted with last
+const panels: NotebookPanel[] = [];
+
+const getActivePanel = (): NotebookPanel | undefined => {
+  return panels.find(panel => panel.node.contains(document.activeElement)) || panels[0];
+};
+
+const onUpdateTableWidget = async (event: Event) => {
+  const data: TableWidgetRequest = (<CustomEvent>event).detail.data;
+  const panel = getActivePanel();
+  const kernel = panel?.sessionContext.session?.kernel;
+
+  if (!panel || !kernel)
     return
 
-  // Listen to updateTableWidget event
-  document.addEventListener("onUpdateTableWidget", async (event: Event) => {
-    const customEvent = <CustomEvent>event
-    const data = customEvent.detail.data
+  let page: TableWidgetPage;
+
+  try {
+    page = await TableWidgetComm.forKernel(kernel).fetchRows(data);
+  } catch (error) {
+    console.error('Failed to fetch the table widget rows', error);
+    return;
+  }
+
+  const detail = { data: { rows: page.rows } };
+
+  // Raise event to update table with new rows
+  const customEvent = new CustomEvent('onTableWidgetRowsReady', {
+    bubbles: true,
+    cancelable: true,
+    composed: false,
+    detail: detail
+  });
+  document.body.dispatchEvent(customEvent);
+};
+
+let listening = false;
 
-    // Register to table_widget handler in the JupySQL kernel
-    const comm = kernel.createComm("comm_target_handle_table_widget");
 
-    await comm.open('initializing connection').done;
+export const registerCommTargets = (panel: NotebookPanel): void => {
+  const sessionContext = panel.sessionContext;
 
-    // Send data to the Kernel to recevice rows to display
-    comm.send(data);
+  // a single listener handles the events from every notebook
+  if (!listening) {
+    document.addEventListener("onUpdateTableWidget", onUpdateTableWidget);
+    listening = true;
+  }
 
-    // Handle recevied rows
-    comm.onMsg = (msg) => {
-      const content = msg.content;
-      const data = <{ rows: any }>content.data;
+  // open the comm as soon as the kernel is ready (and after restarts)
+  const openComm = () => {
+    const kernel = sessionContext.session?.kernel;
 
-      // Raise event to update table with new rows
-      let customEvent = new CustomEvent('onTableWidgetRowsReady', {
-        bubbles: true,
-        cancelable: true,
-        composed: false,
-        detail: {
-          data: data
-        }
+    if (kernel) {
+      TableWidgetComm.forKernel(kernel).open().catch(() => {
+        // the kernel doesn't have jupysql-plugin, nothing to do
       });
-      document.body.dispatchEvent(customEvent);
     }
-  })
+  };
+
+  sessionContext.ready.then(openComm);
+  sessionContext.kernelChanged.connect(() => sessionContext.ready.then(openComm));
+
+  // we move the most recently focused notebook first
+  panel.node.addEventListener('focusin', () => {
+    removePanel(panel);
+    panels.unshift(panel);
+  });
 
+  panel.disposed.connect(() => removePanel(panel));
+};
+
+const removePanel = (panel: NotebookPanel): void => {
+  const index = panels.indexOf(panel);
+
+  if (index > -1) {
+    panels.splice(index, 1);
+  }
 };
 
 
@@ -62,13 +272,11 @@ export class RegisterNotebookCommListener
     context: DocumentRegistry.IContext<INotebookModel>
   ): IDisposable {
 
-    setTimeout(() => {
-      registerCommTargets(context)
-    }, 5000)
+    panels.push(panel);
+    registerCommTargets(panel);
 
     return new DisposableDelegate(() => {
-
+      removePanel(panel);
     });
   }
 }
-
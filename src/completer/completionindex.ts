@@ -0,0 +1,239 @@
+// Index to find and rank completion items without scanning all of them
+import { CompletionHandler } from '@jupyterlab/completer';
+
+// length of the n-grams in the substring index
+const GRAM = 3;
+
+// maximum number of items returned by a search
+const DEFAULT_LIMIT = 500;
+
+interface Match {
+  item: CompletionHandler.ICompletionItem,
+  position: number,
+  suffix: string,
+  label: string,
+}
+
+/**
+ * Ranks two matches like the completer always did: by the position of the
+ * token in the label and then alphabetically, starting at the token
+ */
+function compareMatches(a: Match, b: Match): number {
+  if (a.position !== b.position) {
+    return a.position - b.position;
+  }
+
+  if (a.suffix !== b.suffix) {
+    return a.suffix < b.suffix ? -1 : 1;
+  }
+
+  return a.label < b.label ? -1 : a.label > b.label ? 1 : 0;
+}
+
+/**
+ * Returns the sorted intersection of two sorted lists of ids
+ */
+function intersect(a: Int32Array, b: Int32Array): Int32Array {
+  const result = new Int32Array(Math.min(a.length, b.length));
+  let i = 0;
+  let j = 0;
+  let k = 0;
+
+  while (i < a.length && j < b.length) {
+    if (a[i] < b[j]) {
+      i++;
+    } else if (a[i] > b[j]) {
+      j++;
+    } else {
+      result[k++] = a[i];
+      i++;
+      j++;
+    }
+  }
+
+  return result.subarray(0, k);
+}
+
+/**
+ * Completion items normalized once so each keystroke only looks at the items
+ * that match:
+ *
+ * - labels are lowercased and sorted, so the items that start with the token
+ *   (the best ranked ones) are a contiguous range found with a binary search
+ * - every n-gram (of length 1 to 3) maps to the sorted ids of the labels that
+ *   contain it, tokens are matched by intersecting the lists of their n-grams
+ */
+export class CompletionIndex {
+  constructor(items: CompletionHandler.ICompletionItem[]) {
+    this._items = items
+      .map(item => ({ item, lower: item.label.toLowerCase() }))
+      .sort((a, b) => (a.lower < b.lower ? -1 : a.lower > b.lower ? 1 : 0));
+
+    const grams = new Map<string, number[]>();
+
+    this._items.forEach(({ lower }, id) => {
+      const seen = new Set<string>();
+
+      for (let n = 1; n <= GRAM; n++) {
+        for (let i = 0; i + n <= lower.length; i++) {
+          seen.add(lower.slice(i, i + n));
+        }
+      }
+
+      seen.forEach(gram => {
+        let ids = grams.get(gram);
+
+        if (!ids) {
+          ids = [];
+          grams.set(gram, ids);
+        }
+
+        ids.push(id);
+      });
+    });
+
+    grams.forEach((ids, gram) => this._grams.set(gram, Int32Array.from(ids)));
+  }
+
+  /**
+   * Returns the items whose label contains the token (case insensitive), ranked
+   * by the position of the token and then alphabetically
+   */
+  search(token: string, limit: number = DEFAULT_LIMIT): CompletionHandler.ICompletionItem[] {
+    const query = token.toLowerCase();
+    const [start, end] = this._prefixRange(query);
+
+    // the prefix matches rank first and they're already sorted
+    const prefixEnd = Math.min(end, start + limit);
+    const results: CompletionHandler.ICompletionItem[] = [];
+
+    for (let id = start; id < prefixEnd; id++) {
+      results.push(this._items[id].item);
+    }
+
+    if (results.length === limit || !query) {
+      return results;
+    }
+
+    // group the other matches by the position of the token, so we only sort the
+    // groups that make it to the results
+    const byPosition: Match[][] = [];
+
+    for (const id of this._candidates(query)) {
+      // prefix matches were already added
+      if (id >= start && id < end) {
+        continue;
+      }
+
+      const { item, lower } = this._items[id];
+      const position = lower.indexOf(query);
+
+      if (position > 0) {
+        if (!byPosition[position]) {
+          byPosition[position] = [];
+        }
+
+        byPosition[position].push({
+          item,
+          position,
+          suffix: lower.slice(position),
+          label: lower,
+        });
+      }
+    }
+
+    for (const matches of byPosition) {
+      if (results.length === limit) {
+        break;
+      }
+
+      // positions without matches are holes in the array
+      if (!matches) {
+        continue;
+      }
+
+      matches.sort(compareMatches);
+
+      for (let i = 0; i < matches.length && results.length < limit; i++) {
+        results.push(matches[i].item);
+      }
+    }
+
+    return results;
+  }
+
+  /**
+   * Returns the range of ids whose label starts with the query
+   */
+  private _prefixRange(query: string): [number, number] {
+    const start = this._lowerBound(query);
+    let lo = start;
+    let hi = this._items.length;
+
+    // first label that doesn't start with the query
+    while (lo < hi) {
+      const mid = (lo + hi) >>> 1;
+
+      if (this._items[mid].lower.startsWith(query)) {
+        lo = mid + 1;
+      } else {
+        hi = mid;
+      }
+    }
+
+    return [start, lo];
+  }
+
+  private _lowerBound(query: string): number {
+    let lo = 0;
+    let hi = this._items.length;
+
+    while (lo < hi) {
+      const mid = (lo + hi) >>> 1;
+
+      if (this._items[mid].lower < query) {
+        lo = mid + 1;
+      } else {
+        hi = mid;
+      }
+    }
+
+    return lo;
+  }
+
+  /**
+   * Returns the ids of the labels that contain every n-gram of the query (a
+   * superset of the labels that contain the query)
+   */
+  private _candidates(query: string): Int32Array {
+    if (query.length <= GRAM) {
+      return this._grams.get(query) || new Int32Array(0);
+    }
+
+    const lists: Int32Array[] = [];
+
+    for (let i = 0; i + GRAM <= query.length; i++) {
+      const ids = this._grams.get(query.slice(i, i + GRAM));
+
+      if (!ids) {
+        return new Int32Array(0);
+      }
+
+      lists.push(ids);
+    }
+
+    // start with the shortest list so intersections stay small
+    lists.sort((a, b) => a.length - b.length);
+
+    let candidates = lists[0];
+
+    for (let i = 1; i < lists.length && candidates.length; i++) {
+      candidates = intersect(candidates, lists[i]);
+    }
+
+    return candidates;
+  }
+
+  private _items: { item: CompletionHandler.ICompletionItem, lower: string }[];
+  private _grams = new Map<string, Int32Array>();
+}
@@ -11,6 +11,8 @@ import {
 } from '@jupyterlab/completer';
 
 import { keywords } from './keywords.json';
+import { CompletionIndex } from './completionindex';
+import { SchemaCompletions, SchemaCompletionClient, referencedTables } from './schema';
 
 const CELL_MAGIC = '%%sql';
 const LINE_MAGIC = '%sql';
@@ -27,6 +29,7 @@ export class SQLCompleterProvider implements ICompletionProvider {
         type: 'keyword'
       }
     })
+    this._index = new CompletionIndex(this._items);
   }
 
   /**
@@ -63,14 +66,65 @@ export class SQLCompleterProvider implements ICompletionProvider {
     if (!editor) {
       return Promise.reject('No editor');
     }
-    return new Promise<CompletionHandler.ICompletionItemsReply>(resolve => {
-      resolve(Private.completionHint(editor!, this._items));
+    return this._getIndex(editor, context).then(index => {
+      return Private.completionHint(editor!, index);
     });
   }
 
+  /**
+   * Returns the index with the keywords, the tables of the current connection
+   * and the columns of the tables used in the query. The kernel answers from its
+   * cache, if it's busy (even before the completions comm is open), we use the
+   * last known names, so the first completions only have the keywords. The
+   * index is only rebuilt when the names change
+   */
+  private async _getIndex(
+    editor: CodeEditor.IEditor,
+    context: ICompletionContext
+  ): Promise<CompletionIndex> {
+    const kernel = context.session?.kernel;
+
+    if (!kernel) {
+      return this._index;
+    }
+
+    const tables = referencedTables(editor.model.sharedModel.getSource());
+    let completions: SchemaCompletions;
+
+    try {
+      completions = await SchemaCompletionClient.forKernel(kernel).fetch(tables);
+    } catch (e) {
+      return this._index;
+    }
+
+    if (completions === this._schemaCompletions) {
+      return this._schemaIndex;
+    }
+
+    const items: CompletionHandler.ICompletionItem[] = completions.tables.map(table => {
+      return { label: table, type: 'table' };
+    });
+
+    // tables often share column names (e.g., id), each name is listed once
+    const columnNames = new Set<string>();
+
+    Object.values(completions.columns).forEach(columns => {
+      columns.forEach(column => columnNames.add(column));
+    });
+
+    columnNames.forEach(column => items.push({ label: column, type: 'column' }));
+
+    this._schemaCompletions = completions;
+    this._schemaIndex = new CompletionIndex(items.concat(this._items));
+    return this._schemaIndex;
+  }
+
   readonly identifier = 'CompletionProvider:custom';
   readonly renderer: any = null;
   private _items: CompletionHandler.ICompletionItem[];
+  private _index: CompletionIndex;
+  private _schemaCompletions: SchemaCompletions | null = null;
+  private _schemaIndex: CompletionIndex;
 }
 
 /**
@@ -81,28 +135,19 @@ namespace Private {
    * Get a list of completion hints.
    *
    * @param editor Editor
+   * @param index Index with the items to complete
    * @returns Completion reply
    */
   export function completionHint(
     editor: CodeEditor.IEditor,
-    baseItems: CompletionHandler.ICompletionItem[]
+    index: CompletionIndex
   ): CompletionHandler.ICompletionItemsReply {
     // Find the token at the cursor
     const token = editor.getTokenAtCursor();
 
-    // Find all the items containing the token value.
-    let items = baseItems.filter(
-      item => item.label.toLowerCase().includes(token.value.toLowerCase())
-    );
-
-    // Sort the items.
-    items = items.sort((a, b) => {
-      return sortItems(
-        token.value.toLowerCase(),
-        a.label.toLowerCase(),
-        b.label.toLowerCase()
-      );
-    });
+    // Find the items containing the token value, ranked by the position of the
+    // token and then alphabetically
+    const items = index.search(token.value);
 
     return {
       start: token.offset,
@@ -110,31 +155,4 @@ namespace Private {
       items: items
     };
   }
-
-  /**
-   * Compare function to sort items.
-   * The comparison is based on the position of the token in the label. If the positions
-   * are the same, it is sorted alphabetically, starting at the token.
-   *
-   * @param token - the value of the token in lower case.
-   * @param a - the label of the first item in lower case.
-   * @param b - the label of the second item in lower case.
-   */
-  function sortItems(
-    token: string,
-    a: string,
-    b: string
-  ): number {
-    const ind1 = a.indexOf(token);
-    const ind2 = b.indexOf(token);
-    if (ind1 < ind2) {
-      return -1;
-    } else if (ind1 > ind2) {
-      return 1;
-    } else {
-      const end1 = a.slice(ind1);
-      const end2 = b.slice(ind1);
-      return end1 <= end2 ? -1 : 1;
-    }
-  }
 }
@@ -0,0 +1,187 @@
+// Fetches table and column names from the kernel for autocompletion
+import { Kernel } from '@jupyterlab/services';
+
+import { onKernelRestart, registerKernelCommTargets } from '../comm';
+
+const COMM_TARGET = 'jupysql_plugin_completions';
+
+// if the kernel doesn't reply in time (e.g., it's running a cell), we use the
+// last reply
+const REPLY_TIMEOUT_MS = 100;
+
+export interface SchemaCompletions {
+  tables: string[],
+  columns: { [table: string]: string[] },
+}
+
+/**
+ * Returns the tables referenced in a query (FROM, JOIN, UPDATE and INTO clauses)
+ */
+export function referencedTables(query: string): string[] {
+  const tables = new Set<string>();
+  const regex = /\b(?:from|join|update|into)\s+([\w."]+)/gi;
+  let match: RegExpExecArray | null;
+
+  while ((match = regex.exec(query)) !== null) {
+    tables.add(match[1].replace(/"/g, ''));
+  }
+
+  return Array.from(tables);
+}
+
+function sameNames(a: string[], b: string[]): boolean {
+  return a.length === b.length && a.every((name, i) => name === b[i]);
+}
+
+function sameCompletions(a: SchemaCompletions, b: SchemaCompletions): boolean {
+  const tables = Object.keys(a.columns);
+
+  return (
+    sameNames(a.tables, b.tables) &&
+    sameNames(tables, Object.keys(b.columns)) &&
+    tables.every(table => sameNames(a.columns[table], b.columns[table]))
+  );
+}
+
+/**
+ * Requests completions over a comm that stays open for the lifetime of the
+ * kernel. The kernel answers from its cache so replies are fast, and the last
+ * reply is kept so completions are available while the kernel is busy
+ */
+export class SchemaCompletionClient {
+  constructor(kernel: Kernel.IKernelConnection) {
+    this._kernel = kernel;
+    kernel.disposed.connect(() => SchemaCompletionClient._instances.delete(kernel.id));
+    onKernelRestart(kernel, () => {
+      this._comm = null;
+    });
+  }
+
+  /**
+   * Returns the client for the kernel (creating it if needed)
+   */
+  static forKernel(kernel: Kernel.IKernelConnection): SchemaCompletionClient {
+    let client = SchemaCompletionClient._instances.get(kernel.id);
+
+    if (!client) {
+      client = new SchemaCompletionClient(kernel);
+      SchemaCompletionClient._instances.set(kernel.id, client);
+    }
+
+    return client;
+  }
+
+  /**
+   * Requests the completions for the tables used in a query. If the kernel
+   * doesn't answer within REPLY_TIMEOUT_MS, the last reply is returned. The
+   * timeout includes registering the comm target and opening the comm, which
+   * wait for the kernel to finish running the current cell
+   */
+  fetch(tables: string[]): Promise<SchemaCompletions> {
+    const id = ++this._requestId;
+    let expired = false;
+
+    const reply = this._getComm().then(comm => {
+      if (!comm) {
+        return this._last;
+      }
+
+      // the latest request is sent anyway so the kernel loads its columns, the
+      // reply updates the last known completions
+      if (expired) {
+        if (id === this._requestId) {
+          comm.send({ id, tables });
+        }
+
+        return this._last;
+      }
+
+      const reply = new Promise<SchemaCompletions>(resolve => {
+        this._pending.set(id, resolve);
+      });
+
+      comm.send({ id, tables });
+      return reply;
+    });
+
+    const timeout = new Promise<SchemaCompletions>(resolve => {
+      setTimeout(() => {
+        expired = true;
+        this._pending.delete(id);
+        resolve(this._last);
+      }, REPLY_TIMEOUT_MS);
+    });
+
+    return Promise.race([reply, timeout]);
+  }
+
+  private async _getComm(): Promise<Kernel.IComm | null> {
+    if (!this._comm) {
+      this._comm = this._openComm().catch(() => {
+        // retry on the next request
+        this._comm = null;
+        return null;
+      });
+    }
+
+    return this._comm;
+  }
+
+  private async _openComm(): Promise<Kernel.IComm> {
+    await registerKernelCommTargets(this._kernel);
+
+    const comm = this._kernel.createComm(COMM_TARGET);
+
+    comm.onMsg = msg => {
+      const data = <any>msg.content.data;
+      const last = this._last;
+
+      // the kernel is still loading the tables (e.g., the cache was just
+      // invalidated), keep the previous reply until it's ready
+      if (!(data.loading && !data.tables.length)) {
+        // keep the columns we already know so they're available while the
+        // kernel loads the rest
+        const columns: { [table: string]: string[] } = {};
+
+        data.tables.forEach((table: string) => {
+          if (table in last.columns) {
+            columns[table] = last.columns[table];
+          }
+        });
+
+        const completions = {
+          tables: data.tables,
+          columns: { ...columns, ...data.columns },
+        };
+
+        // keep the same object if nothing changed so the completer doesn't
+        // rebuild its index
+        if (!sameCompletions(last, completions)) {
+          this._last = completions;
+        }
+      }
+
+      const resolve = this._pending.get(data.id);
+
+      if (resolve) {
+        this._pending.delete(data.id);
+        resolve(this._last);
+      }
+    };
+
+    comm.onClose = () => {
+      this._comm = null;
+    };
+
+    await comm.open().done;
+    return comm;
+  }
+
+  private _kernel: Kernel.IKernelConnection;
+  private _comm: Promise<Kernel.IComm | null> | null = null;
+  private _requestId = 0;
+  private _pending = new Map<number, (completions: SchemaCompletions) => void>();
+  private _last: SchemaCompletions = { tables: [], columns: {} };
+
+  private static _instances = new Map<string, SchemaCompletionClient>();
+}
@@ -0,0 +1,137 @@
+import { URLExt } from '@jupyterlab/coreutils';
+import { ServerConnection } from '@jupyterlab/services';
+
+import { StoredConnection } from '../utils/util';
+
+// reconnection delays (in milliseconds) double up to this value
+const MAX_RECONNECT_DELAY = 30000;
+
+
+/**
+ * A change in the connections file pushed by the server extension. The
+ * snapshot sent when subscribing only has the version, total and path
+ */
+export interface ConnectionsEvent {
+    version: number,
+    total: number,
+    path: string,
+    from_version?: number,
+    added?: StoredConnection[],
+    removed?: string[],
+    changed?: StoredConnection[],
+}
+
+export type ConnectionsListener = (event: ConnectionsEvent) => void;
+
+
+/**
+ * A single WebSocket to the server extension shared by every connector widget
+ * and the connections panel. It's opened when the first listener subscribes,
+ * closed when the last one unsubscribes and reopened if the server restarts
+ */
+export class ConnectionsEvents {
+    private socket: WebSocket | null = null;
+    private listeners = new Set<ConnectionsListener>();
+    private reconnectDelay = 1000;
+    private reconnectTimer: number | null = null;
+    private snapshot: ConnectionsEvent | null = null;
+
+    /**
+     * True if changes are being pushed (otherwise, listeners should poll)
+     */
+    get connected(): boolean {
+        return this.socket !== null && this.socket.readyState === WebSocket.OPEN;
+    }
+
+    /**
+     * Calls listener with every change, returns a function that unsubscribes.
+     * Listeners that subscribe while the socket is open get the last snapshot
+     */
+    subscribe(listener: ConnectionsListener): () => void {
+        this.listeners.add(listener);
+
+        if (this.snapshot && this.connected) {
+            listener(this.snapshot);
+        }
+
+        this.open();
+
+        return () => {
+            this.listeners.delete(listener);
+
+            if (this.listeners.size === 0) {
+                this.close();
+            }
+        };
+    }
+
+    private open(): void {
+        if (this.socket || this.reconnectTimer !== null) {
+            return;
+        }
+
+        const settings = ServerConnection.makeSettings();
+        let url = URLExt.join(settings.wsUrl, 'jupysql-plugin', 'events');
+
+        if (settings.token) {
+            url += `?token=${encodeURIComponent(settings.token)}`;
+        }
+
+        const socket = new settings.WebSocket(url);
+        this.socket = socket;
+
+        socket.onopen = () => {
+            this.reconnectDelay = 1000;
+        };
+
+        socket.onmessage = (message: MessageEvent) => {
+            const data = JSON.parse(message.data);
+
+            if (data.method === 'connections_snapshot') {
+                this.snapshot = data.message;
+            } else if (data.method === 'connections_changed') {
+                this.snapshot = {
+                    version: data.message.version,
+                    total: data.message.total,
+                    path: data.message.path,
+                };
+            } else {
+                return;
+            }
+
+            this.listeners.forEach(listener => listener(data.message));
+        };
+
+        socket.onclose = () => {
+            this.socket = null;
+            this.snapshot = null;
+
+            // the server went away (e.g., it's restarting), try again later
+            if (this.listeners.size > 0) {
+                this.reconnectTimer = window.setTimeout(() => {
+                    this.reconnectTimer = null;
+                    this.open();
+                }, this.reconnectDelay);
+
+                this.reconnectDelay = Math.min(this.reconnectDelay * 2, MAX_RECONNECT_DELAY);
+            }
+        };
+    }
+
+    private close(): void {
+        if (this.reconnectTimer !== null) {
+            window.clearTimeout(this.reconnectTimer);
+            this.reconnectTimer = null;
+        }
+
+        if (this.socket) {
+            const socket = this.socket;
+            this.socket = null;
+            this.snapshot = null;
+            socket.onclose = null;
+            socket.close();
+        }
+    }
+}
+
+export const connectionsEvents = new ConnectionsEvents();
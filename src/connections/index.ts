@@ -0,0 +1,134 @@
+import {
+    ILabShell,
+    JupyterFrontEnd,
+    JupyterFrontEndPlugin,
+} from '@jupyterlab/application';
+import { Widget } from '@lumino/widgets';
+
+import { requestConnections, StoredConnection } from '../utils/util';
+import { connectionsEvents } from './events';
+
+
+const PLUGIN_ID = 'jupysql-plugin:connections';
+
+// how often (in milliseconds) the panel checks if the connections file changed
+// when the server can't push the changes
+const POLL_INTERVAL = 10000;
+
+
+/**
+ * Side panel that lists the connections in the connections file. The list comes
+ * from the server extension so it's available before any kernel starts
+ */
+export class ConnectionsPanel extends Widget {
+    private etag: string | null = null;
+    private timer: number | null = null;
+    private unsubscribeEvents: (() => void) | null = null;
+    private list: HTMLElement;
+    private message: HTMLElement;
+
+    constructor() {
+        super();
+        this.id = 'jupysql-connections-panel';
+        this.title.iconClass = 'jp-jupysql-connections-icon';
+        this.title.caption = 'Database connections';
+        this.addClass('jp-jupysql-connections-panel');
+
+        this.node.innerHTML = `
+        <h3>Connections</h3>
+        <i class="jp-jupysql-connections-message"></i>
+        <ul class="jp-jupysql-connections-list"></ul>
+        `;
+
+        this.list = this.node.querySelector('.jp-jupysql-connections-list');
+        this.message = this.node.querySelector('.jp-jupysql-connections-message');
+    }
+
+    protected onAfterShow(): void {
+        this.refresh();
+
+        // the list is served from the server's index so refreshing after an
+        // event doesn't parse the file again
+        this.unsubscribeEvents = connectionsEvents.subscribe(() => this.refresh());
+
+        this.timer = window.setInterval(() => {
+            if (!connectionsEvents.connected) {
+                this.refresh();
+            }
+        }, POLL_INTERVAL);
+    }
+
+    protected onBeforeHide(): void {
+        if (this.timer !== null) {
+            window.clearInterval(this.timer);
+            this.timer = null;
+        }
+
+        if (this.unsubscribeEvents) {
+            this.unsubscribeEvents();
+            this.unsubscribeEvents = null;
+        }
+    }
+
+    /**
+     * Fetches the connections, the server answers with a 304 (and we keep the
+     * current list) if the file hasn't changed
+     */
+    async refresh(): Promise<void> {
+        try {
+            const response = await requestConnections(this.etag);
+
+            if (response.modified) {
+                this.etag = response.etag;
+                this.draw(response.connections);
+            }
+        } catch (error) {
+            this.message.innerText = `Could not load connections: ${error}`;
+        }
+    }
+
+    draw(connections: Array<StoredConnection>) {
+        this.list.innerHTML = '';
+        this.message.innerText = connections.length === 0
+            ? 'No connections found in your connections file.'
+            : '';
+
+        connections.forEach((connection: StoredConnection) => {
+            const item = document.createElement('LI');
+            item.title = connection.driver || '';
+
+            const name = document.createElement('SPAN');
+            name.className = 'jp-jupysql-connection-name';
+            name.innerText = connection.name;
+
+            const driver = document.createElement('SPAN');
+            driver.className = 'jp-jupysql-connection-driver';
+            driver.innerText = connection.driver || '';
+
+            item.appendChild(name);
+            item.appendChild(driver);
+            this.list.appendChild(item);
+        });
+    }
+
+    dispose(): void {
+        this.onBeforeHide();
+        super.dispose();
+    }
+}
+
+
+/**
+ * Adds the connections panel to the left sidebar
+ */
+const plugin_connections: JupyterFrontEndPlugin<void> = {
+    id: PLUGIN_ID,
+    autoStart: true,
+    requires: [ILabShell],
+    activate: (app: JupyterFrontEnd, labShell: ILabShell) => {
+        const panel = new ConnectionsPanel();
+        labShell.add(panel, 'left', { rank: 900 });
+    },
+};
+
+export { plugin_connections }
@@ -1,20 +1,35 @@
-import { Compartment, EditorState, Extension } from "@codemirror/state"
+import { Compartment, EditorState, Extension, Text } from "@codemirror/state"
 import { python } from "@codemirror/lang-python"
 import { sql } from '@codemirror/lang-sql'
 
 const MAGIC = '%%sql';
 const languageConf = new Compartment;
 
+// languages are shared by every editor, so switching doesn't create (and parse
+// with) a new language instance
+const SQL_LANGUAGE = sql();
+const PYTHON_LANGUAGE = python();
+
+export const isSQLCell = (doc: Text): boolean => doc.sliceString(0, MAGIC.length) === MAGIC;
+
 /**
  * This function is called for every transaction (change in cell input).
  * If the cell is an SQL cell (starting with '%%sql'), then the language is set to SQL.
+ * The language is only reconfigured when the magic is added or removed
  */
 const autoLanguage = EditorState.transactionExtender.of(tr => {
     // Check if the cell input content start with '%%sql', and configure the syntax
     // highlighting to SQL if necessary (default to python).
-    const isSQL = tr.newDoc.sliceString(0, MAGIC.length) === MAGIC;
+    const isSQL = isSQLCell(tr.newDoc);
+
+    // the compartment is the source of truth, so this stays correct if the
+    // editor is reconfigured by something else
+    if (isSQL === (languageConf.get(tr.startState) === SQL_LANGUAGE)) {
+        return null;
+    }
+
     return {
-        effects: languageConf.reconfigure(isSQL ? sql() : python())
+        effects: languageConf.reconfigure(isSQL ? SQL_LANGUAGE : PYTHON_LANGUAGE)
     };
 })
 
@@ -22,7 +37,7 @@ const autoLanguage = EditorState.transactionExtender.of(tr => {
 // Full extension composed of elemental extensions
 export function languageSelection(): Extension {
     return [
-        languageConf.of(python()),
+        languageConf.of(PYTHON_LANGUAGE),
         autoLanguage,
     ];
 }
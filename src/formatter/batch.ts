@@ -0,0 +1,175 @@
+// Formatting logic shared by the web worker and the main thread fallback
+import { format } from 'sql-formatter';
+
+const CELL_MAGIC = '%%sql';
+
+// maximum number of formatted cells to remember
+const DEFAULT_MAX_ENTRIES = 5000;
+
+/**
+ * Returns a 53-bit hash of the source (cyrb53) as a string, it's only used as a
+ * cache key so it doesn't need to be cryptographic
+ */
+export function hashSource(source: string): string {
+  let h1 = 0xdeadbeef;
+  let h2 = 0x41c6ce57;
+
+  for (let i = 0; i < source.length; i++) {
+    const ch = source.charCodeAt(i);
+    h1 = Math.imul(h1 ^ ch, 2654435761);
+    h2 = Math.imul(h2 ^ ch, 1597334677);
+  }
+
+  h1 = Math.imul(h1 ^ (h1 >>> 16), 2246822507) ^ Math.imul(h2 ^ (h2 >>> 13), 3266489909);
+  h2 = Math.imul(h2 ^ (h2 >>> 16), 2246822507) ^ Math.imul(h1 ^ (h1 >>> 13), 3266489909);
+
+  return (4294967296 * (2097151 & h2) + (h1 >>> 0)).toString(36);
+}
+
+/**
+ * Returns true if the cell is a %%sql cell
+ */
+export function isSQLCell(source: string): boolean {
+  return source.startsWith(CELL_MAGIC);
+}
+
+/**
+ * Formats a %%sql cell (the first line, with the magic, is kept as is). Returns
+ * null if the query can't be formatted
+ */
+export function formatCell(source: string): string | null {
+  const lines = source.split('\n');
+  const sqlCommand = lines.shift();
+
+  try {
+    const query = format(lines.join('\n'), { language: 'sql', keywordCase: 'upper' });
+    return sqlCommand + '\n' + query;
+  } catch (error) {
+    return null;
+  }
+}
+
+/**
+ * Formats a batch of cells, what the web worker runs
+ */
+export function formatCells(sources: string[]): (string | null)[] {
+  return sources.map(formatCell);
+}
+
+interface CacheEntry {
+  source: string,
+  formatted: string | null,
+}
+
+/**
+ * Remembers the formatted version of cells by the hash of their source, so
+ * cells that didn't change since the last time aren't formatted again. The
+ * least recently used entries are dropped
+ */
+export class FormatCache {
+  constructor(maxEntries: number = DEFAULT_MAX_ENTRIES) {
+    this._maxEntries = maxEntries;
+  }
+
+  /**
+   * Returns the formatted source (null if it can't be formatted) or undefined
+   * if the source isn't cached
+   */
+  get(source: string): string | null | undefined {
+    const key = hashSource(source);
+    const entry = this._entries.get(key);
+
+    // the hash is only the key, we compare the source to rule out collisions
+    if (!entry || entry.source !== source) {
+      return undefined;
+    }
+
+    this._entries.delete(key);
+    this._entries.set(key, entry);
+    return entry.formatted;
+  }
+
+  set(source: string, formatted: string | null): void {
+    const key = hashSource(source);
+
+    this._entries.delete(key);
+    this._entries.set(key, { source, formatted });
+
+    // formatting is idempotent, so the output doesn't need to be formatted again
+    if (formatted !== null && formatted !== source) {
+      this._entries.delete(hashSource(formatted));
+      this._entries.set(hashSource(formatted), { source: formatted, formatted });
+    }
+
+    while (this._entries.size > this._maxEntries) {
+      this._entries.delete(this._entries.keys().next().value);
+    }
+  }
+
+  get size(): number {
+    return this._entries.size;
+  }
+
+  private _maxEntries: number;
+  private _entries = new Map<string, CacheEntry>();
+}
+
+/**
+ * Formats the %%sql cells and returns the new source of the cells that changed
+ * (by index). Cells are looked up in the cache and the rest are formatted in
+ * batches by formatBatch (e.g., in a web worker)
+ */
+export async function formatSources(
+  sources: string[],
+  cache: FormatCache,
+  formatBatch: (sources: string[]) => Promise<(string | null)[]>,
+  batchSize: number = 50
+): Promise<Map<number, string>> {
+  const results = new Map<number, string | null>();
+  const pending = new Map<string, number[]>();
+
+  sources.forEach((source, i) => {
+    if (!isSQLCell(source)) {
+      return;
+    }
+
+    const cached = cache.get(source);
+
+    if (cached !== undefined) {
+      results.set(i, cached);
+      return;
+    }
+
+    // identical cells are formatted once
+    const indexes = pending.get(source);
+
+    if (indexes) {
+      indexes.push(i);
+    } else {
+      pending.set(source, [i]);
+    }
+  });
+
+  const uncached = Array.from(pending.keys());
+
+  for (let start = 0; start < uncached.length; start += batchSize) {
+    const batch = uncached.slice(start, start + batchSize);
+    const formatted = await formatBatch(batch);
+
+    batch.forEach((source, j) => {
+      cache.set(source, formatted[j]);
+      pending.get(source).forEach(i => results.set(i, formatted[j]));
+    });
+  }
+
+  // cells that are already formatted (or can't be formatted) aren't rewritten
+  const changed = new Map<number, string>();
+
+  results.forEach((formatted, i) => {
+    if (formatted !== null && formatted !== sources[i]) {
+      changed.set(i, formatted);
+    }
+  });
+
+  return changed;
+}
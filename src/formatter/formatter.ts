@@ -3,11 +3,68 @@ import { Cell, CodeCell } from '@jupyterlab/cells';
 import { INotebookTracker, Notebook } from '@jupyterlab/notebook';
 import { Widget } from '@lumino/widgets';
 import { showErrorMessage } from '@jupyterlab/apputils';
-import { format } from 'sql-formatter';
+
+import { FormatCache, formatCells as formatBatchSync, formatSources } from './batch';
+
+/**
+ * Formats batches of cells in a web worker, so large notebooks don't freeze the
+ * UI. If workers aren't available, batches are formatted on the main thread
+ */
+export class FormatWorker {
+    /**
+     * Formats the cells, resolves to the formatted sources (null if a cell
+     * can't be formatted)
+     */
+    formatBatch(sources: string[]): Promise<(string | null)[]> {
+        const worker = this._getWorker();
+
+        if (!worker) {
+            // yield to the event loop between batches
+            return new Promise(resolve => setTimeout(() => resolve(formatBatchSync(sources))));
+        }
+
+        const id = ++this._requestId;
+
+        return new Promise((resolve, reject) => {
+            this._pending.set(id, { resolve, reject });
+            worker.postMessage({ id, sources });
+        });
+    }
+
+    private _getWorker(): Worker | null {
+        if (this._worker === undefined) {
+            try {
+                this._worker = new Worker(new URL('./worker.js', import.meta.url));
+                this._worker.onmessage = (event: MessageEvent) => {
+                    const { id, results } = event.data;
+                    this._pending.get(id)?.resolve(results);
+                    this._pending.delete(id);
+                };
+                this._worker.onerror = () => {
+                    // fall back to the main thread
+                    this._pending.forEach(({ reject }) => reject(new Error('The formatting worker failed')));
+                    this._pending.clear();
+                    this._worker.terminate();
+                    this._worker = null;
+                };
+            } catch (error) {
+                this._worker = null;
+            }
+        }
+
+        return this._worker;
+    }
+
+    private _worker: Worker | null | undefined = undefined;
+    private _requestId = 0;
+    private _pending = new Map<number, { resolve: (results: (string | null)[]) => void, reject: (error: Error) => void }>();
+}
 
 export class JupyterlabNotebookCodeFormatter {
     protected working: boolean;
     protected notebookTracker: INotebookTracker;
+    protected cache = new FormatCache();
+    protected worker = new FormatWorker();
 
     constructor(
         notebookTracker: INotebookTracker
@@ -59,23 +116,21 @@ export class JupyterlabNotebookCodeFormatter {
                 return;
             }
 
-            for (let i = 0; i < selectedCells.length; ++i) {
-                const cell = selectedCells[i];
-                const text = cell.model.sharedModel.source;
-
-                if (text.startsWith("%%sql")) {
-                    const lines = text.split("\n");
-                    const sqlCommand = lines.shift();
-
-                    try {
-                        const query = format(lines.join("\n"), { language: 'sql', keywordCase: 'upper' })
-                        cell.model.sharedModel.source = sqlCommand + "\n" + query;
-                    } catch (error) {
-                    }
+            const sources = selectedCells.map(cell => cell.model.sharedModel.source);
+            const changed = await formatSources(
+                sources,
+                this.cache,
+                batch => this.worker.formatBatch(batch).catch(() => formatBatchSync(batch))
+            );
 
+            changed.forEach((formatted, i) => {
+                const cell = selectedCells[i];
 
+                // skip cells that were edited while we were formatting
+                if (cell.model.sharedModel.source === sources[i]) {
+                    cell.model.sharedModel.source = formatted;
                 }
-            }
+            });
         } catch (error: any) {
             await showErrorMessage('Jupysql plugin formatting', error);
         }
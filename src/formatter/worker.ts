@@ -0,0 +1,9 @@
+// Web worker that formats batches of %%sql cells off the main thread
+import { formatCells } from './batch';
+
+const ctx: any = self;
+
+ctx.onmessage = (event: MessageEvent) => {
+  const { id, sources } = event.data;
+  ctx.postMessage({ id, results: formatCells(sources) });
+};
@@ -3,6 +3,7 @@ import { plugin_editor } from './editor/index';
 import { plugin_formatting } from './formatter/index';
 import { plugin_widget } from './widgets/index';
 import { plugin_settings } from './settings/index';
+import { plugin_connections } from './connections/index';
 
 export * from './version';
 export default [
@@ -10,5 +11,6 @@ export default [
   plugin_editor,
   plugin_formatting,
   plugin_widget,
-  plugin_settings
+  plugin_settings,
+  plugin_connections
 ];
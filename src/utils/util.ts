@@ -17,7 +17,7 @@ export async function requestAPI<T>(
     const settings = ServerConnection.makeSettings();
     const requestUrl = URLExt.join(
         settings.baseUrl,
-        'ploomber', // API Namespace
+        'jupysql-plugin', // API Namespace
         endPoint
     );
 
@@ -43,4 +43,58 @@ export async function requestAPI<T>(
     }
 
     return data;
+}
+
+export interface StoredConnection {
+    name: string,
+    driver?: string,
+    [key: string]: string,
+}
+
+export interface ConnectionsResponse {
+    modified: boolean,
+    etag: string | null,
+    connections: Array<StoredConnection>,
+}
+
+/**
+ * Fetches the connections in the connections file. If etag is passed and the file
+ * hasn't changed, the server answers with a 304 and modified is false
+ *
+ * @param etag ETag returned by the previous call
+ */
+export async function requestConnections(
+    etag: string | null = null
+): Promise<ConnectionsResponse> {
+    const settings = ServerConnection.makeSettings();
+    const requestUrl = URLExt.join(settings.baseUrl, 'jupysql-plugin', 'connections');
+
+    const init: RequestInit = { cache: 'no-store' };
+
+    if (etag) {
+        init.headers = { 'If-None-Match': etag };
+    }
+
+    let response: Response;
+    try {
+        response = await ServerConnection.makeRequest(requestUrl, init, settings);
+    } catch (error) {
+        throw new ServerConnection.NetworkError(error as any);
+    }
+
+    if (response.status === 304) {
+        return { modified: false, etag, connections: [] };
+    }
+
+    if (!response.ok) {
+        throw new ServerConnection.ResponseError(response);
+    }
+
+    const data = await response.json();
+
+    return {
+        modified: true,
+        etag: response.headers.get('Etag'),
+        connections: data.connections,
+    };
 }
\ No newline at end of file
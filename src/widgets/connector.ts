@@ -5,11 +5,27 @@ import {
 } from '@jupyter-widgets/base';
 
 import { MODULE_NAME, MODULE_VERSION } from '../version';
+import { connectionsEvents } from '../connections/events';
 
 
 // Import the CSS
 import '../../style/connector.css';
 
+// connections requested at a time (the backend's page_size caps it)
+const PAGE_SIZE = 100;
+
+// rows rendered above and below the visible ones
+const OVERSCAN = 10;
+
+// used until a row is rendered and measured
+const DEFAULT_ROW_HEIGHT = 60;
+
+/**
+ * Returns the offset of the page that contains the connection at position i,
+ * pages are aligned so scrolling doesn't request overlapping ones
+ */
+const pageOffset = (i: number): number => Math.floor(i / PAGE_SIZE) * PAGE_SIZE;
+
 
 interface Connection {
     name: string,
@@ -21,6 +37,29 @@ interface Connection {
     database: string,
 }
 
+interface ConnectionStatus {
+    name: string,
+    status: string,
+    connect_ms?: number,
+    roundtrip_ms?: number,
+    error?: string,
+}
+
+interface ConnectionsPage {
+    query: string,
+    offset: number,
+    total: number,
+    connections: Array<Connection>,
+}
+
+interface ConnectionsPatch {
+    from_version: number,
+    version: number,
+    added: Array<Connection>,
+    removed: Array<string>,
+    changed: Array<Connection>,
+}
+
 interface ConnectionTemplate {
     fields: Array<Field>,
     connection_string: string
@@ -44,6 +83,7 @@ export class ConnectorModel extends DOMWidgetModel {
             _view_module: ConnectorModel.view_module,
             _view_module_version: ConnectorModel.view_module_version,
             connections: ConnectorModel.connections,
+            connections_total: ConnectorModel.connections_total,
             connections_templates: ConnectorModel.connections_templates,
             driver_to_dbname: ConnectorModel.driver_to_dbname,
         };
@@ -61,15 +101,38 @@ export class ConnectorModel extends DOMWidgetModel {
     static view_module = MODULE_NAME; // Set to null if no view
     static view_module_version = MODULE_VERSION;
     static connections: any[] = [];
+    static connections_total = 0;
     static connections_templates: any[] = [];
     static driver_to_dbname: any[] = [];
 }
 
 export class ConnectorView extends DOMWidgetView {
 
-    // available connections
+    // first page of connections (the other ones are requested when they're
+    // scrolled into view)
     connections = JSON.parse(this.model.get('connections'));
 
+    // number of connections that match the search query
+    connectionsTotal: number = this.model.get('connections_total') ?? this.connections.length;
+
+    // number of stored connections
+    connectionsCount: number = this.connectionsTotal;
+
+    // loaded connections by position, only the visible ones are rendered
+    loadedConnections = new Map<number, Connection>(
+        this.connections.map((c: Connection, i: number) => [i, c])
+    );
+
+    // offsets of the pages that have been requested
+    pendingPages = new Set<number>();
+
+    searchQuery = ""
+
+    rowHeight = 0
+
+    // results of the last connection check, rows show them when they're rendered
+    connectionStatuses = new Map<string, ConnectionStatus>();
+
     // connections templates for creating a new connection
     connectionsTemplates = JSON.parse(this.model.get('connections_templates'));
 
@@ -78,23 +141,44 @@ export class ConnectorView extends DOMWidgetView {
 
     activeConnection = ""
 
+    // version of the connections list, the initial list is version 0
+    connectionsVersion = 0
+
+    // connection that's being established in the kernel
+    pendingConnection = ""
+
+    // stops forwarding the changes in the connections file to the kernel
+    unsubscribeEvents: (() => void) | null = null
+
 
     render() {
         this.el.classList.add('connector-widget');
 
-        this.drawConnectionsList(this.connections);
+        this.drawConnectionsList();
 
         // Listen for messages from the Python backend
         this.model.on('msg:custom', this.handleMessage.bind(this));
+
+        // the server extension watches the connections file, the kernel applies
+        // the changes and sends us a patch
+        this.unsubscribeEvents = connectionsEvents.subscribe(event => {
+            this.send({ method: 'connections_changed', data: event });
+        });
+    }
+
+    remove() {
+        if (this.unsubscribeEvents) {
+            this.unsubscribeEvents();
+            this.unsubscribeEvents = null;
+        }
+
+        return super.remove();
     }
 
     /**
-     * Draws the connection list
-     *
-     *
-     * @param connection : The availble connections
+     * Draws the connection list, only the visible connections are rendered
      */
-    drawConnectionsList(connections: Array<Connection>) {
+    drawConnectionsList() {
         console.log('driver to db name', this.driver_to_dbname)
 
         this.el.innerHTML = ""
@@ -119,7 +203,18 @@ export class ConnectorView extends DOMWidgetView {
                     </i>
                 </div>
 
-                <div id="connectionsButtonsContainer" class="block">
+                <div class="block">
+                    <button id="checkAllConnectionsButton" class="secondary">
+                        Check all connections
+                    </button>
+                </div>
+
+                <div class="block">
+                    <input id="connectionsSearch" class="connections-search" type="search" placeholder="Search connections">
+                </div>
+
+                <div id="connectionsViewport" class="connections-viewport block">
+                    <div id="connectionsButtonsContainer"></div>
                 </div>
 
                 <div class="block">
@@ -153,52 +248,25 @@ export class ConnectorView extends DOMWidgetView {
         this.el.innerHTML = template;
 
         // Draw connection buttons
-        connections.forEach((connection: Connection) => {
-            const { name } = connection;
-            const name_without_spaces = name.replace(/ /g, "_");
-
-            const buttonContainer = document.createElement("DIV");
-            buttonContainer.className = "connection-button-container";
-
-            const actionsContainer = document.createElement("DIV");
-            actionsContainer.className = "connection-button-actions";
-
-            const connectionName = document.createElement("DIV");
-            connectionName.className = "connection-name";
-            connectionName.innerText = name;
-            actionsContainer.appendChild(connectionName);
-
-            const connectButton = document.createElement("BUTTON");
-            connectButton.id = `connBtn_${name_without_spaces}`;
-            connectButton.className = "secondary connectionStatusButton";
-            connectButton.innerHTML = "Connect";
-            connectButton.onclick = this.handleConnectionClick.bind(this, connection);
-
-            // button to edit a connection
-            const editConnection = document.createElement("BUTTON");
-            editConnection.className = `edit-connection-button`;
-            editConnection.id = `editConnBtn_${name_without_spaces}`;
-            editConnection.onclick = this.handleEditConnectionClick.bind(this, connection);
-
-            // trash can button to delete a connection
-            const deleteConnection = document.createElement("BUTTON");
-            deleteConnection.className = `delete-connection-button`;
-            deleteConnection.id = `deleteConnBtn_${name_without_spaces}`;
-            deleteConnection.onclick = this.handleDeleteConnectionClick.bind(this, connection);
-
-            // add buttons to the actions container
-            let connectionsButtonsContainer = this.el.querySelector('#connectionsButtonsContainer');
-            actionsContainer.appendChild(connectButton);
-            actionsContainer.appendChild(editConnection);
-            actionsContainer.appendChild(deleteConnection);
-
-            buttonContainer.appendChild(actionsContainer);
-            connectionsButtonsContainer.appendChild(buttonContainer);
-
-            let divider = document.createElement("HR");
-            divider.className = "divider";
-            buttonContainer.appendChild(divider);
+        this.searchQuery = "";
+        this.renderVisibleConnections();
+
+        let scheduled = false;
+        this.el.querySelector('#connectionsViewport').addEventListener('scroll', () => {
+            if (!scheduled) {
+                scheduled = true;
+                requestAnimationFrame(() => {
+                    scheduled = false;
+                    this.renderVisibleConnections();
+                });
+            }
+        });
 
+        let searchTimeout: ReturnType<typeof setTimeout>;
+        const search = <HTMLInputElement>this.el.querySelector('#connectionsSearch');
+        search.addEventListener('input', () => {
+            clearTimeout(searchTimeout);
+            searchTimeout = setTimeout(() => this.searchConnections(search.value), 200);
         });
 
         // Draw new connection dropdown
@@ -211,13 +279,12 @@ export class ConnectorView extends DOMWidgetView {
 
         select.addEventListener("change", this.handleCreateNewConnectionChange.bind(this))
 
+        const checkAllButton = this.el.querySelector("#checkAllConnectionsButton");
+        checkAllButton.addEventListener("click", this.handleCheckAllConnectionsClick.bind(this));
+
         const newConnectionButton = this.el.querySelector("#createNewConnectionButton");
         newConnectionButton.addEventListener("click", this.handleCreateNewConnectionClick.bind(this));
 
-        if (this.activeConnection) {
-            this.markConnectedButton(this.activeConnection);
-        }
-
         setTimeout(() => {
             const message = {
                 method: 'check_config_file'
@@ -228,12 +295,292 @@ export class ConnectorView extends DOMWidgetView {
         }, 500)
     }
 
+    /**
+     * Renders the connections in the visible part of the list. The container is
+     * padded with the height of the rows above and below, so the scrollbar
+     * reflects the whole list. Rows that aren't loaded are requested
+     */
+    renderVisibleConnections() {
+        const viewport = <HTMLElement>this.el.querySelector('#connectionsViewport');
+        const container = <HTMLElement>this.el.querySelector('#connectionsButtonsContainer');
+
+        if (!viewport || !container) {
+            return;
+        }
+
+        const rowHeight = this.rowHeight || DEFAULT_ROW_HEIGHT;
+        const visibleRows = Math.ceil((viewport.clientHeight || 400) / rowHeight);
+        const first = Math.max(0, Math.floor(viewport.scrollTop / rowHeight) - OVERSCAN);
+        const last = Math.min(this.connectionsTotal, first + visibleRows + 2 * OVERSCAN);
+
+        const rows: HTMLElement[] = [];
+        const missingPages = new Set<number>();
+
+        for (let i = first; i < last; i++) {
+            const connection = this.loadedConnections.get(i);
+
+            if (connection) {
+                rows.push(this.createConnectionElement(connection));
+            } else {
+                missingPages.add(pageOffset(i));
+
+                const placeholder = document.createElement("DIV");
+                placeholder.className = "connection-button-container loading";
+                placeholder.style.height = `${rowHeight}px`;
+                rows.push(placeholder);
+            }
+        }
+
+        container.replaceChildren(...rows);
+        container.style.paddingTop = `${first * rowHeight}px`;
+        container.style.paddingBottom = `${(this.connectionsTotal - last) * rowHeight}px`;
+
+        // rows are the same height (unless a delete confirmation is shown)
+        if (!this.rowHeight && rows.length > 1 && !rows[0].classList.contains('loading')) {
+            this.rowHeight = rows[1].offsetTop - rows[0].offsetTop;
+        }
+
+        missingPages.forEach((offset: number) => this.requestConnections(offset));
+
+        if (this.activeConnection) {
+            this.markConnectedButton(this.activeConnection);
+        }
+
+        if (this.pendingConnection) {
+            this.markConnectingButton(this.pendingConnection);
+        }
+
+        this.connectionStatuses.forEach(status => this.showConnectionStatus(status));
+    }
+
+    /**
+     * Asks the backend for the page that contains the connection at offset,
+     * unless it has already been requested
+     *
+     * @param offset - position of a connection in the page
+     */
+    requestConnections(offset: number) {
+        offset = pageOffset(offset);
+
+        if (this.pendingPages.has(offset)) {
+            return;
+        }
+
+        this.pendingPages.add(offset);
+        this.send({
+            method: 'list_connections',
+            data: { query: this.searchQuery, offset, limit: PAGE_SIZE },
+        });
+    }
+
+    /**
+     * Stores the connections sent by the backend and renders them
+     *
+     * @param page - connections page
+     */
+    receiveConnectionsPage(page: ConnectionsPage) {
+        // the user changed the search query since the request
+        if (page.query !== this.searchQuery) {
+            return;
+        }
+
+        this.pendingPages.delete(page.offset);
+        this.connectionsTotal = page.total;
+
+        if (!page.query) {
+            this.connectionsCount = page.total;
+        }
+
+        page.connections.forEach((connection: Connection, i: number) => {
+            this.loadedConnections.set(page.offset + i, connection);
+        });
+
+        this.renderVisibleConnections();
+    }
+
+    /**
+     * Shows the connections whose name or driver contains the query
+     *
+     * @param query - search query
+     */
+    searchConnections(query: string) {
+        this.searchQuery = query;
+        (<HTMLElement>this.el.querySelector('#connectionsViewport')).scrollTop = 0;
+        this.reloadConnections();
+    }
+
+    /**
+     * Forgets the loaded connections and requests the visible ones again
+     */
+    reloadConnections() {
+        const viewport = <HTMLElement>this.el.querySelector('#connectionsViewport');
+        const rowHeight = this.rowHeight || DEFAULT_ROW_HEIGHT;
+        const first = Math.floor((viewport?.scrollTop || 0) / rowHeight) - OVERSCAN;
+
+        this.loadedConnections.clear();
+        this.pendingPages.clear();
+        this.requestConnections(Math.max(0, first));
+    }
+
+    /**
+     * Creates the element that displays a connection and its actions
+     *
+     * @param connection - connection object
+     */
+    createConnectionElement(connection: Connection): HTMLElement {
+        const { name } = connection;
+        const name_without_spaces = name.replace(/ /g, "_");
+
+        const buttonContainer = document.createElement("DIV");
+        buttonContainer.className = "connection-button-container";
+
+        const actionsContainer = document.createElement("DIV");
+        actionsContainer.className = "connection-button-actions";
+
+        const connectionName = document.createElement("DIV");
+        connectionName.className = "connection-name";
+        connectionName.innerText = name;
+        actionsContainer.appendChild(connectionName);
+
+        // result of the last connection check
+        const connectionStatus = document.createElement("DIV");
+        connectionStatus.className = "connection-status";
+        connectionStatus.id = `connStatus_${name_without_spaces}`;
+        actionsContainer.appendChild(connectionStatus);
+
+        const connectButton = document.createElement("BUTTON");
+        connectButton.id = `connBtn_${name_without_spaces}`;
+        connectButton.className = "secondary connectionStatusButton";
+        connectButton.innerHTML = "Connect";
+        connectButton.onclick = this.handleConnectionClick.bind(this, connection);
+
+        // button to edit a connection
+        const editConnection = document.createElement("BUTTON");
+        editConnection.className = `edit-connection-button`;
+        editConnection.id = `editConnBtn_${name_without_spaces}`;
+        editConnection.onclick = this.handleEditConnectionClick.bind(this, connection);
+
+        // trash can button to delete a connection
+        const deleteConnection = document.createElement("BUTTON");
+        deleteConnection.className = `delete-connection-button`;
+        deleteConnection.id = `deleteConnBtn_${name_without_spaces}`;
+        deleteConnection.onclick = this.handleDeleteConnectionClick.bind(this, connection);
+
+        // add buttons to the actions container
+        actionsContainer.appendChild(connectButton);
+        actionsContainer.appendChild(editConnection);
+        actionsContainer.appendChild(deleteConnection);
+
+        buttonContainer.appendChild(actionsContainer);
+
+        let divider = document.createElement("HR");
+        divider.className = "divider";
+        buttonContainer.appendChild(divider);
+
+        return buttonContainer;
+    }
+
+    /**
+     * Applies the connections that were added, removed or changed in the
+     * backend to the loaded ones. If they can't be patched (see
+     * patchLoadedConnections), they're requested again. If the patch is based
+     * on a different version than the one we have, we ask the backend to
+     * resync instead
+     *
+     * @param patch - connections patch
+     */
+    applyConnectionsPatch(patch: ConnectionsPatch) {
+        if (patch.from_version !== this.connectionsVersion) {
+            this.send({ method: 'resync_connections' });
+            return;
+        }
+
+        patch.removed.forEach((name: string) => this.connectionStatuses.delete(name));
+        this.connectionsVersion = patch.version;
+        this.connectionsCount += patch.added.length - patch.removed.length;
+
+        this.showConnectionsList();
+
+        if (this.patchLoadedConnections(patch)) {
+            this.renderVisibleConnections();
+        } else {
+            this.reloadConnections();
+        }
+    }
+
+    /**
+     * Patches the loaded connections the same way the backend patches the
+     * stored ones: removed connections are dropped (the ones below move up),
+     * changed ones are replaced in place and added ones are appended. Returns
+     * false without modifying anything if the new positions aren't known: the
+     * list is filtered, a page is on its way, a removed connection isn't loaded
+     * or a connection was renamed (the backend might keep it in place)
+     *
+     * @param patch - connections patch
+     */
+    patchLoadedConnections(patch: ConnectionsPatch): boolean {
+        if (this.searchQuery || this.pendingPages.size
+            || (patch.removed.length && patch.added.length)) {
+            return false;
+        }
+
+        const positions = new Map<string, number>();
+        this.loadedConnections.forEach((c: Connection, i: number) => positions.set(c.name, i));
+
+        const removed: number[] = [];
+
+        for (const name of patch.removed) {
+            const position = positions.get(name);
+
+            if (position === undefined) {
+                return false;
+            }
+
+            removed.push(position);
+        }
+
+        const changed = new Map(patch.changed.map((c: Connection) => [c.name, c]));
+        const loaded = new Map<number, Connection>();
+
+        this.loadedConnections.forEach((connection: Connection, i: number) => {
+            if (removed.includes(i)) {
+                return;
+            }
+
+            const shift = removed.filter((position: number) => position < i).length;
+            loaded.set(i - shift, changed.get(connection.name) ?? connection);
+        });
+
+        const total = this.connectionsTotal - removed.length;
+        patch.added.forEach((c: Connection, i: number) => loaded.set(total + i, c));
+
+        this.loadedConnections = loaded;
+        this.connectionsTotal = total + patch.added.length;
+        return true;
+    }
+
+    /**
+     * Goes back to the connections list (e.g., after submitting the form)
+     */
+    showConnectionsList() {
+        this.hideDeleteMessageApproval();
+        (<HTMLElement>this.el.querySelector("#newConnectionContainer")).style.display = "none";
+        (<HTMLElement>this.el.querySelector("#connectionsContainer")).style.display = "block";
+        (<HTMLElement>this.el.querySelector(".user-error-message")).style.display = "none";
+    }
+
     /**
      * Connects to a database
      *
      * @param connection - connection object
      */
     handleConnectionClick(connection: Connection) {
+        // clicking on a connection that's being established cancels it
+        if (this.pendingConnection === connection.name) {
+            this.cancelPendingConnection();
+            return;
+        }
+
         const message = {
             method: 'connect',
             data: connection
@@ -242,6 +589,23 @@ export class ConnectorView extends DOMWidgetView {
         this.send(message);
     }
 
+    /**
+     * Asks the backend to check all stored connections, results arrive
+     * one by one as "connection_status" messages
+     */
+    handleCheckAllConnectionsClick() {
+        this.send({ method: 'check_all_connections' });
+    }
+
+    /**
+     * Asks the backend to stop waiting for the connection that's being established
+     */
+    cancelPendingConnection() {
+        if (this.pendingConnection) {
+            this.send({ method: 'cancel_connect' });
+        }
+    }
+
     deleteConnection(connection: Connection) {
         const message = {
             method: 'delete_connection',
@@ -459,7 +823,7 @@ export class ConnectorView extends DOMWidgetView {
             // to "default" if there are no connections, this will ensure that
             // the notebook automatically reconnects to the database if the
             // kernel is restarted
-            if (field.id == "connectionName" && this.connections.length === 0) {
+            if (field.id == "connectionName" && this.connectionsCount === 0) {
                 if (savedInput) {
                   input.value = savedInput;
                 } else {
@@ -492,7 +856,10 @@ export class ConnectorView extends DOMWidgetView {
         const cancelButton = document.createElement("BUTTON");
         cancelButton.innerHTML = "Cancel";
         cancelButton.className = "secondary";
-        cancelButton.addEventListener("click", this.drawConnectionsList.bind(this, this.connections))
+        cancelButton.addEventListener("click", () => {
+            this.cancelPendingConnection();
+            this.drawConnectionsList();
+        })
         buttonsContainer.appendChild(cancelButton);
 
         // submit form button
@@ -590,17 +957,70 @@ export class ConnectorView extends DOMWidgetView {
         const errors = ["connection_error", "connection_name_exists_error"]
 
         if (errors.includes(content.method)) {
+            this.pendingConnection = "";
             this.showErrorMessage(content.message);
+            this.resetConnectionButtons();
+        }
+
+        if (content.method === "connecting") {
+            this.pendingConnection = content.message;
+            this.markConnectingButton(content.message);
+        }
+
+        if (content.method === "connection_check_started") {
+            const button = <HTMLButtonElement>this.el.querySelector("#checkAllConnectionsButton");
+            button.disabled = true;
+            button.innerText = "Checking connections...";
+
+            content.message.forEach((name: string) => {
+                this.showConnectionStatus({ name, status: "checking" });
+            });
+        }
+
+        if (content.method === "connection_status") {
+            this.showConnectionStatus(content.message);
+        }
+
+        if (content.method === "connection_check_error") {
+            this.showErrorMessage(content.message);
+        }
+
+        if (content.method === "connection_check_finished") {
+            const button = <HTMLButtonElement>this.el.querySelector("#checkAllConnectionsButton");
+            button.disabled = false;
+            button.innerText = "Check all connections";
+        }
+
+        if (content.method === "connection_cancelled") {
+            this.pendingConnection = "";
+            this.resetConnectionButtons();
         }
 
         if (content.method === "update_connections") {
             this.connections = JSON.parse(content.message);
+            this.connectionsTotal = content.total ?? this.connections.length;
+            this.connectionsCount = this.connectionsTotal;
+            this.loadedConnections = new Map(this.connections.map((c: Connection, i: number) => [i, c]));
+            this.pendingPages.clear();
 
-            this.drawConnectionsList(this.connections);
+            if (content.version !== undefined) {
+                this.connectionsVersion = content.version;
+            }
+
+            this.drawConnectionsList();
+        }
+
+        if (content.method === "patch_connections") {
+            this.applyConnectionsPatch(content.message);
+        }
+
+        if (content.method === "connections_page") {
+            this.receiveConnectionsPage(content.message);
         }
 
         if (content.method === "connected") {
             const connectionName = content.message;
+            this.pendingConnection = "";
             this.activeConnection = connectionName;
             this.markConnectedButton(connectionName);
         }
@@ -613,7 +1033,7 @@ export class ConnectorView extends DOMWidgetView {
                 i.style.display = "none";
 
                 const iKernelMessage = <HTMLElement>this.el.querySelector(".connections-guidelines .no-config-file")
-                iKernelMessage.style.display = (this.connections.length === 0) ? "block" : "none";
+                iKernelMessage.style.display = (this.connectionsCount === 0) ? "block" : "none";
 
             } else {
                 i.style.display = "block";
@@ -636,10 +1056,73 @@ export class ConnectorView extends DOMWidgetView {
             });
 
         const selectedButtonEl = (<HTMLButtonElement>this.el.querySelector(`#connBtn_${connectionName.replace(/ /g, "_")}`));
+
+        // the button doesn't exist yet if the connection was just created, it's
+        // marked once the connections patch arrives
+        if (!selectedButtonEl) {
+            return;
+        }
+
         selectedButtonEl.innerText = "Connected";
         selectedButtonEl.classList.add("primary");
     }
 
+    /**
+     * Marks the button of the connection that's being established, clicking
+     * it again cancels the connection
+     *
+     * @param connectionName - Name of the connection being established
+     */
+    markConnectingButton(connectionName: string) {
+        const buttonEl = (<HTMLButtonElement>this.el.querySelector(`#connBtn_${connectionName.replace(/ /g, "_")}`));
+
+        // the button doesn't exist when submitting a new connection
+        if (buttonEl) {
+            buttonEl.innerText = "Connecting... (click to cancel)";
+        }
+    }
+
+    /**
+     * Restores the buttons after a connection attempt fails or is cancelled
+     */
+    resetConnectionButtons() {
+        if (this.activeConnection && this.el.querySelector(`#connBtn_${this.activeConnection.replace(/ /g, "_")}`)) {
+            this.markConnectedButton(this.activeConnection);
+            return;
+        }
+
+        this.el.querySelectorAll('.connection-button-actions .connectionStatusButton')
+            .forEach((button: Element) => {
+                (<HTMLButtonElement>button).innerHTML = "Connect";
+            });
+    }
+
+    /**
+     * Displays the result of checking a connection next to its name
+     *
+     * @param status - Connection check result
+     */
+    showConnectionStatus(status: ConnectionStatus) {
+        this.connectionStatuses.set(status.name, status);
+
+        const statusEl = <HTMLDivElement>this.el.querySelector(`#connStatus_${status.name.replace(/ /g, "_")}`);
+
+        if (!statusEl) {
+            return;
+        }
+
+        statusEl.className = `connection-status ${status.status}`;
+        statusEl.title = status.error || "";
+
+        if (status.status === "ok") {
+            statusEl.innerText = `OK (${status.connect_ms} ms + ${status.roundtrip_ms} ms)`;
+        } else if (status.status === "checking") {
+            statusEl.innerText = "Checking...";
+        } else {
+            statusEl.innerText = status.status === "timeout" ? "Timed out" : "Error";
+        }
+    }
+
     showErrorMessage(error: string) {
         const errorEl = <HTMLDivElement>this.el.querySelector(".user-error-message");
         const errorMessageContainer = errorEl.querySelector("pre");
@@ -0,0 +1,321 @@
+import {
+    DOMWidgetModel,
+    DOMWidgetView,
+    ISerializers,
+} from '@jupyter-widgets/base';
+
+import { MODULE_NAME, MODULE_VERSION } from '../version';
+
+// Import the CSS
+import '../../style/data_table.css';
+
+
+interface Filter {
+    column: string,
+    op: string,
+    value?: any,
+}
+
+interface Sort {
+    column: string,
+    order: 'ASC' | 'DESC',
+}
+
+interface Request {
+    id: number,
+    page: number,
+    nRows: number,
+    sort?: Sort[],
+    filters?: Filter[],
+    count?: boolean,
+}
+
+interface Page {
+    columns: Array<string>,
+    // JSON string, formatted like JupySQL's table widget rows
+    rows: string,
+    total: number | null,
+}
+
+// filter operators (see _filter_condition in jupysql_plugin/table_widget.py)
+const OPERATORS: Array<[string, string]> = [
+    ['eq', '='],
+    ['ne', '!='],
+    ['lt', '<'],
+    ['le', '<='],
+    ['gt', '>'],
+    ['ge', '>='],
+    ['contains', 'contains'],
+    ['startswith', 'starts with'],
+    ['endswith', 'ends with'],
+    ['is_null', 'is null'],
+    ['not_null', 'is not null'],
+];
+
+const escapeHTML = (value: string): string => {
+    const element = document.createElement('span');
+    element.innerText = value;
+    return element.innerHTML;
+};
+
+export class DataTableModel extends DOMWidgetModel {
+    defaults() {
+        return {
+            ...super.defaults(),
+            _model_name: DataTableModel.model_name,
+            _model_module: DataTableModel.model_module,
+            _model_module_version: DataTableModel.model_module_version,
+            _view_name: DataTableModel.view_name,
+            _view_module: DataTableModel.view_module,
+            _view_module_version: DataTableModel.view_module_version,
+            table: null,
+            query: null,
+            page_size: 10,
+        };
+    }
+
+    static serializers: ISerializers = {
+        ...DOMWidgetModel.serializers,
+    };
+
+    static model_name = 'DataTableModel';
+    static model_module = MODULE_NAME;
+    static model_module_version = MODULE_VERSION;
+    static view_name = 'DataTableView';
+    static view_module = MODULE_NAME;
+    static view_module_version = MODULE_VERSION;
+}
+
+export class DataTableView extends DOMWidgetView {
+
+    columns: Array<string> = []
+    page = 0
+    total: number | null = null
+    sort: Sort | null = null
+    filters: Array<Filter> = []
+
+    // replies to older requests (e.g., the user changed the page again before
+    // the previous one arrived) are ignored
+    requestId = 0
+
+    render() {
+        this.el.classList.add('data-table-widget');
+
+        this.el.innerHTML = `
+        <div class="data-table-toolbar">
+            <select class="data-table-filter-column"></select>
+            <select class="data-table-filter-op">
+                ${OPERATORS.map(([op, label]) => `<option value="${op}">${escapeHTML(label)}</option>`).join('')}
+            </select>
+            <input type="text" class="data-table-filter-value" placeholder="Value" />
+            <button class="secondary data-table-filter-add">Add filter</button>
+        </div>
+        <div class="data-table-filters"></div>
+        <div class="data-table-error"></div>
+        <table class="data-table">
+            <thead></thead>
+            <tbody></tbody>
+        </table>
+        <div class="data-table-pager">
+            <button class="secondary data-table-previous">Previous</button>
+            <span class="data-table-position"></span>
+            <button class="secondary data-table-next">Next</button>
+        </div>
+        `;
+
+        // queries are paged from their stored result, which can't be sorted or
+        // filtered
+        if (this.model.get('query') !== null) {
+            (<HTMLElement>this.el.querySelector('.data-table-toolbar')).style.display = 'none';
+        }
+
+        this.el.querySelector('.data-table-filter-add').addEventListener('click', () => {
+            this.addFilter();
+        });
+
+        this.el.querySelector('.data-table-previous').addEventListener('click', () => {
+            if (this.page > 0) {
+                this.request(this.page - 1, false);
+            }
+        });
+
+        this.el.querySelector('.data-table-next').addEventListener('click', () => {
+            if (!this.isLastPage()) {
+                this.request(this.page + 1, false);
+            }
+        });
+
+        this.model.on('msg:custom', this.handleMessage.bind(this));
+
+        this.request(0, true);
+    }
+
+    pageSize(): number {
+        return this.model.get('page_size');
+    }
+
+    isLastPage(): boolean {
+        return this.total !== null && (this.page + 1) * this.pageSize() >= this.total;
+    }
+
+    /**
+     * Requests a page, count also requests the number of rows (which changes
+     * when the filters do)
+     */
+    request(page: number, count: boolean) {
+        const data: Request = {
+            id: ++this.requestId,
+            page,
+            nRows: this.pageSize(),
+            count,
+        };
+
+        if (this.model.get('query') === null) {
+            data.sort = this.sort ? [this.sort] : [];
+            data.filters = this.filters;
+        }
+
+        this.model.send({ method: 'get_page', data });
+    }
+
+    addFilter() {
+        const column = (<HTMLSelectElement>this.el.querySelector('.data-table-filter-column')).value;
+        const op = (<HTMLSelectElement>this.el.querySelector('.data-table-filter-op')).value;
+        const value = (<HTMLInputElement>this.el.querySelector('.data-table-filter-value')).value;
+
+        if (!column) {
+            return;
+        }
+
+        const filter: Filter = { column, op };
+
+        if (op !== 'is_null' && op !== 'not_null') {
+            filter.value = value;
+        }
+
+        this.filters = [...this.filters, filter];
+        this.renderFilters();
+        this.request(0, true);
+    }
+
+    renderFilters() {
+        const container = this.el.querySelector('.data-table-filters');
+        container.innerHTML = '';
+
+        this.filters.forEach((filter, index) => {
+            const label = OPERATORS.find(([op]) => op === filter.op)?.[1] || filter.op;
+            const chip = document.createElement('span');
+            chip.className = 'data-table-filter';
+            chip.innerText = `${filter.column} ${label} ${filter.value ?? ''} ×`;
+            chip.title = 'Remove filter';
+            chip.addEventListener('click', () => {
+                this.filters = this.filters.filter((_, i) => i !== index);
+                this.renderFilters();
+                this.request(0, true);
+            });
+            container.appendChild(chip);
+        });
+    }
+
+    /**
+     * Cycles the sort of a column: ascending, descending, unsorted
+     */
+    toggleSort(column: string) {
+        if (this.sort?.column !== column) {
+            this.sort = { column, order: 'ASC' };
+        } else if (this.sort.order === 'ASC') {
+            this.sort = { column, order: 'DESC' };
+        } else {
+            this.sort = null;
+        }
+
+        this.request(0, false);
+    }
+
+    renderColumns(columns: Array<string>) {
+        this.columns = columns;
+
+        const options = this.el.querySelector('.data-table-filter-column');
+        options.innerHTML = columns
+            .map(column => `<option value="${escapeHTML(column)}">${escapeHTML(column)}</option>`)
+            .join('');
+
+        const row = document.createElement('tr');
+
+        columns.forEach(column => {
+            const header = document.createElement('th');
+            header.innerText = column;
+            header.dataset.column = column;
+
+            if (this.model.get('query') === null) {
+                header.classList.add('data-table-sortable');
+                header.addEventListener('click', () => this.toggleSort(column));
+            }
+
+            row.appendChild(header);
+        });
+
+        const head = this.el.querySelector('thead');
+        head.innerHTML = '';
+        head.appendChild(row);
+    }
+
+    showPage(request: Request, page: Page) {
+        if (this.columns.join('\0') !== page.columns.join('\0')) {
+            this.renderColumns(page.columns);
+        }
+
+        this.el.querySelectorAll<HTMLElement>('th').forEach(header => {
+            const sorted = this.sort?.column === header.dataset.column;
+            header.classList.toggle('data-table-asc', sorted && this.sort.order === 'ASC');
+            header.classList.toggle('data-table-desc', sorted && this.sort.order === 'DESC');
+        });
+
+        this.page = request.page;
+
+        if (page.total !== null) {
+            this.total = page.total;
+        }
+
+        const body = this.el.querySelector('tbody');
+        body.innerHTML = '';
+
+        JSON.parse(page.rows).forEach((values: any) => {
+            const row = document.createElement('tr');
+
+            page.columns.forEach(column => {
+                const cell = document.createElement('td');
+                cell.innerText = String(values[column]);
+                row.appendChild(cell);
+            });
+
+            body.appendChild(row);
+        });
+
+        const start = this.page * this.pageSize();
+        const end = start + body.children.length;
+        const total = this.total === null ? '' : ` of ${this.total}`;
+
+        (<HTMLElement>this.el.querySelector('.data-table-position')).innerText =
+            end > start ? `Rows ${start + 1}-${end}${total}` : `No rows${total}`;
+        (<HTMLButtonElement>this.el.querySelector('.data-table-previous')).disabled = this.page === 0;
+        (<HTMLButtonElement>this.el.querySelector('.data-table-next')).disabled =
+            this.isLastPage() || body.children.length < this.pageSize();
+    }
+
+    handleMessage(content: any) {
+        if (content.request.id !== this.requestId) {
+            return;
+        }
+
+        const error = <HTMLElement>this.el.querySelector('.data-table-error');
+
+        if (content.method === 'error') {
+            error.innerText = content.message;
+            return;
+        }
+
+        error.innerText = '';
+        this.showPage(content.request, content.message);
+    }
+}
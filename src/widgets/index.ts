@@ -3,6 +3,8 @@ import { Widget } from '@lumino/widgets';
 import { IJupyterWidgetRegistry } from '@jupyter-widgets/base';
 
 import * as connectorWidget from './connector';
+import * as dataTableWidget from './data_table';
+import * as schemaBrowserWidget from './schema_browser';
 import { MODULE_NAME, MODULE_VERSION } from '../version';
 
 
@@ -29,7 +31,7 @@ function activateWidgetExtension(
     registry.registerWidget({
         name: MODULE_NAME,
         version: MODULE_VERSION,
-        exports: connectorWidget,
+        exports: { ...connectorWidget, ...dataTableWidget, ...schemaBrowserWidget },
     });
 }
 
@@ -0,0 +1,241 @@
+import {
+    DOMWidgetModel,
+    DOMWidgetView,
+    ISerializers,
+} from '@jupyter-widgets/base';
+
+import { MODULE_NAME, MODULE_VERSION } from '../version';
+
+// Import the CSS
+import '../../style/schema_browser.css';
+
+
+interface SchemaItem {
+    name: string,
+    default?: boolean,
+    type?: string,
+    nullable?: boolean,
+}
+
+interface Page {
+    items: Array<SchemaItem>,
+    total: number,
+    offset: number,
+    limit: number,
+}
+
+interface Request {
+    schema?: string,
+    table?: string,
+    query?: string,
+    offset?: number,
+}
+
+export class SchemaBrowserModel extends DOMWidgetModel {
+    defaults() {
+        return {
+            ...super.defaults(),
+            _model_name: SchemaBrowserModel.model_name,
+            _model_module: SchemaBrowserModel.model_module,
+            _model_module_version: SchemaBrowserModel.model_module_version,
+            _view_name: SchemaBrowserModel.view_name,
+            _view_module: SchemaBrowserModel.view_module,
+            _view_module_version: SchemaBrowserModel.view_module_version,
+            connection_name: null,
+            page_size: 50,
+        };
+    }
+
+    static serializers: ISerializers = {
+        ...DOMWidgetModel.serializers,
+    };
+
+    static model_name = 'SchemaBrowserModel';
+    static model_module = MODULE_NAME;
+    static model_module_version = MODULE_VERSION;
+    static view_name = 'SchemaBrowserView';
+    static view_module = MODULE_NAME;
+    static view_module_version = MODULE_VERSION;
+}
+
+export class SchemaBrowserView extends DOMWidgetView {
+
+    // the search box filters the schemas, expanded nodes keep their own filter
+    query = ""
+
+    render() {
+        this.el.classList.add('schema-browser-widget');
+
+        this.el.innerHTML = `
+        <div class="schema-browser-toolbar">
+            <input type="search" class="schema-browser-search" placeholder="Filter schemas" />
+            <button class="secondary schema-browser-refresh">Refresh</button>
+        </div>
+        <div class="schema-browser-error"></div>
+        <ul class="schema-browser-tree" data-key=""></ul>
+        `;
+
+        const search = <HTMLInputElement>this.el.querySelector(".schema-browser-search");
+        let debounce: ReturnType<typeof setTimeout> = null;
+
+        search.addEventListener("input", () => {
+            clearTimeout(debounce);
+
+            debounce = setTimeout(() => {
+                this.query = search.value;
+                this.clearList(this.getRootList());
+                this.request("list_schemas", { query: this.query });
+            }, 200);
+        });
+
+        this.el.querySelector(".schema-browser-refresh").addEventListener("click", () => {
+            this.clearList(this.getRootList());
+            this.request("refresh", { query: this.query });
+        });
+
+        this.model.on('msg:custom', this.handleMessage.bind(this));
+
+        this.request("list_schemas", {});
+    }
+
+    getRootList(): HTMLUListElement {
+        return this.el.querySelector(".schema-browser-tree");
+    }
+
+    request(method: string, data: Request) {
+        this.model.send({ method, data });
+    }
+
+    clearList(list: HTMLUListElement) {
+        list.innerHTML = "";
+        (<HTMLElement>this.el.querySelector(".schema-browser-error")).innerText = "";
+    }
+
+    /**
+     * Returns the list where the items of a response should be appended
+     */
+    findList(method: string, request: Request): HTMLUListElement {
+        if (method === "list_schemas") {
+            return this.getRootList();
+        }
+
+        const key = method === "list_tables"
+            ? JSON.stringify([request.schema])
+            : JSON.stringify([request.schema, request.table]);
+
+        const lists = this.el.querySelectorAll<HTMLUListElement>("ul.schema-browser-children");
+
+        for (const list of Array.from(lists)) {
+            if (list.dataset.key === key) {
+                return list;
+            }
+        }
+
+        return null;
+    }
+
+    createNode(method: string, request: Request, item: SchemaItem): HTMLLIElement {
+        const node = document.createElement("li");
+        const label = document.createElement("span");
+        label.className = "schema-browser-label";
+        label.innerText = item.name;
+        node.appendChild(label);
+
+        if (method === "list_columns") {
+            node.classList.add("schema-browser-column");
+
+            const type = document.createElement("span");
+            type.className = "schema-browser-type";
+            type.innerText = item.type;
+            node.appendChild(type);
+
+            return node;
+        }
+
+        // schemas and tables can be expanded, their children are requested
+        // the first time they're expanded
+        const isSchema = method === "list_schemas";
+        node.classList.add(isSchema ? "schema-browser-schema" : "schema-browser-table");
+
+        if (item.type === "view") {
+            node.classList.add("schema-browser-view");
+        }
+
+        const children = document.createElement("ul");
+        children.className = "schema-browser-children";
+        children.style.display = "none";
+        children.dataset.key = isSchema
+            ? JSON.stringify([item.name])
+            : JSON.stringify([request.schema, item.name]);
+        node.appendChild(children);
+
+        label.addEventListener("click", () => {
+            const expanded = node.classList.toggle("expanded");
+            children.style.display = expanded ? "block" : "none";
+
+            if (expanded && !children.dataset.loaded) {
+                children.dataset.loaded = "true";
+
+                if (isSchema) {
+                    this.request("list_tables", { schema: item.name });
+                } else {
+                    this.request("list_columns", { schema: request.schema, table: item.name });
+                }
+            }
+        });
+
+        return node;
+    }
+
+    showPage(method: string, request: Request, page: Page) {
+        const list = this.findList(method, request);
+
+        // the node was removed (e.g., the list was refreshed)
+        if (!list) {
+            return;
+        }
+
+        list.querySelector(":scope > .schema-browser-more")?.remove();
+
+        page.items.forEach(item => {
+            list.appendChild(this.createNode(method, request, item));
+        });
+
+        const loaded = page.offset + page.items.length;
+
+        if (loaded < page.total) {
+            const more = document.createElement("li");
+            more.className = "schema-browser-more";
+            more.innerText = `Load more (${page.total - loaded} remaining)`;
+            more.addEventListener("click", () => {
+                more.innerText = "Loading...";
+                this.request(method, { ...request, offset: loaded });
+            });
+            list.appendChild(more);
+        }
+
+        if (page.total === 0) {
+            const empty = document.createElement("li");
+            empty.className = "schema-browser-empty";
+            empty.innerText = "Nothing to show";
+            list.appendChild(empty);
+        }
+    }
+
+    handleMessage(content: any) {
+        if (content.method === "error") {
+            (<HTMLElement>this.el.querySelector(".schema-browser-error")).innerText = content.message;
+
+            // allow the user to expand the node again to retry
+            const list = this.findList(content.request.method, content.request.data);
+
+            if (list) {
+                delete list.dataset.loaded;
+            }
+
+            return;
+        }
+
+        this.showPage(content.method, content.request, content.message);
+    }
+}
@@ -1,4 +1,5 @@
 import os
+from collections import Counter
 from pathlib import Path
 
 import pytest
@@ -9,9 +10,8 @@ from traitlets.config import Config
 from sql.magic import SqlMagic, _set_sql_magic
 from sql import connection
 
-
-# https://github.com/jupyter-server/pytest-jupyter
-pytest_plugins = ["pytest_jupyter.jupyter_server"]
+from jupysql_plugin import credentials
+from jupysql_plugin.widgets.engines import engines
 
 
 @pytest.fixture()
@@ -59,6 +59,9 @@ def isolate_tests(monkeypatch):
     # close connections
     connection.ConnectionManager.close_all()
 
+    # the engine registry is global, clear it so engines aren't shared across tests
+    engines.dispose_all()
+
 
 @pytest.fixture
 def tmp_empty(tmp_path):
@@ -76,3 +79,60 @@ def tmp_empty(tmp_path):
 @pytest.fixture
 def override_sql_magic():
     yield _init_sql_magic()
+
+
+class FakeProvider:
+    """
+    Credentials provider that returns a new token every time it's called:
+    fake:NAME returns NAME-1, NAME-2, etc. The number of fetches per name is
+    counted in FakeProvider.fetches
+    """
+
+    fetches = Counter()
+
+    def __init__(self, argument, username=None):
+        self.name = argument
+        self.username = username
+
+    def fetch(self):
+        FakeProvider.fetches[self.name] += 1
+        return credentials.Credentials(
+            f"{self.name}-{FakeProvider.fetches[self.name]}"
+        )
+
+
+@pytest.fixture
+def fake_provider(monkeypatch):
+    """Registers the fake: credentials provider and returns its class"""
+    FakeProvider.fetches.clear()
+    monkeypatch.setitem(credentials.PROVIDERS, "fake", FakeProvider)
+    yield FakeProvider
+    credentials.credential_cache.invalidate()
+
+
+class Comm:
+    """A comm that records the messages sent to the frontend"""
+
+    def __init__(self):
+        self.sent = []
+
+    def on_msg(self, fn):
+        self.recv = fn
+
+    def send(self, data, buffers=None):
+        self.sent.append((data, buffers))
+
+    def request(self, data):
+        """Sends data to the kernel and returns the last reply (or None)"""
+        self.recv({"content": {"data": data}})
+        return self.sent[-1] if self.sent else None
+
+
+@pytest.fixture
+def comm():
+    """A comm opened by the frontend's table widget (see table_widget)"""
+    from jupysql_plugin import table_widget
+
+    comm = Comm()
+    table_widget.comm_handler(comm, None)
+    return comm
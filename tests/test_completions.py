@@ -0,0 +1,189 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.engine import make_url
+from sql.connection import ConnectionManager
+
+from jupysql_plugin.completions import (
+    SchemaCompletionCache,
+    _is_in_memory,
+    comm_handler,
+)
+from jupysql_plugin.widgets.connections import ConnectorWidgetManager
+
+
+@pytest.fixture
+def sqlite_file(tmp_empty):
+    ConnectionManager.set("sqlite:///my.db", alias="file", displaycon=False)
+    connection = ConnectionManager.current
+    connection.execute("CREATE TABLE numbers (x INTEGER, y INTEGER)")
+    connection.execute("CREATE TABLE letters (a TEXT)")
+    connection.execute("CREATE VIEW my_view AS SELECT x FROM numbers")
+    return connection
+
+
+def _fill(cache, tables=()):
+    cache.get_completions(tables)
+    cache.run_deferred()
+    cache.wait()
+    return cache.get_completions(tables)
+
+
+def test_no_connection():
+    assert SchemaCompletionCache().get_completions(["numbers"]) == {
+        "tables": [],
+        "columns": {},
+        "loading": False,
+    }
+
+
+def test_loads_in_the_background(sqlite_file):
+    cache = SchemaCompletionCache()
+
+    assert cache.get_completions(["numbers"]) == {
+        "tables": [],
+        "columns": {},
+        "loading": True,
+    }
+
+    cache.wait()
+
+    assert cache.get_completions(["numbers"]) == {
+        "tables": ["letters", "numbers", "my_view"],
+        "columns": {"numbers": ["x", "y"]},
+        "loading": False,
+    }
+
+
+def test_in_memory_database_is_loaded_after_replying():
+    ConnectionManager.set("duckdb://", alias="duck", displaycon=False)
+    ConnectionManager.current.execute("CREATE TABLE numbers (x INTEGER)")
+
+    cache = SchemaCompletionCache()
+
+    assert cache.get_completions(["numbers"])["loading"]
+    assert cache._worker is None
+
+    cache.run_deferred()
+
+    assert cache.get_completions(["numbers"]) == {
+        "tables": ["numbers"],
+        "columns": {"numbers": ["x"]},
+        "loading": False,
+    }
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("duckdb://", True),
+        ("sqlite://", True),
+        ("sqlite:///:memory:", True),
+        ("sqlite:///my.db", False),
+        ("postgresql://user@host", False),
+        ("mssql+pyodbc://@dsn", False),
+    ],
+)
+def test_is_in_memory(url, expected):
+    engine = SimpleNamespace(url=make_url(url))
+    connection = SimpleNamespace(connection_sqlalchemy=SimpleNamespace(engine=engine))
+
+    assert _is_in_memory(connection) is expected
+
+
+def test_unknown_table(sqlite_file):
+    assert _fill(SchemaCompletionCache(), ["missing"])["columns"] == {"missing": []}
+
+
+def test_columns_are_bounded(sqlite_file):
+    cache = SchemaCompletionCache(max_tables=2)
+
+    _fill(cache, ["numbers", "letters"])
+    _fill(cache, ["my_view"])
+
+    assert list(cache._columns) == ["letters", "my_view"]
+
+
+def test_refresh_keeps_columns_of_existing_tables(sqlite_file):
+    cache = SchemaCompletionCache()
+    _fill(cache, ["numbers", "letters"])
+
+    sqlite_file.execute("DROP TABLE letters")
+    sqlite_file.execute("CREATE TABLE words (w TEXT)")
+
+    cache.ttl = 0
+    cache.get_completions()
+    cache.wait()
+    cache.ttl = 60
+
+    assert cache.get_completions() == {
+        "tables": ["numbers", "words", "my_view"],
+        "columns": {},
+        "loading": False,
+    }
+    assert list(cache._columns) == ["numbers"]
+
+
+def test_schema_qualified_tables(sqlite_file):
+    cache = SchemaCompletionCache()
+
+    assert _fill(cache, ["main.numbers"])["columns"] == {"main.numbers": ["x", "y"]}
+
+    cache.ttl = 0
+    cache.get_completions()
+    cache.wait()
+    cache.ttl = 60
+
+    assert cache.get_completions(["main.numbers"])["columns"] == {
+        "main.numbers": ["x", "y"]
+    }
+
+
+def test_switching_connections_resets_the_cache(sqlite_file):
+    cache = SchemaCompletionCache()
+    _fill(cache)
+
+    ConnectionManager.set("duckdb://", alias="duck", displaycon=False)
+
+    assert cache.get_completions() == {"tables": [], "columns": {}, "loading": True}
+
+
+def test_connect_to_database_invalidates_the_cache(sqlite_file, monkeypatch):
+    cache = SchemaCompletionCache()
+    monkeypatch.setattr(
+        "jupysql_plugin.widgets.connections.completion_cache", cache
+    )
+    _fill(cache)
+
+    ConnectorWidgetManager().connect_to_database("sqlite:///my.db", "file")
+
+    assert cache.get_completions()["tables"] == []
+
+
+def test_comm_handler(sqlite_file, monkeypatch):
+    cache = SchemaCompletionCache()
+    monkeypatch.setattr("jupysql_plugin.completions.completion_cache", cache)
+    _fill(cache, ["letters"])
+
+    class Comm:
+        def __init__(self):
+            self.sent = []
+
+        def on_msg(self, fn):
+            self.recv = fn
+
+        def send(self, data):
+            self.sent.append(data)
+
+    comm = Comm()
+    comm_handler(comm, None)
+    comm.recv({"content": {"data": {"id": 1, "tables": ["letters"]}}})
+
+    assert comm.sent == [
+        {
+            "id": 1,
+            "tables": ["letters", "numbers", "my_view"],
+            "columns": {"letters": ["a"]},
+            "loading": False,
+        }
+    ]
@@ -1,9 +1,20 @@
+import multiprocessing
+import os
+import stat
+import sys
+import threading
+from configparser import ConfigParser
 from unittest.mock import ANY
 from pathlib import Path
 
 import pytest
-from jupysql_plugin.widgets import connections
+
+# import jupysql first, importing jupysql_plugin.widgets first causes a circular
+# import (this matters in the subprocesses spawned by the stress test)
 from sql.connection import ConnectionManager
+from jupysql_plugin.widgets import connections
+from jupysql_plugin import connections_file
+from jupysql_plugin.widgets.engines import engines
 
 
 @pytest.mark.parametrize(
@@ -194,6 +205,29 @@ database = my.db
     assert path.read_text().strip() == expected.strip()
 
 
+@pytest.mark.parametrize("query", ["{'a':", "not a dict", "[1, 2]"])
+def test_invalid_sections_fall_back_to_jupysql(tmp_empty, query, monkeypatch):
+    Path("jupysql-plugin.ini").write_text(
+        f"[duck]\ndrivername = duckdb\nquery = {query}\n"
+    )
+    calls = []
+
+    def connection_str_from_dsn_section(section, config):
+        calls.append(section)
+        raise RuntimeError("jupysql's error")
+
+    monkeypatch.setattr(
+        connections, "connection_str_from_dsn_section", connection_str_from_dsn_section
+    )
+
+    with pytest.raises(RuntimeError, match="jupysql's error"):
+        connections.ConnectorWidgetManager().connect_to_database_in_section(
+            connection_name="duck"
+        )
+
+    assert calls == ["duck"]
+
+
 def test_delete_section_with_name(tmp_empty):
     Path("jupysql-plugin.ini").write_text(
         """
@@ -215,3 +249,475 @@ drivername = sqlite
 """.strip()
 
     assert Path("jupysql-plugin.ini").read_text().strip() == expected
+
+
+def test_config_is_cached_until_the_file_changes(tmp_empty):
+    path = Path("jupysql-plugin.ini")
+    path.write_text(
+        """
+[duck]
+drivername = duckdb
+"""
+    )
+
+    manager = connections.ConnectorWidgetManager()
+    config = manager._get_config()
+
+    assert connections.ConnectorWidgetManager()._get_config() is config
+
+    path.write_text(
+        """
+[duck]
+drivername = duckdb
+
+[sqlite]
+drivername = sqlite
+"""
+    )
+
+    new_config = manager._get_config()
+
+    assert new_config is not config
+    assert new_config.sections() == ["duck", "sqlite"]
+
+
+def test_config_cache_is_refreshed_after_writing(tmp_empty, monkeypatch):
+    Path("jupysql-plugin.ini").write_text(
+        """
+[duck]
+drivername = duckdb
+
+[sqlite]
+drivername = sqlite
+"""
+    )
+
+    manager = connections.ConnectorWidgetManager()
+    manager.delete_section_with_name("duck")
+
+    def load(path):
+        raise AssertionError("the config file should not be parsed again")
+
+    monkeypatch.setattr(connections_file._config_cache, "load", load)
+
+    assert not manager.section_name_already_exists("duck")
+    assert manager.get_connections_from_config_file() == [
+        {"driver": "sqlite", "name": "sqlite"}
+    ]
+
+
+def test_failed_update_leaves_config_file_untouched(tmp_empty):
+    path = Path("jupysql-plugin.ini")
+    path.write_text(
+        """
+[duck]
+drivername = duckdb
+"""
+    )
+
+    def update(config):
+        config.remove_section("duck")
+        raise ValueError("something went wrong")
+
+    with pytest.raises(ValueError):
+        connections.ConnectorWidgetManager()._write_config(update)
+
+    assert path.read_text() == """
+[duck]
+drivername = duckdb
+"""
+    assert sorted(p.name for p in Path(".").iterdir()) == [
+        "jupysql-plugin.ini",
+        "jupysql-plugin.ini.lock",
+    ]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permissions")
+def test_writes_keep_the_permissions_of_the_config_file(tmp_empty):
+    path = Path("jupysql-plugin.ini")
+    path.write_text("[duck]\ndrivername = duckdb\n")
+    path.chmod(0o664)
+    manager = connections.ConnectorWidgetManager()
+
+    manager.delete_section_with_name("duck")
+
+    assert stat.S_IMODE(path.stat().st_mode) == 0o664
+
+
+@pytest.mark.skipif(os.name == "nt", reason="POSIX permissions")
+def test_new_config_file_gets_the_default_permissions(tmp_empty):
+    umask = os.umask(0o022)
+
+    try:
+        connections.ConnectorWidgetManager().save_connection_to_config_file_and_connect(
+            {"connectionName": "duck", "driver": "duckdb"}, connect=False
+        )
+    finally:
+        os.umask(umask)
+
+    assert stat.S_IMODE(Path("jupysql-plugin.ini").stat().st_mode) == 0o644
+
+
+class ConnectorWidgetManagerWithPath(connections.ConnectorWidgetManager):
+    """A manager that doesn't depend on the sql magic so it can be used in
+    subprocesses
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def get_path_to_config_file(self):
+        return self.path
+
+
+def _save_and_delete_connections(path, index):
+    manager = ConnectorWidgetManagerWithPath(path)
+
+    for name in (f"keep-{index}", f"delete-{index}"):
+        manager.save_connection_to_config_file_and_connect(
+            {"connectionName": name, "driver": "duckdb"}, connect=False
+        )
+
+    manager.delete_section_with_name(f"delete-{index}")
+
+
+def test_concurrent_saves_and_deletes_are_merged(tmp_empty):
+    path = str(Path("jupysql-plugin.ini").resolve())
+    n_tasks = 64
+
+    with multiprocessing.get_context("spawn").Pool(8) as pool:
+        pool.starmap(
+            _save_and_delete_connections, [(path, i) for i in range(n_tasks)]
+        )
+
+    config = ConfigParser()
+    config.read(path)
+
+    assert set(config.sections()) == {f"keep-{i}" for i in range(n_tasks)}
+    assert not list(Path(".").glob("*.tmp"))
+
+
+def test_check_connection(tmp_empty):
+    Path("jupysql-plugin.ini").write_text(
+        """
+[duck]
+drivername = duckdb
+
+[pg]
+drivername = postgresql
+host = localhost
+"""
+    )
+
+    manager = connections.ConnectorWidgetManager()
+
+    assert manager.check_connection("duck") == {
+        "name": "duck",
+        "status": "ok",
+        "connect_ms": ANY,
+        "roundtrip_ms": ANY,
+    }
+
+    assert manager.check_connection("pg") == {
+        "name": "pg",
+        "status": "error",
+        "error": ANY,
+    }
+
+    # checking doesn't open connections in jupysql or keep engines
+    assert ConnectionManager.connections == {}
+    assert len(engines) == 0
+
+
+def test_check_connection_doesnt_replace_the_engine_in_use(tmp_empty):
+    Path("jupysql-plugin.ini").write_text("[duck]\ndrivername = duckdb\n")
+    manager = connections.ConnectorWidgetManager()
+    manager.connect_to_database_in_section(connection_name="duck")
+    engine = engines.get("duck", "duckdb://")
+
+    # the stored connection changed since we connected
+    Path("jupysql-plugin.ini").write_text(
+        "[duck]\ndrivername = duckdb\ndatabase = other.db\n"
+    )
+
+    assert manager.check_connection("duck")["status"] == "ok"
+    assert engines.get("duck", "duckdb://") is engine
+    assert ConnectionManager.connections["duck"]._connection.engine is engine
+
+
+def test_check_connections_reports_timeouts(tmp_empty, monkeypatch):
+    Path("jupysql-plugin.ini").write_text(
+        """
+[duck]
+drivername = duckdb
+
+[slow]
+drivername = duckdb
+
+[sqlite]
+drivername = sqlite
+"""
+    )
+
+    manager = connections.ConnectorWidgetManager()
+    release = threading.Event()
+    check_connection = manager.check_connection
+
+    def check_connection_slowly(name):
+        if name == "slow":
+            release.wait()
+
+        return check_connection(name)
+
+    monkeypatch.setattr(manager, "check_connection", check_connection_slowly)
+
+    try:
+        results = list(manager.check_connections(max_workers=2, timeout=0.2))
+    finally:
+        release.set()
+
+    assert {r["name"]: r["status"] for r in results} == {
+        "duck": "ok",
+        "sqlite": "ok",
+        "slow": "timeout",
+    }
+    # the slow connection is reported last
+    assert results[-1] == {
+        "name": "slow",
+        "status": "timeout",
+        "error": "Timed out after 0.2 seconds",
+    }
+
+
+def test_check_connections_empty_file(tmp_empty):
+    assert list(connections.ConnectorWidgetManager().check_connections()) == []
+
+
+def test_diff_connections():
+    old = [
+        {"name": "duck", "driver": "duckdb"},
+        {"name": "pg", "driver": "postgresql", "host": "localhost"},
+        {"name": "sqlite", "driver": "sqlite"},
+    ]
+    new = [
+        {"name": "pg", "driver": "postgresql", "host": "db.corp.com"},
+        {"name": "sqlite", "driver": "sqlite"},
+        {"name": "mysql", "driver": "mysql+pymysql"},
+    ]
+
+    assert connections._diff_connections(old, new) == {
+        "added": [{"name": "mysql", "driver": "mysql+pymysql"}],
+        "removed": ["duck"],
+        "changed": [{"name": "pg", "driver": "postgresql", "host": "db.corp.com"}],
+    }
+
+
+@pytest.fixture
+def count_writes(monkeypatch):
+    writes = []
+    update = connections_file.ConnectionsFile.update
+
+    def counting_update(self, fn, **kwargs):
+        writes.append(self.path)
+        return update(self, fn, **kwargs)
+
+    monkeypatch.setattr(connections_file.ConnectionsFile, "update", counting_update)
+    return writes
+
+
+def test_import_connections(tmp_empty, count_writes):
+    Path("jupysql-plugin.ini").write_text("[stored]\ndrivername = duckdb\n")
+    manager = connections.ConnectorWidgetManager()
+
+    results = manager.import_connections(
+        [
+            {"name": "duck", "driver": "duckdb", "database": ":memory:"},
+            {"connectionName": "lite", "driver": "sqlite", "port": None},
+            {"name": "no-driver"},
+            {"name": "typo", "driver": "duckdb", "hots": "localhost"},
+            {"name": "duck", "driver": "sqlite"},
+            {"name": "stored", "driver": "duckdb"},
+            {"name": "missing-dbapi", "driver": "mysql+notadriver"},
+        ]
+    )
+
+    assert results == [
+        {"name": "duck", "status": "imported"},
+        {"name": "lite", "status": "imported"},
+        {
+            "name": "no-driver",
+            "status": "invalid",
+            "error": "ValueError: Missing connection key: driver",
+        },
+        {
+            "name": "typo",
+            "status": "invalid",
+            "error": "ValueError: Unknown connection keys: hots",
+        },
+        {
+            "name": "duck",
+            "status": "invalid",
+            "error": "ValueError: Duplicated connection name: 'duck'",
+        },
+        {
+            "name": "stored",
+            "status": "error",
+            "error": "ConnectionWithNameAlreadyExists: A connection named 'stored' "
+            "already exists in your connections file",
+        },
+        {"name": "missing-dbapi", "status": "error", "error": ANY},
+    ]
+    # the valid connections are stored in a single write
+    assert len(count_writes) == 1
+    assert manager._get_store().get_names() == ["stored", "duck", "lite"]
+    assert manager._get_store().get_section("lite") == {"drivername": "sqlite"}
+
+
+def test_import_connections_reports_invalid_queries(tmp_empty):
+    manager = connections.ConnectorWidgetManager()
+
+    results = manager.import_connections(
+        [{"name": "duck", "driver": "duckdb", "query": "{'a':"}]
+    )
+
+    assert results == [
+        {
+            "name": "duck",
+            "status": "invalid",
+            "error": "ValueError: Invalid connection: SyntaxError: '{' was never "
+            "closed (<unknown>, line 1)",
+        }
+    ]
+
+
+def test_import_connections_rejects_command_credentials(tmp_empty):
+    command = f"{sys.executable} -c 'open(\"ran.txt\", \"w\")'"
+    entry = {"name": "lite", "driver": "sqlite", "credentials": f"command:{command}"}
+    manager = connections.ConnectorWidgetManager()
+
+    assert manager.import_connections([entry]) == [
+        {
+            "name": "lite",
+            "status": "invalid",
+            "error": "ValueError: Credentials providers that run commands can't be "
+            "imported unless they're explicitly allowed",
+        }
+    ]
+    assert not Path("ran.txt").exists()
+
+    results = manager.import_connections([entry], connect=False, allow_commands=True)
+
+    assert results == [{"name": "lite", "status": "imported"}]
+
+
+def test_import_connections_overwrite(tmp_empty):
+    Path("jupysql-plugin.ini").write_text(
+        "[duck]\ndrivername = duckdb\ndatabase = old.db\n"
+    )
+    manager = connections.ConnectorWidgetManager()
+
+    results = manager.import_connections(
+        [{"name": "duck", "driver": "duckdb", "database": ":memory:"}],
+        overwrite=True,
+    )
+
+    assert results == [{"name": "duck", "status": "imported"}]
+    assert manager._get_store().get_section("duck") == {
+        "drivername": "duckdb",
+        "database": ":memory:",
+    }
+
+
+@pytest.mark.parametrize(
+    "filename, content",
+    [
+        (
+            "team.ini",
+            """
+[duck]
+drivername = duckdb
+database = :memory:
+
+[pg]
+drivername = postgresql
+host = db.corp.com
+port = 5432
+""",
+        ),
+        (
+            "team.yaml",
+            """
+duck:
+  driver: duckdb
+  database: ":memory:"
+pg:
+  driver: postgresql
+  host: db.corp.com
+  port: 5432
+""",
+        ),
+        (
+            "team.yml",
+            """
+- name: duck
+  driver: duckdb
+  database: ":memory:"
+- name: pg
+  driver: postgresql
+  host: db.corp.com
+  port: 5432
+""",
+        ),
+    ],
+)
+def test_import_connections_from_file(tmp_empty, filename, content):
+    Path(filename).write_text(content)
+    manager = connections.ConnectorWidgetManager()
+
+    results = manager.import_connections(filename, connect=False)
+
+    assert results == [
+        {"name": "duck", "status": "imported"},
+        {"name": "pg", "status": "imported"},
+    ]
+    assert manager.get_connections_from_config_file()[1] == {
+        "name": "pg",
+        "driver": "postgresql",
+        "host": "db.corp.com",
+        "port": "5432",
+    }
+
+
+def test_import_connections_reports_timeouts(tmp_empty, monkeypatch):
+    validate_section = connections._validate_section
+    release = threading.Event()
+
+    def validate_slowly(section, *, connect):
+        if section["drivername"] == "sqlite":
+            release.wait()
+
+        return validate_section(section, connect=connect)
+
+    monkeypatch.setattr(connections, "_validate_section", validate_slowly)
+    manager = connections.ConnectorWidgetManager()
+
+    results = manager.import_connections(
+        [{"name": "slow", "driver": "sqlite"}, {"name": "duck", "driver": "duckdb"}],
+        timeout=0.2,
+    )
+    release.set()
+
+    assert results == [
+        {
+            "name": "slow",
+            "status": "timeout",
+            "error": "TimeoutError: Timed out after 0.2 seconds",
+        },
+        {"name": "duck", "status": "imported"},
+    ]
+    assert manager._get_store().get_names() == ["duck"]
+
+
+def test_import_connections_from_missing_file(tmp_empty):
+    with pytest.raises(FileNotFoundError):
+        connections.ConnectorWidgetManager().import_connections("missing.ini")
@@ -1,38 +1,63 @@
+import asyncio
+import json
+import threading
 from pathlib import Path
 
 import pytest
 from sql.connection import ConnectionManager
-from IPython.core.error import UsageError
 
+from jupysql_plugin.exceptions import PreflightCheckFailed
 from jupysql_plugin.widgets.connector_widget import ConnectorWidget
+from jupysql_plugin.widgets.connections import ConnectorWidgetManager
 
 
-class ConnectorWidgetTesting(ConnectorWidget):
-    """A class to test ConnectorWidget methods"""
+@pytest.fixture
+def testing_widget(recording_widget):
+    """
+    Returns a ConnectorWidget subclass that raises the errors it would send to
+    the frontend
+    """
 
-    def send_error_message_to_frontend(self, *, method, error):
-        """The original implementation sends a message to the frontend, here,
-        we raise an error instead
-        """
-        raise error
+    class ConnectorWidgetTesting(recording_widget):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.errors = []
+
+        def send_error_message_to_frontend(self, *, method, error):
+            """The original implementation sends a message to the frontend, here,
+            we store the error and raise it once the message has been handled
+            """
+            self.errors.append(error)
+
+        def _handle_message(self, widget, content, buffers):
+            super()._handle_message(widget, content, buffers)
+
+            # connections are established in a worker thread, wait for it to
+            # finish
+            self.wait_for_connection_attempt()
 
+            if self.errors:
+                raise self.errors.pop()
 
-def test_method_missing():
+    return ConnectorWidgetTesting
+
+
+def test_method_missing(testing_widget):
     with pytest.raises(ValueError) as excinfo:
-        ConnectorWidgetTesting()._handle_message(None, {}, None)
+        testing_widget()._handle_message(None, {}, None)
 
     assert "Method is not specified" == str(excinfo.value)
 
 
-def test_method_unknown():
+def test_method_unknown(testing_widget):
     with pytest.raises(ValueError) as excinfo:
-        ConnectorWidgetTesting()._handle_message(None, {"method": "not-a-method"}, None)
+        testing_widget()._handle_message(None, {"method": "not-a-method"}, None)
 
     assert "Method not-a-method is not supported" == str(excinfo.value)
 
 
-def test_method_submit_new_connection(tmp_empty):
-    ConnectorWidgetTesting()._handle_message(
+def test_method_submit_new_connection(tmp_empty, testing_widget):
+    testing_widget()._handle_message(
         None,
         {
             "method": "submit_new_connection",
@@ -62,8 +87,8 @@ drivername = duckdb
         ),
     ],
 )
-def test_method_submit_new_connection_path(tmp_empty, data, expected):
-    ConnectorWidgetTesting()._handle_message(
+def test_method_submit_new_connection_path(tmp_empty, data, expected, testing_widget):
+    testing_widget()._handle_message(
         None,
         {
             "method": "submit_new_connection",
@@ -78,10 +103,15 @@ def test_method_submit_new_connection_path(tmp_empty, data, expected):
     assert set(ConnectionManager.connections) == {"duck"}
 
 
-def test_submit_new_connection_doesnt_modify_ini_file_if_fails_to_connect(tmp_empty):
-    widget = ConnectorWidgetTesting()
+def test_submit_new_connection_doesnt_modify_ini_file_if_fails_to_connect(
+    tmp_empty, testing_widget
+):
+    widget = testing_widget()
 
-    with pytest.raises(UsageError):
+    # the postgresql driver (psycopg2 or psycopg) isn't installed
+    with pytest.raises(
+        PreflightCheckFailed, match="No module named 'psycopg2?'"
+    ) as excinfo:
         widget._handle_message(
             None,
             {
@@ -95,10 +125,11 @@ def test_submit_new_connection_doesnt_modify_ini_file_if_fails_to_connect(tmp_em
             None,
         )
 
+    assert excinfo.value.check == "driver"
     assert not Path("jupysql-plugin.ini").exists()
 
 
-def test_method_connect(tmp_empty):
+def test_method_connect(tmp_empty, testing_widget):
     Path("jupysql-plugin.ini").write_text(
         """
 [duck]
@@ -106,7 +137,7 @@ drivername = duckdb
 """
     )
 
-    ConnectorWidgetTesting()._handle_message(
+    testing_widget()._handle_message(
         None,
         {
             "method": "connect",
@@ -126,7 +157,7 @@ drivername = duckdb
 """
     )
 
-    assert ConnectorWidget().stored_connections == [
+    assert json.loads(ConnectorWidget().connections) == [
         {"driver": "duckdb", "name": "myduckdbconn"}
     ]
 
@@ -140,7 +171,468 @@ drivername = sqlite
 """
     )
 
-    assert ConnectorWidget().stored_connections == [
+    assert json.loads(ConnectorWidget().connections) == [
         {"driver": "duckdb", "name": "myduckdbconn"},
         {"driver": "sqlite", "name": "sqlite"},
     ]
+
+
+def test_method_connect_sends_progress_messages(tmp_empty, testing_widget):
+    Path("jupysql-plugin.ini").write_text(
+        """
+[duck]
+drivername = duckdb
+"""
+    )
+
+    widget = testing_widget()
+    widget._handle_message(None, {"method": "connect", "data": {"name": "duck"}}, None)
+
+    assert widget.messages == [
+        {"method": "connecting", "message": "duck"},
+        {"method": "connected", "message": "duck"},
+    ]
+
+
+@pytest.fixture
+def slow_connect(monkeypatch):
+    """Makes connecting block until the returned event is set"""
+    release = threading.Event()
+    connect_to_database = ConnectorWidgetManager.connect_to_database
+
+    def connect_slowly(self, connection_str, connection_name, **kwargs):
+        release.wait()
+        connect_to_database(self, connection_str, connection_name, **kwargs)
+
+    monkeypatch.setattr(ConnectorWidgetManager, "connect_to_database", connect_slowly)
+
+    yield release
+
+    release.set()
+
+
+def test_connect_does_not_block_and_times_out(
+    tmp_empty, slow_connect, recording_widget
+):
+    Path("jupysql-plugin.ini").write_text(
+        """
+[duck]
+drivername = duckdb
+"""
+    )
+
+    widget = recording_widget(connect_timeout=0.1)
+    widget._handle_message(None, {"method": "connect", "data": {"name": "duck"}}, None)
+
+    # the handler returns while the connection is still being established
+    assert widget._connection_attempt.thread.is_alive()
+
+    widget._connection_attempt.timer.join()
+
+    assert widget.messages == [
+        {"method": "connecting", "message": "duck"},
+        {
+            "method": "connection_error",
+            "message": "TimeoutError: Could not connect to 'duck' after 0.1 seconds",
+        },
+    ]
+
+    slow_connect.set()
+    widget.wait_for_connection_attempt()
+
+    # the connection finished after the timeout so it's closed
+    assert ConnectionManager.connections == {}
+    assert len(widget.messages) == 2
+
+
+def test_connection_is_registered_in_the_kernel_thread(tmp_empty, recording_widget):
+    Path("jupysql-plugin.ini").write_text(
+        """
+[duck]
+drivername = duckdb
+"""
+    )
+
+    widget = recording_widget()
+
+    async def connect():
+        widget._handle_message(
+            None, {"method": "connect", "data": {"name": "duck"}}, None
+        )
+        # blocks the event loop, like a running cell
+        widget.wait_for_connection_attempt()
+
+        assert ConnectionManager.connections == {}
+        assert widget.messages == [{"method": "connecting", "message": "duck"}]
+
+        await asyncio.sleep(0)
+
+    asyncio.run(connect())
+
+    assert set(ConnectionManager.connections) == {"duck"}
+    assert widget.messages[-1] == {"method": "connected", "message": "duck"}
+
+
+def test_reports_errors_storing_the_connection(
+    tmp_empty, monkeypatch, recording_widget
+):
+    def save(*args, **kwargs):
+        raise OSError("Disk full")
+
+    monkeypatch.setattr(
+        ConnectorWidgetManager, "_save_new_section_to_config_file", save
+    )
+    widget = recording_widget()
+    widget._handle_message(
+        None,
+        {
+            "method": "submit_new_connection",
+            "data": {"connectionName": "duck", "driver": "duckdb"},
+        },
+        None,
+    )
+    widget.wait_for_connection_attempt()
+
+    assert widget.messages == [
+        {"method": "connecting", "message": "duck"},
+        {"method": "connection_error", "message": "OSError: Disk full"},
+    ]
+    # the timeout was cancelled
+    assert widget._connection_attempt.timer.finished.is_set()
+    assert ConnectionManager.connections == {}
+
+
+def test_cancel_connect(tmp_empty, slow_connect, recording_widget):
+    widget = recording_widget()
+    widget._handle_message(
+        None,
+        {
+            "method": "submit_new_connection",
+            "data": {"connectionName": "duck", "driver": "duckdb"},
+        },
+        None,
+    )
+    widget._handle_message(None, {"method": "cancel_connect"}, None)
+
+    slow_connect.set()
+    widget.wait_for_connection_attempt()
+
+    assert widget.messages == [
+        {"method": "connecting", "message": "duck"},
+        {"method": "connection_cancelled", "message": "duck"},
+    ]
+    assert ConnectionManager.connections == {}
+    assert not Path("jupysql-plugin.ini").exists()
+
+
+def test_method_check_all_connections(tmp_empty, recording_widget):
+    Path("jupysql-plugin.ini").write_text(
+        """
+[duck]
+drivername = duckdb
+
+[sqlite]
+drivername = sqlite
+"""
+    )
+
+    widget = recording_widget()
+    widget._handle_message(None, {"method": "check_all_connections"}, None)
+    widget._check_thread.join()
+
+    started, *statuses, finished = widget.messages
+
+    assert started == {
+        "method": "connection_check_started",
+        "message": ["duck", "sqlite"],
+    }
+    assert sorted(m["message"]["name"] for m in statuses) == ["duck", "sqlite"]
+    assert all(m["method"] == "connection_status" for m in statuses)
+    assert all(m["message"]["status"] == "ok" for m in statuses)
+    assert finished == {"method": "connection_check_finished"}
+
+
+def test_method_check_all_connections_reports_errors(tmp_empty, recording_widget):
+    widget = recording_widget()
+    Path("jupysql-plugin.ini").write_text("not a connections file")
+    widget._handle_message(None, {"method": "check_all_connections"}, None)
+    widget._check_thread.join()
+
+    error, finished = widget.messages
+
+    assert error["method"] == "connection_check_error"
+    assert error["message"].startswith("MissingSectionHeaderError: ")
+    assert finished == {"method": "connection_check_finished"}
+
+
+def test_sends_patches_when_connections_change(tmp_empty, testing_widget):
+    Path("jupysql-plugin.ini").write_text(
+        """
+[duck]
+drivername = duckdb
+
+[sqlite]
+drivername = sqlite
+"""
+    )
+
+    widget = testing_widget()
+    widget._handle_message(
+        None, {"method": "delete_connection", "data": {"name": "sqlite"}}, None
+    )
+    widget._handle_message(
+        None,
+        {
+            "method": "submit_new_connection",
+            "data": {"connectionName": "other", "driver": "duckdb"},
+        },
+        None,
+    )
+
+    assert [m for m in widget.messages if m["method"] == "patch_connections"] == [
+        {
+            "method": "patch_connections",
+            "message": {
+                "added": [],
+                "removed": ["sqlite"],
+                "changed": [],
+                "from_version": 0,
+                "version": 1,
+            },
+        },
+        {
+            "method": "patch_connections",
+            "message": {
+                "added": [{"driver": "duckdb", "name": "other"}],
+                "removed": [],
+                "changed": [],
+                "from_version": 1,
+                "version": 2,
+            },
+        },
+    ]
+
+
+def test_method_resync_connections(tmp_empty, testing_widget):
+    Path("jupysql-plugin.ini").write_text(
+        """
+[duck]
+drivername = duckdb
+"""
+    )
+
+    widget = testing_widget()
+    widget._handle_message(None, {"method": "resync_connections"}, None)
+
+    assert widget.messages == [
+        {
+            "method": "update_connections",
+            "message": '[{"name": "duck", "driver": "duckdb"}]',
+            "version": 1,
+            "total": 1,
+        }
+    ]
+
+
+@pytest.fixture
+def many_connections(tmp_empty):
+    sections = [f"[conn-{i}]\ndrivername = duckdb\n" for i in range(250)]
+    sections.append("[warehouse]\ndrivername = postgresql\n")
+    Path("jupysql-plugin.ini").write_text("\n".join(sections))
+
+
+def test_sends_the_first_page_of_connections_upon_init(
+    many_connections, testing_widget
+):
+    widget = testing_widget()
+
+    assert widget.connections_total == 251
+    assert len(json.loads(widget.connections)) == 100
+
+
+@pytest.mark.parametrize(
+    "data, expected_names, expected_total",
+    [
+        ({"offset": 240, "limit": 5}, [f"conn-{i}" for i in range(240, 245)], 251),
+        ({"query": "CONN-24", "offset": 5}, [f"conn-{i}" for i in range(244, 250)], 11),
+        ({"query": "postgres"}, ["warehouse"], 1),
+        ({"query": "missing"}, [], 0),
+        # the limit can't be larger than the page size
+        ({"limit": 1000}, [f"conn-{i}" for i in range(100)], 251),
+    ],
+)
+def test_method_list_connections(
+    many_connections, data, expected_names, expected_total, testing_widget
+):
+    widget = testing_widget()
+    widget._handle_message(None, {"method": "list_connections", "data": data}, None)
+
+    message = widget.messages[-1]
+
+    assert message["method"] == "connections_page"
+    assert message["message"]["offset"] == data.get("offset", 0)
+    assert message["message"]["total"] == expected_total
+    assert [c["name"] for c in message["message"]["connections"]] == expected_names
+
+
+def _server_event(version, **patch):
+    return {
+        "method": "connections_changed",
+        "data": {
+            "added": [],
+            "removed": [],
+            "changed": [],
+            **patch,
+            "from_version": version - 1,
+            "version": version,
+            "path": str(Path("jupysql-plugin.ini").resolve()),
+        },
+    }
+
+
+def test_method_connections_changed_applies_server_events(tmp_empty, testing_widget):
+    Path("jupysql-plugin.ini").write_text("[duck]\ndrivername = duckdb\n")
+    widget = testing_widget()
+
+    # the snapshot the frontend gets when it subscribes
+    snapshot = {"version": 3, "path": str(Path("jupysql-plugin.ini").resolve())}
+    widget._handle_message(
+        None, {"method": "connections_changed", "data": snapshot}, None
+    )
+
+    assert widget.messages == []
+
+    # the patch is forwarded without reading the file
+    pg = {"name": "pg", "driver": "postgresql"}
+    widget._handle_message(None, _server_event(4, added=[pg]), None)
+
+    assert widget.messages == [
+        {
+            "method": "patch_connections",
+            "message": {
+                "added": [pg],
+                "removed": [],
+                "changed": [],
+                "from_version": 0,
+                "version": 1,
+            },
+        }
+    ]
+
+    # changes made by the widget were already sent, the server reports them too
+    widget._handle_message(
+        None, {"method": "delete_connection", "data": {"name": "duck"}}, None
+    )
+    widget._handle_message(None, _server_event(5, removed=["duck"]), None)
+
+    patches = [m for m in widget.messages if m["method"] == "patch_connections"]
+
+    assert len(patches) == 2
+    assert patches[-1]["message"]["removed"] == ["duck"]
+
+
+def test_does_not_load_every_connection(
+    many_connections, monkeypatch, testing_widget
+):
+    def get_connections():
+        raise AssertionError("Every connection was loaded")
+
+    monkeypatch.setattr(
+        ConnectorWidgetManager, "get_connections_from_config_file", get_connections
+    )
+    widget = testing_widget()
+    snapshot = {"version": 3, "path": str(Path("jupysql-plugin.ini").resolve())}
+
+    for content in [
+        {"method": "connections_changed", "data": snapshot},
+        {"method": "list_connections", "data": {"query": "CONN-24", "offset": 5}},
+        {"method": "delete_connection", "data": {"name": "warehouse"}},
+        {"method": "resync_connections"},
+    ]:
+        widget._handle_message(None, content, None)
+
+    assert widget.messages[-1]["total"] == 250
+
+
+def test_method_connections_changed_resyncs_after_missed_events(
+    tmp_empty, testing_widget
+):
+    Path("jupysql-plugin.ini").write_text("[duck]\ndrivername = duckdb\n")
+    widget = testing_widget()
+    snapshot = {"version": 3, "path": str(Path("jupysql-plugin.ini").resolve())}
+    widget._handle_message(
+        None, {"method": "connections_changed", "data": snapshot}, None
+    )
+
+    Path("jupysql-plugin.ini").write_text("[sqlite]\ndrivername = sqlite\n")
+    # we missed version 4
+    widget._handle_message(None, _server_event(5), None)
+
+    assert widget.messages[-1] == {
+        "method": "update_connections",
+        "message": '[{"name": "sqlite", "driver": "sqlite"}]',
+        "version": 1,
+        "total": 1,
+    }
+
+
+def test_method_connections_changed_ignores_other_stores(tmp_empty, testing_widget):
+    Path("jupysql-plugin.ini").write_text("[duck]\ndrivername = duckdb\n")
+    widget = testing_widget()
+
+    event = _server_event(4, removed=["duck"])
+    event["data"]["path"] = str(Path("another-file.ini").resolve())
+    widget._handle_message(None, event, None)
+
+    assert widget.messages == []
+
+
+def test_method_import_connections(tmp_empty, testing_widget):
+    widget = testing_widget()
+    widget._handle_message(
+        None,
+        {
+            "method": "import_connections",
+            "data": {
+                "connections": [
+                    {"name": "duck", "driver": "duckdb"},
+                    {"name": "broken"},
+                ]
+            },
+        },
+        None,
+    )
+    widget._import_thread.join()
+
+    assert widget.messages[0] == {
+        "method": "connections_imported",
+        "message": [
+            {"name": "duck", "status": "imported"},
+            {
+                "name": "broken",
+                "status": "invalid",
+                "error": "ValueError: Missing connection key: driver",
+            },
+        ],
+    }
+    assert widget.messages[1]["method"] == "patch_connections"
+    assert widget.messages[1]["message"]["added"] == [
+        {"name": "duck", "driver": "duckdb"}
+    ]
+
+
+def test_method_import_connections_error(tmp_empty, recording_widget):
+    widget = recording_widget()
+    widget._handle_message(
+        None,
+        {"method": "import_connections", "data": {"path": "missing.ini"}},
+        None,
+    )
+    widget._import_thread.join()
+
+    assert widget.messages == [
+        {
+            "method": "import_error",
+            "message": "FileNotFoundError: missing.ini doesn't exist",
+        }
+    ]
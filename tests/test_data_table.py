@@ -0,0 +1,191 @@
+import json
+import os
+
+import duckdb
+import pytest
+from sql.connection import ConnectionManager
+
+from jupysql_plugin import table_widget
+from jupysql_plugin.spill import spill_store
+from jupysql_plugin.widgets.data_table import DataTableWidget
+
+
+class DataTableWidgetTesting(DataTableWidget):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.messages = []
+
+    def send(self, content, buffers=None):
+        self.messages.append(content)
+
+    def request(self, **data):
+        self._handle_message(self, {"method": "get_page", "data": data}, None)
+        return self.messages[-1]
+
+
+@pytest.fixture
+def orders():
+    table_widget.paginator.clear()
+
+    ConnectionManager.set("sqlite://", alias="sqlite", displaycon=False)
+    ConnectionManager.current.execute(
+        "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer VARCHAR NOT NULL, "
+        "note VARCHAR)"
+    )
+
+    for i in range(100):
+        ConnectionManager.current.execute(
+            f"INSERT INTO orders VALUES ({i}, 'c{i % 7}', NULL)"
+        )
+
+    yield
+
+    table_widget.paginator.clear()
+
+
+@pytest.fixture
+def duck(tmp_path):
+    """A DuckDB connection, every query result is spilled"""
+    ConnectionManager.set("duckdb://", alias="duck", displaycon=False)
+    spill_store.configure(directory=str(tmp_path), threshold_bytes=0, chunk_size=50)
+
+    yield
+
+    spill_store.evict_all()
+    spill_store.configure(
+        directory=None, threshold_bytes=64 * 2**20, chunk_size=10_000
+    )
+
+
+QUERY = "SELECT range AS x FROM range(1000)"
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"table": "t", "query": "SELECT 1"}])
+def test_requires_a_table_or_a_query(kwargs):
+    with pytest.raises(ValueError) as excinfo:
+        DataTableWidget(**kwargs)
+
+    assert str(excinfo.value) == "Pass either a table or a query"
+
+
+def test_filters_sorts_and_counts(orders):
+    widget = DataTableWidgetTesting("orders")
+
+    message = widget.request(
+        id=1,
+        page=1,
+        nRows=2,
+        sort=[{"column": "id", "order": "DESC"}],
+        filters=[{"column": "customer", "op": "eq", "value": "c0"}],
+        count=True,
+    )
+
+    assert message["method"] == "page"
+    assert message["request"]["id"] == 1
+    assert message["message"]["columns"] == ["id", "customer", "note"]
+    assert message["message"]["total"] == 15
+    assert json.loads(message["message"]["rows"]) == [
+        {"customer": "c0", "id": 84, "note": "None"},
+        {"customer": "c0", "id": 77, "note": "None"},
+    ]
+
+
+def test_only_counts_when_requested(orders):
+    widget = DataTableWidgetTesting("orders")
+
+    assert widget.request(id=1, page=0, nRows=2)["message"]["total"] is None
+
+
+def test_sends_errors(orders):
+    widget = DataTableWidgetTesting("orders")
+
+    message = widget.request(
+        id=1, page=0, nRows=2, filters=[{"column": "id", "op": "like", "value": 1}]
+    )
+
+    assert message == {
+        "method": "error",
+        "request": {
+            "id": 1,
+            "page": 0,
+            "nRows": 2,
+            "filters": [{"column": "id", "op": "like", "value": 1}],
+        },
+        "message": "ValueError: Unsupported filter operator: 'like'",
+    }
+
+
+def test_filters_require_sqlalchemy_connections():
+    ConnectionManager.set(duckdb.connect(), alias="native", displaycon=False)
+    ConnectionManager.current.execute("CREATE TABLE numbers AS SELECT 1 AS x")
+    widget = DataTableWidgetTesting("numbers")
+
+    message = widget.request(
+        id=1, page=0, nRows=2, filters=[{"column": "x", "op": "eq", "value": 1}]
+    )
+
+    assert message["message"] == (
+        "ValueError: Sorting by multiple columns, filtering and counting are only "
+        "supported for SQLAlchemy connections"
+    )
+
+
+def test_pages_through_queries(duck, monkeypatch):
+    widget = DataTableWidgetTesting(query=QUERY)
+
+    message = widget.request(id=1, page=3, nRows=10)
+
+    assert message["message"]["total"] == 1000
+    assert json.loads(message["message"]["rows"]) == [
+        {"x": x} for x in range(30, 40)
+    ]
+    assert widget.model_id in spill_store
+
+    # the next pages don't run the query again
+    monkeypatch.setattr(table_widget, "_store_query", None)
+    message = widget.request(id=2, page=4, nRows=2)
+
+    assert json.loads(message["message"]["rows"]) == [{"x": 8}, {"x": 9}]
+
+
+def test_keeps_query_results_in_memory_without_pyarrow(duck, monkeypatch):
+    monkeypatch.setattr(table_widget, "spill", None)
+    widget = DataTableWidgetTesting(query=QUERY)
+    key = widget.model_id
+
+    message = widget.request(id=1, page=3, nRows=10)
+
+    assert message["message"]["total"] == 1000
+    assert json.loads(message["message"]["rows"]) == [
+        {"x": x} for x in range(30, 40)
+    ]
+    assert key in table_widget.memory_store
+    assert key not in spill_store
+
+    widget.close()
+
+    assert key not in table_widget.memory_store
+
+
+def test_close_evicts_the_result(duck):
+    widget = DataTableWidgetTesting(query=QUERY)
+    key = widget.model_id
+    widget.request(id=1, page=0, nRows=10)
+    path = spill_store.get(key).path
+
+    widget.close()
+
+    assert key not in spill_store
+    assert not os.path.exists(path)
+
+
+def test_queries_cannot_be_sorted(duck):
+    widget = DataTableWidgetTesting(query=QUERY)
+
+    message = widget.request(
+        id=1, page=0, nRows=10, sort=[{"column": "x", "order": "DESC"}]
+    )
+
+    assert message["message"] == (
+        "ValueError: Sorting and filtering are only supported for tables"
+    )
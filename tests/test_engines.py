@@ -0,0 +1,116 @@
+from pathlib import Path
+
+import pytest
+from sqlalchemy.pool import QueuePool, SingletonThreadPool
+from sql.connection import ConnectionManager
+
+from jupysql_plugin.widgets import engines as engines_module
+from jupysql_plugin.widgets.connections import ConnectorWidgetManager
+from jupysql_plugin.widgets.engines import EngineRegistry, engines
+
+
+def test_get_reuses_engine():
+    registry = EngineRegistry()
+
+    engine = registry.get("duck", "duckdb://")
+
+    assert registry.get("duck", "duckdb://") is engine
+    assert len(registry) == 1
+
+
+def test_get_replaces_engine_if_connection_string_changes():
+    registry = EngineRegistry()
+
+    engine = registry.get("db", "duckdb://")
+    new_engine = registry.get("db", "sqlite://")
+
+    assert new_engine is not engine
+    assert str(new_engine.url) == "sqlite://"
+    assert len(registry) == 1
+
+
+@pytest.mark.parametrize(
+    "connection_str, pool_class, pool_size",
+    [
+        ("duckdb://", QueuePool, 3),
+        ("sqlite://", SingletonThreadPool, None),
+    ],
+)
+def test_pool_settings(tmp_empty, connection_str, pool_class, pool_size):
+    registry = EngineRegistry(pool_size=3, pool_pre_ping=False)
+
+    engine = registry.get("db", connection_str)
+
+    assert isinstance(engine.pool, pool_class)
+    assert engine.pool._pre_ping is False
+
+    if pool_size is not None:
+        assert engine.pool.size() == pool_size
+
+
+def test_evict_idle(monkeypatch):
+    now = [0]
+    monkeypatch.setattr(engines_module.time, "monotonic", lambda: now[0])
+    registry = EngineRegistry(idle_timeout=10)
+
+    registry.get("idle", "duckdb://")
+    engine_in_use = registry.get("in-use", "duckdb://")
+    connection = engine_in_use.connect()
+
+    now[0] = 11
+    registry.evict_idle()
+
+    assert "idle" not in registry
+    assert "in-use" in registry
+
+    connection.close()
+
+
+def test_configure_unknown_setting():
+    with pytest.raises(ValueError) as excinfo:
+        EngineRegistry().configure(pool_size=1, max_size=10)
+
+    assert str(excinfo.value) == "Unknown settings: max_size"
+
+
+def test_reconnecting_reuses_engine_and_connection(tmp_empty):
+    Path("jupysql-plugin.ini").write_text(
+        """
+[duck]
+drivername = duckdb
+
+[sqlite]
+drivername = sqlite
+"""
+    )
+
+    manager = ConnectorWidgetManager()
+
+    manager.connect_to_database_in_section(connection_name="duck")
+    duck = ConnectionManager.current
+    manager.connect_to_database_in_section(connection_name="sqlite")
+    manager.connect_to_database_in_section(connection_name="duck")
+
+    assert ConnectionManager.current is duck
+    assert set(ConnectionManager.connections) == {"duck", "sqlite"}
+    assert duck._connection.engine is engines.get("duck", "duckdb://")
+
+
+def test_reconnecting_after_closing(tmp_empty):
+    Path("jupysql-plugin.ini").write_text(
+        """
+[duck]
+drivername = duckdb
+"""
+    )
+
+    manager = ConnectorWidgetManager()
+
+    manager.connect_to_database_in_section(connection_name="duck")
+    engine = ConnectionManager.current._connection.engine
+    ConnectionManager.close_connection_with_descriptor("duck")
+
+    manager.connect_to_database_in_section(connection_name="duck")
+
+    assert ConnectionManager.current._connection.engine is engine
+    assert ConnectionManager.current.execute("SELECT 42").fetchall() == [(42,)]
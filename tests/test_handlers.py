@@ -0,0 +1,416 @@
+import asyncio
+import json
+import sqlite3
+from pathlib import Path
+
+import pytest
+from tornado.httpclient import HTTPClientError
+from traitlets.config import Config
+
+from jupysql_plugin import connections_file
+from jupysql_plugin.connections_index import ConnectionsIndex
+from jupysql_plugin.stores import INIConnectionStore
+
+
+@pytest.fixture
+def dsn_filename(tmp_path):
+    return Path(tmp_path, "connections.ini")
+
+
+@pytest.fixture
+def store_backend():
+    return "ini"
+
+
+@pytest.fixture
+def jp_server_config(dsn_filename, store_backend):
+    return Config(
+        {
+            "ServerApp": {
+                "jpserver_extensions": {"jupysql_plugin": True},
+            },
+            "JupySQLPlugin": {
+                "dsn_filename": str(dsn_filename),
+                "poll_interval": 0.05,
+                "store_backend": store_backend,
+            },
+        }
+    )
+
+
+async def test_list_connections(jp_fetch, dsn_filename):
+    dsn_filename.write_text(
+        """
+[duck]
+drivername = duckdb
+
+[pg]
+drivername = postgresql
+host = localhost
+"""
+    )
+
+    response = await jp_fetch("jupysql-plugin", "connections")
+
+    assert json.loads(response.body) == {
+        "connections": [
+            {"name": "duck", "driver": "duckdb"},
+            {"name": "pg", "driver": "postgresql", "host": "localhost"},
+        ]
+    }
+
+
+async def test_list_connections_missing_file(jp_fetch):
+    response = await jp_fetch("jupysql-plugin", "connections")
+    assert json.loads(response.body) == {"connections": []}
+
+
+async def test_list_connections_etag(jp_fetch, dsn_filename):
+    dsn_filename.write_text(
+        """
+[duck]
+drivername = duckdb
+"""
+    )
+
+    response = await jp_fetch("jupysql-plugin", "connections")
+    etag = response.headers["Etag"]
+
+    with pytest.raises(HTTPClientError) as excinfo:
+        await jp_fetch(
+            "jupysql-plugin", "connections", headers={"If-None-Match": etag}
+        )
+
+    assert excinfo.value.code == 304
+
+    dsn_filename.write_text(
+        """
+[duck]
+drivername = duckdb
+
+[sqlite]
+drivername = sqlite
+"""
+    )
+
+    response = await jp_fetch(
+        "jupysql-plugin", "connections", headers={"If-None-Match": etag}
+    )
+
+    assert response.headers["Etag"] != etag
+    assert len(json.loads(response.body)["connections"]) == 2
+
+
+async def test_get_connection(jp_fetch, dsn_filename):
+    dsn_filename.write_text(
+        """
+[duck]
+drivername = duckdb
+database = my.db
+"""
+    )
+
+    response = await jp_fetch("jupysql-plugin", "connections", "duck")
+
+    assert json.loads(response.body) == {
+        "name": "duck",
+        "driver": "duckdb",
+        "database": "my.db",
+    }
+
+    with pytest.raises(HTTPClientError) as excinfo:
+        await jp_fetch("jupysql-plugin", "connections", "missing")
+
+    assert excinfo.value.code == 404
+
+
+async def test_save_connection(jp_fetch, dsn_filename):
+    response = await jp_fetch(
+        "jupysql-plugin",
+        "connections",
+        "pg",
+        method="PUT",
+        body=json.dumps(
+            {"driver": "postgresql", "host": "db.corp.com", "port": 5432}
+        ),
+    )
+
+    assert json.loads(response.body) == {
+        "name": "pg",
+        "driver": "postgresql",
+        "host": "db.corp.com",
+        "port": "5432",
+    }
+    assert dsn_filename.read_text() == """\
+[pg]
+host = db.corp.com
+port = 5432
+drivername = postgresql
+
+"""
+
+
+@pytest.mark.parametrize("store_backend", ["sqlite"])
+async def test_sqlite_store_backend(jp_fetch, jp_ws_fetch, dsn_filename):
+    dsn_filename.write_text("[duck]\ndrivername = duckdb\n")
+    sqlite_path = dsn_filename.with_suffix(".sqlite")
+
+    # the connections are migrated from the connections file
+    response = await jp_fetch("jupysql-plugin", "connections")
+    assert json.loads(response.body) == {
+        "connections": [{"name": "duck", "driver": "duckdb"}]
+    }
+
+    ws = await jp_ws_fetch("jupysql-plugin", "events")
+    snapshot = await _receive(ws)
+    assert snapshot["message"]["path"] == str(sqlite_path)
+
+    await jp_fetch(
+        "jupysql-plugin",
+        "connections",
+        "pg",
+        method="PUT",
+        body=json.dumps({"driver": "postgresql", "host": "db.corp.com"}),
+    )
+    await jp_fetch("jupysql-plugin", "connections", "duck", method="DELETE")
+
+    added, removed = await _receive(ws), await _receive(ws)
+    assert added["message"]["added"] == [
+        {"name": "pg", "driver": "postgresql", "host": "db.corp.com"}
+    ]
+    assert removed["message"]["removed"] == ["duck"]
+    ws.close()
+
+    with sqlite3.connect(sqlite_path) as db:
+        names = db.execute("SELECT name FROM connections").fetchall()
+
+    assert names == [("pg",)]
+    # the connections file isn't modified
+    assert dsn_filename.read_text() == "[duck]\ndrivername = duckdb\n"
+
+
+async def test_save_connection_keeps_keys_the_request_doesnt_have(
+    jp_fetch, dsn_filename
+):
+    dsn_filename.write_text(
+        """
+[warehouse]
+drivername = postgresql
+host = db.corp.com
+credentials = env:WAREHOUSE_TOKEN
+credentials_ttl = 60
+query = {'sslmode': 'require'}
+"""
+    )
+
+    # what a client gets when reading the connection can be saved back
+    response = await jp_fetch("jupysql-plugin", "connections", "warehouse")
+    connection = json.loads(response.body)
+    connection["host"] = "db2.corp.com"
+    await jp_fetch(
+        "jupysql-plugin",
+        "connections",
+        "warehouse",
+        method="PUT",
+        body=json.dumps(connection),
+    )
+
+    # keys that aren't in the request are kept, null deletes them
+    response = await jp_fetch(
+        "jupysql-plugin",
+        "connections",
+        "warehouse",
+        method="PUT",
+        body=json.dumps(
+            {"driver": "postgresql", "host": "db2.corp.com", "credentials_ttl": None}
+        ),
+    )
+
+    assert json.loads(response.body) == {
+        "name": "warehouse",
+        "driver": "postgresql",
+        "host": "db2.corp.com",
+        "credentials": "env:WAREHOUSE_TOKEN",
+        "query": "{'sslmode': 'require'}",
+    }
+
+
+@pytest.mark.parametrize(
+    "body, message",
+    [
+        ({"host": "localhost"}, "Missing connection key: driver"),
+        ({"driver": "duckdb", "dsn": "x"}, "Unknown connection keys: dsn"),
+    ],
+)
+async def test_save_connection_invalid(jp_fetch, dsn_filename, body, message):
+    with pytest.raises(HTTPClientError) as excinfo:
+        await jp_fetch(
+            "jupysql-plugin", "connections", "db", method="PUT", body=json.dumps(body)
+        )
+
+    assert excinfo.value.code == 400
+    assert message in excinfo.value.response.body.decode()
+    assert not dsn_filename.exists()
+
+
+async def test_save_connection_if_match(jp_fetch, dsn_filename):
+    dsn_filename.write_text(
+        """
+[duck]
+drivername = duckdb
+"""
+    )
+
+    response = await jp_fetch("jupysql-plugin", "connections")
+    etag = response.headers["Etag"]
+
+    # someone else modifies the file
+    dsn_filename.write_text(
+        """
+[sqlite]
+drivername = sqlite
+"""
+    )
+
+    with pytest.raises(HTTPClientError) as excinfo:
+        await jp_fetch(
+            "jupysql-plugin",
+            "connections",
+            "duck",
+            method="PUT",
+            body=json.dumps({"driver": "duckdb", "database": "new.db"}),
+            headers={"If-Match": etag},
+        )
+
+    assert excinfo.value.code == 412
+
+
+async def test_delete_connection(jp_fetch, dsn_filename):
+    dsn_filename.write_text(
+        """
+[duck]
+drivername = duckdb
+
+[sqlite]
+drivername = sqlite
+"""
+    )
+
+    response = await jp_fetch(
+        "jupysql-plugin", "connections", "duck", method="DELETE"
+    )
+
+    assert response.code == 204
+    assert dsn_filename.read_text().strip() == "[sqlite]\ndrivername = sqlite"
+
+    with pytest.raises(HTTPClientError) as excinfo:
+        await jp_fetch("jupysql-plugin", "connections", "duck", method="DELETE")
+
+    assert excinfo.value.code == 404
+
+
+async def _receive(ws):
+    return json.loads(await asyncio.wait_for(ws.read_message(), timeout=5))
+
+
+async def test_events(jp_fetch, jp_ws_fetch, dsn_filename):
+    dsn_filename.write_text(
+        """
+[duck]
+drivername = duckdb
+"""
+    )
+
+    ws = await jp_ws_fetch("jupysql-plugin", "events")
+
+    assert await _receive(ws) == {
+        "method": "connections_snapshot",
+        "message": {"version": 0, "total": 1, "path": str(dsn_filename)},
+    }
+
+    # changes made through the API are pushed right away
+    await jp_fetch(
+        "jupysql-plugin",
+        "connections",
+        "sqlite",
+        method="PUT",
+        body=json.dumps({"driver": "sqlite"}),
+    )
+
+    assert await _receive(ws) == {
+        "method": "connections_changed",
+        "message": {
+            "added": [{"name": "sqlite", "driver": "sqlite"}],
+            "removed": [],
+            "changed": [],
+            "from_version": 0,
+            "version": 1,
+            "total": 2,
+            "path": str(dsn_filename),
+        },
+    }
+
+    # and other changes are found by the watcher
+    dsn_filename.write_text(
+        """
+[sqlite]
+drivername = sqlite
+database = my.db
+"""
+    )
+
+    message = (await _receive(ws))["message"]
+
+    assert message["removed"] == ["duck"]
+    assert message["changed"] == [
+        {"name": "sqlite", "driver": "sqlite", "database": "my.db"}
+    ]
+    assert (message["from_version"], message["version"]) == (1, 2)
+
+    ws.close()
+
+
+async def test_events_are_shared(jp_ws_fetch, dsn_filename):
+    sockets = [await jp_ws_fetch("jupysql-plugin", "events") for _ in range(3)]
+
+    for ws in sockets:
+        assert (await _receive(ws))["method"] == "connections_snapshot"
+
+    dsn_filename.write_text(
+        """
+[duck]
+drivername = duckdb
+"""
+    )
+
+    messages = [await _receive(ws) for ws in sockets]
+
+    assert all(message == messages[0] for message in messages)
+    assert messages[0]["message"]["added"] == [{"name": "duck", "driver": "duckdb"}]
+
+    for ws in sockets:
+        ws.close()
+
+
+def test_index_parses_the_file_once_per_change(dsn_filename, monkeypatch):
+    loads = []
+    load = connections_file._config_cache.load
+
+    def counting_load(path):
+        loads.append(path)
+        return load(path)
+
+    monkeypatch.setattr(connections_file._config_cache, "load", counting_load)
+    dsn_filename.write_text("[duck]\ndrivername = duckdb\n")
+    index = ConnectionsIndex(INIConnectionStore(dsn_filename))
+
+    assert [index.refresh() for _ in range(5)] == [None] * 5
+    assert len(loads) == 1
+
+    dsn_filename.write_text("[duck]\ndrivername = duckdb\n\n[sqlite]\n")
+    events = [index.refresh() for _ in range(5)]
+
+    assert len(loads) == 2
+    assert events[0]["added"] == [{"name": "sqlite"}]
+    assert events[1:] == [None] * 4
+    assert index.get_connection("sqlite") == {"name": "sqlite"}
@@ -0,0 +1,62 @@
+"""
+Import-time budget: importing the package, the widgets package, the comm
+targets and the server extension must not load the heavy dependencies and
+must stay under a fixed time budget (measured with python -X importtime in a
+fresh interpreter)
+"""
+import subprocess
+import sys
+
+import pytest
+
+# microseconds, the imports take a few milliseconds, the budget leaves room for
+# slow CI machines
+BUDGET_US = 100_000
+
+HEAVY_MODULES = {"sqlalchemy", "sql", "ipywidgets", "pyarrow", "opentelemetry"}
+
+# the server has already imported these when it loads the extension
+SERVER_MODULES = (
+    "import jupyter_server.base.handlers, jupyter_server.utils, tornado.web"
+)
+
+
+def _import_times(code):
+    """
+    Runs code in a new interpreter and returns the cumulative import time (in
+    microseconds) of each module it imported
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    times = {}
+
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+
+    return times
+
+
+@pytest.mark.parametrize(
+    "setup, module",
+    [
+        ("", "jupysql_plugin"),
+        ("", "jupysql_plugin.widgets"),
+        # the kernel has already imported IPython
+        ("import IPython", "jupysql_plugin.comm"),
+        (SERVER_MODULES, "jupysql_plugin.handlers"),
+    ],
+)
+def test_import_time(setup, module):
+    times = _import_times(f"{setup}\nimport {module}")
+
+    assert not HEAVY_MODULES & {name.split(".")[0] for name in times}
+    assert times[module] < BUDGET_US
@@ -0,0 +1,118 @@
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+    InMemorySpanExporter,
+)
+
+from jupysql_plugin.instrumentation import Instrumentation, instrumentation
+
+
+@pytest.fixture
+def enabled():
+    instrumentation.configure(enabled=True)
+    instrumentation.reset()
+    yield instrumentation
+    instrumentation.configure(enabled=False, tracer_provider=None)
+    instrumentation.reset()
+
+
+def test_disabled_records_nothing():
+    recorder = Instrumentation()
+
+    with recorder.span("operation"):
+        pass
+
+    recorder.timed("call")(lambda: None)()
+
+    assert recorder.get_stats() == {"enabled": False, "operations": {}}
+
+
+def test_records_counters_and_histograms():
+    recorder = Instrumentation(enabled=True)
+    recorder.record("operation", 3)
+    recorder.record("operation", 70, error=True)
+    recorder.record("operation", 10_000)
+
+    stats = recorder.get_stats()["operations"]["operation"]
+
+    assert stats["count"] == 3
+    assert stats["errors"] == 1
+    assert stats["total_ms"] == 10_073
+    assert stats["max_ms"] == 10_000
+    assert {k: v for k, v in stats["buckets"].items() if v} == {
+        "<=5": 1,
+        "<=100": 1,
+        "<=inf": 1,
+    }
+
+
+def test_spans_record_errors():
+    recorder = Instrumentation(enabled=True)
+
+    @recorder.timed("fails")
+    def fails():
+        raise ZeroDivisionError
+
+    with pytest.raises(ZeroDivisionError):
+        fails()
+
+    assert recorder.get_stats()["operations"]["fails"]["errors"] == 1
+
+
+def test_emits_opentelemetry_spans():
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    recorder = Instrumentation(enabled=True, tracer_provider=provider)
+
+    with recorder.span("outer", table="numbers"):
+        with recorder.span("inner"):
+            pass
+
+    inner, outer = exporter.get_finished_spans()
+
+    assert outer.name == "outer"
+    assert outer.attributes["table"] == "numbers"
+    assert inner.parent.span_id == outer.context.span_id
+
+
+def test_configure_rejects_unknown_settings():
+    with pytest.raises(ValueError) as excinfo:
+        Instrumentation().configure(exporter=None)
+
+    assert str(excinfo.value) == "Unknown settings: exporter"
+
+
+def test_get_stats_message(enabled, tmp_empty, recording_widget):
+    widget = recording_widget()
+    widget._handle_message(None, {"method": "check_config_file"}, None)
+    widget._handle_message(None, {"method": "get_stats"}, None)
+
+    operations = widget.messages[-1]["message"]["operations"]
+
+    assert widget.messages[-1]["method"] == "stats"
+    assert operations["connector_widget.check_config_file"]["count"] == 1
+    assert "connections_file.parse" in operations
+
+
+def test_unknown_methods_share_a_span_name(enabled, tmp_empty, recording_widget):
+    widget = recording_widget()
+
+    for method in ["not_a_method", ["not", "hashable"]]:
+        with pytest.raises(ValueError):
+            widget._handle_message(None, {"method": method}, None)
+
+    operations = enabled.get_stats()["operations"]
+
+    assert operations["connector_widget.unknown_method"]["count"] == 2
+    assert operations["connector_widget.unknown_method"]["errors"] == 2
+    assert not any("not_a_method" in name for name in operations)
+
+
+def test_instruments_connecting(enabled, tmp_empty):
+    from jupysql_plugin.widgets.connections import ConnectorWidgetManager
+
+    ConnectorWidgetManager().connect_to_database("duckdb://", "duck")
+
+    assert enabled.get_stats()["operations"]["connection_manager.set"]["count"] == 1
@@ -0,0 +1,183 @@
+import re
+import socket
+import time
+from pathlib import Path
+
+import pytest
+from sqlalchemy.engine import URL, make_url
+
+from jupysql_plugin.exceptions import PreflightCheckFailed
+from jupysql_plugin.widgets import preflight as preflight_module
+from jupysql_plugin.widgets.connections import ConnectorWidgetManager
+from jupysql_plugin.widgets.preflight import Preflight
+
+
+@pytest.fixture
+def listening_port():
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        yield server.getsockname()[1]
+
+
+@pytest.fixture
+def closed_port():
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        port = server.getsockname()[1]
+
+    return port
+
+
+@pytest.fixture
+def drivers_installed(monkeypatch):
+    """
+    Skips the driver check so the network checks can run with postgresql URLs
+    (psycopg2 isn't installed in the test environment)
+    """
+    monkeypatch.setattr(Preflight, "check_driver", lambda self, url: None)
+
+
+def check(url):
+    """Runs the checks and returns the check that failed (or None)"""
+    start = time.perf_counter()
+
+    try:
+        Preflight(timeout=0.5).check(make_url(url))
+    except PreflightCheckFailed as e:
+        # typos must be reported quickly
+        assert time.perf_counter() - start < 1
+        return e
+
+    return None
+
+
+def test_passes_if_port_is_open(drivers_installed, listening_port):
+    assert check(f"postgresql://127.0.0.1:{listening_port}/db") is None
+
+
+def test_closed_port(drivers_installed, closed_port):
+    error = check(f"postgresql://127.0.0.1:{closed_port}/db")
+
+    assert error.check == "tcp"
+    assert str(error) == (
+        f"Couldn't connect to 127.0.0.1:{closed_port}: the connection was "
+        "refused, is the port correct?"
+    )
+
+
+def test_host_doesnt_resolve(drivers_installed):
+    error = check("postgresql://db.example.invalid/db")
+
+    assert error.check == "dns"
+    assert "Couldn't resolve host 'db.example.invalid'" in str(error)
+
+
+def test_slow_host_is_left_to_the_driver(
+    drivers_installed, listening_port, monkeypatch
+):
+    getaddrinfo = socket.getaddrinfo
+
+    def slow_getaddrinfo(*args, **kwargs):
+        time.sleep(1)
+        return getaddrinfo(*args, **kwargs)
+
+    monkeypatch.setattr(preflight_module.socket, "getaddrinfo", slow_getaddrinfo)
+
+    # e.g., a cold DNS cache, the check gives up and the driver connects
+    assert check(f"postgresql://localhost:{listening_port}/db") is None
+
+
+def test_slow_port_is_left_to_the_driver(drivers_installed, monkeypatch):
+    def connect(self, address):
+        raise socket.timeout("timed out")
+
+    monkeypatch.setattr(preflight_module.socket.socket, "connect", connect)
+
+    # e.g., a distant database that takes longer than the timeout to answer
+    assert check("postgresql://127.0.0.1:5432/db") is None
+
+
+@pytest.mark.parametrize(
+    "url, message",
+    [
+        # the default driver is psycopg2 or psycopg depending on SQLAlchemy's version
+        ["postgresql://localhost/db", r"No module named 'psycopg2?'"],
+        ["mysql+notadriver://localhost/db", r"mysql\.notadriver"],
+        ["notadb://", "notadb"],
+    ],
+)
+def test_driver_cant_be_loaded(url, message):
+    error = check(url)
+
+    assert error.check == "driver"
+    assert str(error).startswith("Couldn't load the driver")
+    assert re.search(message, str(error))
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        "duckdb://",
+        "sqlite:///my.db",
+        # unix sockets aren't checked
+        URL.create("postgresql", host="/var/run/postgresql", database="db"),
+        # hosts that aren't network hosts
+        "snowflake://user:pw@myorg-myaccount/db",
+        "bigquery://my-project/dataset",
+        "duckdb://127.0.0.1:1/",
+    ],
+)
+def test_only_checks_the_driver_if_there_isnt_a_network_host(
+    drivers_installed, url, monkeypatch
+):
+    monkeypatch.setattr(preflight_module.socket, "getaddrinfo", None)
+
+    assert check(url) is None
+
+
+def test_disabled(closed_port):
+    checks = Preflight(enabled=False)
+
+    checks.check(make_url(f"postgresql://127.0.0.1:{closed_port}/db"))
+
+
+def test_configure():
+    checks = Preflight()
+
+    checks.configure(enabled=False, timeout=2)
+
+    assert not checks.enabled
+    assert checks.timeout == 2
+
+    with pytest.raises(ValueError, match="Unknown settings: timeout_ms"):
+        checks.configure(timeout_ms=100)
+
+
+def test_save_fails_fast_if_port_is_closed(tmp_empty, drivers_installed, closed_port):
+    start = time.perf_counter()
+
+    with pytest.raises(PreflightCheckFailed, match="connection was refused"):
+        ConnectorWidgetManager().save_connection_to_config_file_and_connect(
+            {
+                "connectionName": "pg",
+                "driver": "postgresql",
+                "host": "127.0.0.1",
+                "port": closed_port,
+            }
+        )
+
+    assert time.perf_counter() - start < 1
+    assert not Path("jupysql-plugin.ini").exists()
+
+
+def test_doesnt_check_connections_that_are_already_open(tmp_empty, monkeypatch):
+    manager = ConnectorWidgetManager()
+    urls = []
+    monkeypatch.setattr(Preflight, "check", lambda self, url: urls.append(url))
+
+    manager.connect_to_database("duckdb://", "duck")
+    manager.connect_to_database("duckdb://", "duck")
+
+    # switching back to an open connection reuses it without checking
+    assert [str(url) for url in urls] == ["duckdb://"]
@@ -0,0 +1,241 @@
+import pytest
+from sql.connection import ConnectionManager
+from sqlalchemy.engine.reflection import Inspector
+
+from jupysql_plugin.widgets import schema_browser
+from jupysql_plugin.widgets.schema_browser import SchemaBrowserWidget, SchemaInspector
+
+
+@pytest.fixture
+def sqlite():
+    ConnectionManager.set("sqlite://", alias="sqlite", displaycon=False)
+    connection = ConnectionManager.current
+
+    for i in range(120):
+        connection.execute(f"CREATE TABLE table_{i:03} (id INTEGER, name TEXT)")
+
+    connection.execute("CREATE VIEW my_view AS SELECT * FROM table_000")
+
+    yield connection
+
+    schema_browser._metadata_cache.clear()
+
+
+class SchemaBrowserWidgetTesting(SchemaBrowserWidget):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.messages = []
+
+    def send(self, content, buffers=None):
+        self.messages.append(content)
+
+
+def test_list_schemas(sqlite):
+    assert SchemaInspector().list_schemas() == {
+        "items": [{"name": "main", "default": True}],
+        "total": 1,
+        "offset": 0,
+        "limit": 50,
+    }
+
+
+def test_list_tables_is_paginated(sqlite):
+    page = SchemaInspector().list_tables("main", offset=100, limit=10)
+
+    assert page["total"] == 121
+    assert [item["name"] for item in page["items"]] == [
+        f"table_{i:03}" for i in range(99, 109)
+    ]
+
+
+def test_list_tables_search(sqlite):
+    page = SchemaInspector().list_tables("main", query="VIEW")
+
+    assert page == {
+        "items": [{"name": "my_view", "type": "view"}],
+        "total": 1,
+        "offset": 0,
+        "limit": 50,
+    }
+
+
+@pytest.fixture
+def duckdb():
+    ConnectionManager.set("duckdb://", alias="duckdb", displaycon=False)
+    connection = ConnectionManager.current
+
+    for i in range(30):
+        connection.execute(f"CREATE TABLE table_{i:03} (id INTEGER)")
+
+    connection.execute("CREATE VIEW my_view AS SELECT * FROM table_000")
+
+    yield connection
+
+    schema_browser._metadata_cache.clear()
+
+
+@pytest.fixture
+def no_inspector_tables(monkeypatch):
+    """Fails if the tables are listed with the inspector instead of paginated"""
+
+    def get_names(self, *args, **kwargs):
+        raise AssertionError("Listed every table")
+
+    monkeypatch.setattr(Inspector, "get_table_names", get_names)
+    monkeypatch.setattr(Inspector, "get_view_names", get_names)
+
+
+@pytest.mark.parametrize("fixture", ["sqlite", "duckdb"])
+def test_list_tables_is_paginated_in_the_database(
+    request, fixture, no_inspector_tables
+):
+    request.getfixturevalue(fixture)
+    inspector = SchemaInspector()
+
+    assert inspector.list_tables("main", offset=0, limit=3)["items"] == [
+        {"name": "my_view", "type": "view"},
+        {"name": "table_000", "type": "table"},
+        {"name": "table_001", "type": "table"},
+    ]
+    assert inspector.list_tables(None, query="TABLE_02", limit=5) == {
+        "items": [{"name": f"table_{i:03}", "type": "table"} for i in range(20, 25)],
+        "total": 10,
+        "offset": 0,
+        "limit": 5,
+    }
+
+
+@pytest.mark.parametrize("fixture", ["sqlite", "duckdb"])
+def test_metadata_queries_leave_no_transaction_open(request, fixture):
+    connection = request.getfixturevalue(fixture).connection_sqlalchemy
+    connection.commit()
+    inspector = SchemaInspector()
+
+    inspector.list_schemas()
+    inspector.list_tables("main", query="table")
+    inspector.list_columns("main", "table_001")
+
+    assert not connection.in_transaction()
+
+
+def test_metadata_queries_keep_the_users_transaction(sqlite):
+    connection = sqlite.connection_sqlalchemy
+    connection.commit()
+    connection.begin()
+
+    SchemaInspector().list_tables("main")
+
+    assert connection.in_transaction()
+    connection.rollback()
+
+
+def test_list_tables_search_escapes_wildcards(sqlite):
+    # unescaped, % and _ would match every table
+    assert SchemaInspector().list_tables("main", query="%")["total"] == 0
+    assert SchemaInspector().list_tables("main", query="m_")["total"] == 0
+
+
+def test_metadata_cache_drops_least_recently_used_entries():
+    cache = schema_browser._MetadataCache(max_entries=2)
+    computed = []
+
+    def get(key):
+        return cache.get("conn", key, lambda: computed.append(key) or key, ttl=60)
+
+    get("a")
+    get("b")
+    get("a")
+    get("c")
+    get("a")
+    get("b")
+
+    assert computed == ["a", "b", "c", "b"]
+
+    cache.configure(max_entries=1)
+
+    assert list(cache._entries) == [("conn", "b")]
+
+    with pytest.raises(ValueError, match="Unknown settings: size"):
+        cache.configure(size=1)
+
+
+def test_list_columns(sqlite):
+    assert SchemaInspector().list_columns("main", "table_001")["items"] == [
+        {"name": "id", "type": "INTEGER", "nullable": True},
+        {"name": "name", "type": "TEXT", "nullable": True},
+    ]
+
+
+def test_metadata_is_cached_until_refresh(sqlite):
+    inspector = SchemaInspector()
+
+    assert inspector.list_tables("main", query="new_table")["total"] == 0
+
+    sqlite.execute("CREATE TABLE new_table (x INTEGER)")
+
+    assert inspector.list_tables("main", query="new_table")["total"] == 0
+
+    inspector.refresh()
+
+    assert inspector.list_tables("main", query="new_table")["total"] == 1
+
+
+def test_metadata_expires(sqlite):
+    inspector = SchemaInspector(ttl=0)
+
+    assert inspector.list_tables("main", query="new_table")["total"] == 0
+
+    sqlite.execute("CREATE TABLE new_table (x INTEGER)")
+
+    assert inspector.list_tables("main", query="new_table")["total"] == 1
+
+
+def test_no_connection():
+    with pytest.raises(RuntimeError) as excinfo:
+        SchemaInspector().list_schemas()
+
+    assert "No active connection" in str(excinfo.value)
+
+
+def test_widget_list_tables(sqlite):
+    widget = SchemaBrowserWidgetTesting(page_size=2)
+    widget._handle_message(
+        None, {"method": "list_tables", "data": {"schema": "main"}}, None
+    )
+
+    assert widget.messages == [
+        {
+            "method": "list_tables",
+            "request": {"schema": "main"},
+            "message": {
+                "items": [
+                    {"name": "my_view", "type": "view"},
+                    {"name": "table_000", "type": "table"},
+                ],
+                "total": 121,
+                "offset": 0,
+                "limit": 2,
+            },
+        }
+    ]
+
+
+def test_widget_sends_errors():
+    widget = SchemaBrowserWidgetTesting(connection_name="missing")
+    widget._handle_message(None, {"method": "list_schemas"}, None)
+
+    assert widget.messages == [
+        {
+            "method": "error",
+            "request": {"method": "list_schemas", "data": {}},
+            "message": "RuntimeError: No active connection. Connect to a database "
+            "with %sql or the connector widget",
+        }
+    ]
+
+
+def test_widget_unknown_method():
+    with pytest.raises(ValueError) as excinfo:
+        SchemaBrowserWidgetTesting()._handle_message(None, {"method": "drop"}, None)
+
+    assert str(excinfo.value) == "Method drop is not supported"
@@ -0,0 +1,206 @@
+import datetime
+import os
+from decimal import Decimal
+
+import pytest
+
+from jupysql_plugin import spill
+from jupysql_plugin.spill import SpillStore, rows_to_batch
+
+
+class Result:
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = list(rows)
+        self.fetched = []
+
+    def keys(self):
+        return self.columns
+
+    def fetchmany(self, size):
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        self.fetched.append(len(chunk))
+        return chunk
+
+
+def _result(n):
+    return Result(["x", "name"], [(i, f"n{i}") for i in range(n)])
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SpillStore(directory=str(tmp_path), chunk_size=100)
+    yield store
+    store.evict_all()
+
+
+def test_keeps_small_results_in_memory(store, tmp_path):
+    result = store.store("widget", "SELECT 1", _result(250))
+
+    assert result.path is None
+    assert result.num_rows == 250
+    assert result.page(240, 20).to_pylist() == [
+        {"x": i, "name": f"n{i}"} for i in range(240, 250)
+    ]
+    assert not os.listdir(tmp_path)
+
+
+def test_spills_large_results(store, tmp_path):
+    store.configure(threshold_bytes=1000)
+    rows = _result(1000)
+    result = store.store("widget", "SELECT 1", rows)
+
+    # rows are fetched in chunks
+    assert rows.fetched == [100] * 10 + [0]
+    assert os.path.dirname(result.path) == str(tmp_path)
+    assert result.nbytes > 0
+    assert result.num_rows == 1000
+    assert result.page(500, 2).to_pylist() == [
+        {"x": 500, "name": "n500"},
+        {"x": 501, "name": "n501"},
+    ]
+
+
+def test_keeps_the_type_of_the_first_chunk(store):
+    store.configure(threshold_bytes=0)
+    rows = Result(["x", "y"], [(None, 1)] * 100 + [(1, None)] * 100)
+
+    result = store.store("widget", "SELECT 1", rows)
+
+    # a column with only NULLs in the first chunk is stored as text
+    assert result.page(99, 2).to_pylist() == [
+        {"x": None, "y": 1},
+        {"x": "1", "y": None},
+    ]
+
+
+@pytest.mark.parametrize("threshold_bytes", [2**20, 0], ids=["memory", "file"])
+def test_widens_columns_whose_type_changes_between_chunks(store, threshold_bytes):
+    store.configure(threshold_bytes=threshold_bytes)
+    rows = Result(
+        ["x", "y"],
+        [(i, i) for i in range(100)]
+        + [(i + 0.5, None) for i in range(100)]
+        + [(None, 2**64 + i) for i in range(100)],
+    )
+
+    result = store.store("widget", "SELECT 1", rows)
+
+    assert result.num_rows == 300
+    # integers followed by floats are stored as floats, integers that don't fit
+    # in 64 bits are stored as text
+    assert result.page(99, 2).to_pylist() == [
+        {"x": 99.0, "y": "99"},
+        {"x": 0.5, "y": None},
+    ]
+    assert result.page(299, 1).to_pylist() == [{"x": None, "y": str(2**64 + 99)}]
+
+
+@pytest.mark.parametrize("threshold_bytes", [2**20, 0], ids=["memory", "file"])
+def test_casts_chunks_that_fit_the_widened_type(store, monkeypatch, threshold_bytes):
+    store.configure(threshold_bytes=threshold_bytes)
+    calls = []
+    unify_batches = spill.unify_batches
+
+    def unify(batches):
+        calls.append(len(batches))
+        return unify_batches(batches)
+
+    monkeypatch.setattr(spill, "unify_batches", unify)
+    rows = Result(
+        ["x"],
+        [(i,) for i in range(100)]
+        + [(i + 0.5,) for i in range(100)]
+        + [(i,) for i in range(5000)],
+    )
+
+    result = store.store("widget", "SELECT 1", rows)
+
+    # only the chunk with floats widens the column, later chunks are cast
+    assert len(calls) == 1
+    assert result.num_rows == 5200
+    assert result.page(5199, 1).to_pylist() == [{"x": 4999.0}]
+
+
+def test_stores_empty_results(store):
+    result = store.store("widget", "SELECT 1", Result(["x"], []))
+
+    assert result.num_rows == 0
+    assert result.page(0, 10).column_names == ["x"]
+
+
+def test_replaces_and_evicts_results(store):
+    store.configure(threshold_bytes=0)
+    first = store.store("widget", "SELECT 1", _result(10))
+    second = store.store("widget", "SELECT 2", _result(10))
+
+    assert not os.path.exists(first.path)
+    assert store.get("widget") is second
+
+    store.evict("widget")
+
+    assert "widget" not in store
+    assert not os.path.exists(second.path)
+
+
+def test_deletes_the_least_recently_used_files(store):
+    store.configure(threshold_bytes=0)
+    first = store.store("first", "SELECT 1", _result(100))
+    second = store.store("second", "SELECT 1", _result(100))
+    store.configure(disk_budget=first.nbytes + second.nbytes)
+
+    store.get("first")
+    third = store.store("third", "SELECT 1", _result(100))
+
+    assert len(store) == 2
+    assert "second" not in store
+    assert not os.path.exists(second.path)
+    assert os.path.exists(first.path)
+    assert os.path.exists(third.path)
+
+
+def test_deletes_the_least_recently_used_results_in_memory(store):
+    first = store.store("first", "SELECT 1", _result(100))
+    second = store.store("second", "SELECT 1", _result(100))
+    store.configure(memory_budget=first.memory_nbytes + second.memory_nbytes)
+
+    store.get("first")
+    store.store("third", "SELECT 1", _result(100))
+
+    assert second.memory_nbytes == 0
+    assert set(store._results) == {"first", "third"}
+
+
+def test_keeps_at_most_max_results(store):
+    store.configure(max_results=2)
+
+    for i in range(5):
+        store.store(f"widget-{i}", "SELECT 1", _result(10))
+
+    assert set(store._results) == {"widget-3", "widget-4"}
+
+
+def test_configure_rejects_unknown_settings(store):
+    with pytest.raises(ValueError) as excinfo:
+        store.configure(threshold=1)
+
+    assert str(excinfo.value) == "Unknown settings: threshold"
+
+
+def test_rows_to_batch_formats_other_types_as_strings():
+    rows = [
+        (1, Decimal("1.50"), datetime.date(2023, 1, 2), None, True),
+        (None, None, None, "a", False),
+    ]
+    columns = ["int", "decimal", "date", "mixed", "bool"]
+
+    assert rows_to_batch(rows, columns).to_pylist() == [
+        {
+            "int": 1,
+            "decimal": "1.50",
+            "date": "2023-01-02",
+            "mixed": None,
+            "bool": True,
+        },
+        {"int": None, "decimal": None, "date": None, "mixed": "a", "bool": False},
+    ]
@@ -0,0 +1,398 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+from IPython.core.error import UsageError
+from sql.connection import ConnectionManager
+
+from jupysql_plugin import connections_file, exceptions
+from jupysql_plugin.connections_file import _apply_patch, _diff_connections
+from jupysql_plugin.stores import (
+    ConnectionStore,
+    INIConnectionStore,
+    SQLiteConnectionStore,
+    StoreRegistry,
+    stores,
+)
+from jupysql_plugin.widgets import connections
+
+INI = """
+[duck]
+drivername = duckdb
+database = :memory:
+
+[lite]
+drivername = sqlite
+database = my.db
+"""
+
+
+@pytest.fixture(params=["ini", "sqlite"])
+def store(request, tmp_empty):
+    if request.param == "ini":
+        yield INIConnectionStore("jupysql-plugin.ini")
+    else:
+        store = SQLiteConnectionStore("jupysql-plugin.sqlite")
+        yield store
+        store.close()
+
+
+@pytest.fixture
+def sqlite_backend(tmp_empty):
+    stores.configure(backend="sqlite")
+    yield
+    stores.close_all()
+    stores.configure(backend="ini", sqlite_path=None)
+
+
+def test_store_interface(store):
+    assert not store.exists()
+    assert store.get_connections() == []
+    assert store.get_connection("duck") is None
+
+    store.save("duck", {"drivername": "duckdb", "database": ":memory:"})
+    store.save("lite", {"drivername": "sqlite", "database": "my.db"})
+
+    assert store.exists()
+    assert store.has_connection("duck")
+    assert not store.has_connection("missing")
+    assert store.get_names() == ["duck", "lite"]
+    assert store.get_section("lite") == {"drivername": "sqlite", "database": "my.db"}
+    assert store.get_connection("duck") == {
+        "database": ":memory:",
+        "name": "duck",
+        "driver": "duckdb",
+    }
+    assert store.get_connections() == [
+        {"database": ":memory:", "name": "duck", "driver": "duckdb"},
+        {"database": "my.db", "name": "lite", "driver": "sqlite"},
+    ]
+
+    store.delete("duck")
+
+    assert store.get_names() == ["lite"]
+
+
+def test_store_rejects_duplicated_names(store):
+    store.save("duck", {"drivername": "duckdb"})
+    store.save("lite", {"drivername": "sqlite"})
+
+    with pytest.raises(exceptions.ConnectionWithNameAlreadyExists):
+        store.save("duck", {"drivername": "sqlite"})
+
+    with pytest.raises(exceptions.ConnectionWithNameAlreadyExists):
+        store.save("duck", {"drivername": "sqlite"}, replace="lite")
+
+    assert store.get_section("duck") == {"drivername": "duckdb"}
+    assert store.get_section("lite") == {"drivername": "sqlite"}
+
+
+def test_store_replaces_connections(store):
+    store.save("duck", {"drivername": "duckdb"})
+    state = store.get_state()
+
+    store.save("duck", {"drivername": "duckdb", "database": "a.db"}, replace="duck")
+    store.save("renamed", {"drivername": "duckdb"}, replace="duck")
+
+    assert store.get_state() != state
+    assert store.get_names() == ["renamed"]
+    assert store.get_section("renamed") == {"drivername": "duckdb"}
+
+
+def test_store_keeps_the_order_of_edited_connections(store):
+    for name in ["a", "b", "c"]:
+        store.save(name, {"drivername": "duckdb"})
+
+    old = store.get_connections()
+    store.save("a", {"drivername": "duckdb", "database": "a.db"}, replace="a")
+    new = store.get_connections()
+
+    assert store.get_names() == ["a", "b", "c"]
+    assert _apply_patch(old, _diff_connections(old, new)) == new
+
+    store.save("renamed", {"drivername": "duckdb"}, replace="b")
+    newer = store.get_connections()
+
+    assert store.get_names() == ["a", "c", "renamed"]
+    assert _apply_patch(new, _diff_connections(new, newer)) == newer
+
+
+def test_store_credentials_provider(store):
+    section = {"drivername": "postgresql", "credentials": "env:TOKEN"}
+
+    store.save("pg", section)
+    store.save_many({"duck": {"drivername": "duckdb", "credentials_ttl": "60"}})
+
+    assert store.get_section("pg") == section
+    assert store.get_connection("duck") == {
+        "name": "duck",
+        "driver": "duckdb",
+        "credentials_ttl": "60",
+    }
+    assert store.list_connections()[0] == store.get_connections()
+
+    store.save("pg", {"drivername": "postgresql"}, replace="pg")
+    store.delete("duck")
+
+    assert store.get_connections() == [{"name": "pg", "driver": "postgresql"}]
+
+
+def test_ini_store_keeps_credentials_provider_in_a_separate_file(tmp_empty):
+    store = INIConnectionStore("jupysql-plugin.ini")
+    store.save("pg", {"drivername": "postgresql", "credentials": "env:TOKEN"})
+    state = store.get_state()
+
+    # JupySQL passes every key in the connections file to URL.create
+    assert "credentials" not in Path("jupysql-plugin.ini").read_text()
+    assert "env:TOKEN" in Path("jupysql-plugin.credentials.ini").read_text()
+
+    store.save(
+        "pg", {"drivername": "postgresql", "credentials": "env:NEW"}, replace="pg"
+    )
+
+    assert store.get_state() != state
+    assert store.get_section("pg")["credentials"] == "env:NEW"
+
+
+def test_ini_store_writes_the_credentials_file_first(tmp_empty, monkeypatch):
+    store = INIConnectionStore("jupysql-plugin.ini")
+    replace = connections_file._replace_config_file
+    writes = []
+
+    def replace_config_file(path, config):
+        writes.append(path.name)
+        replace(path, config)
+
+    monkeypatch.setattr(connections_file, "_replace_config_file", replace_config_file)
+
+    store.save("pg", {"drivername": "postgresql", "credentials": "env:TOKEN"})
+    store.save("renamed", {"drivername": "postgresql"}, replace="pg")
+
+    # providers are added before their connection and removed after it
+    assert writes == [
+        "jupysql-plugin.credentials.ini",
+        "jupysql-plugin.ini",
+        "jupysql-plugin.ini",
+        "jupysql-plugin.credentials.ini",
+    ]
+    assert store.get_section("renamed") == {"drivername": "postgresql"}
+
+
+def test_ini_store_removes_orphaned_credentials(tmp_empty, monkeypatch):
+    store = INIConnectionStore("jupysql-plugin.ini")
+    store.save("duck", {"drivername": "duckdb"})
+    replace = connections_file._replace_config_file
+
+    def replace_config_file(path, config):
+        if path.name == "jupysql-plugin.ini":
+            raise OSError("Disk full")
+
+        replace(path, config)
+
+    # the connections file can't be written after the provider was
+    monkeypatch.setattr(connections_file, "_replace_config_file", replace_config_file)
+
+    with pytest.raises(OSError):
+        store.save("pg", {"drivername": "postgresql", "credentials": "env:TOKEN"})
+
+    monkeypatch.undo()
+
+    assert "env:TOKEN" in Path("jupysql-plugin.credentials.ini").read_text()
+    assert store.get_connections() == [{"name": "duck", "driver": "duckdb"}]
+    assert "env:TOKEN" not in Path("jupysql-plugin.credentials.ini").read_text()
+
+    # a connection with the same name doesn't get the orphaned provider
+    Path("jupysql-plugin.ini").write_text("[pg]\ndrivername = postgresql\n")
+
+    assert store.get_section("pg") == {"drivername": "postgresql"}
+
+
+def test_store_list_connections(store):
+    for i in range(5):
+        store.save(f"duck_{i}", {"drivername": "duckdb"})
+        store.save(f"lite_{i}", {"drivername": "sqlite"})
+
+    connections, total = store.list_connections("DUCK", offset=1, limit=2)
+
+    assert total == 5
+    assert [c["name"] for c in connections] == ["duck_1", "duck_2"]
+
+    connections, total = store.list_connections("sqlite", limit=100)
+
+    assert total == 5
+    assert {c["driver"] for c in connections} == {"sqlite"}
+
+    assert store.list_connections("%", limit=100) == ([], 0)
+    assert store.list_connections(limit=3)[1] == 10
+
+
+def test_sqlite_store_migrates_connections_file(tmp_empty):
+    Path("jupysql-plugin.ini").write_text(INI)
+
+    store = SQLiteConnectionStore("db.sqlite", migrate_from="jupysql-plugin.ini")
+
+    assert store.get_connections() == [
+        {"database": ":memory:", "name": "duck", "driver": "duckdb"},
+        {"database": "my.db", "name": "lite", "driver": "sqlite"},
+    ]
+
+    store.delete("duck")
+    store.close()
+
+    # the connections are only migrated once
+    store = SQLiteConnectionStore("db.sqlite", migrate_from="jupysql-plugin.ini")
+
+    assert store.get_names() == ["lite"]
+    store.close()
+
+
+def test_sqlite_store_uses_indexes(tmp_empty):
+    store = SQLiteConnectionStore("db.sqlite")
+    store.save("duck", {"drivername": "duckdb"})
+    store.close()
+
+    db = sqlite3.connect("db.sqlite")
+
+    def plan(sql):
+        return " ".join(row[-1] for row in db.execute(f"EXPLAIN QUERY PLAN {sql}"))
+
+    assert "USING INDEX" in plan("SELECT * FROM connections WHERE name = 'duck'")
+    assert "USING INDEX connections_driver" in plan(
+        "SELECT * FROM connections WHERE driver = 'duckdb'"
+    )
+
+    db.close()
+
+
+def test_sqlite_store_rolls_back_failed_updates(tmp_empty):
+    store = SQLiteConnectionStore("db.sqlite")
+    store.save("duck", {"drivername": "duckdb"})
+    state = store.get_state()
+
+    with pytest.raises(ValueError):
+        with store._transaction() as db:
+            db.execute("DELETE FROM connections")
+            raise ValueError
+
+    assert store.get_names() == ["duck"]
+    assert store.get_state() == state
+    store.close()
+
+
+def test_store_registry(tmp_empty):
+    registry = StoreRegistry()
+
+    assert isinstance(registry.get("jupysql-plugin.ini"), INIConnectionStore)
+
+    registry.configure(backend="sqlite")
+    store = registry.get("jupysql-plugin.ini")
+
+    assert isinstance(store, SQLiteConnectionStore)
+    assert store.path == str(Path("jupysql-plugin.sqlite").resolve())
+    assert registry.get("jupysql-plugin.ini") is store
+
+    registry.configure(sqlite_path="other.sqlite")
+
+    assert registry.get("jupysql-plugin.ini").path == str(
+        Path("other.sqlite").resolve()
+    )
+
+    registry.close_all()
+
+
+@pytest.mark.parametrize(
+    "settings, message",
+    [
+        ({"backend": "yaml"}, "Unknown backend: 'yaml'"),
+        ({"path": "db.sqlite"}, "Unknown settings: path"),
+    ],
+)
+def test_store_registry_validates_settings(settings, message):
+    with pytest.raises(ValueError, match=message):
+        StoreRegistry().configure(**settings)
+
+
+def test_manager_with_sqlite_backend(sqlite_backend):
+    Path("jupysql-plugin.ini").write_text(INI)
+    manager = connections.ConnectorWidgetManager()
+
+    assert [c["name"] for c in manager.get_connections_from_config_file()] == [
+        "duck",
+        "lite",
+    ]
+
+    manager.connect_to_database_in_section(connection_name="duck")
+    manager.save_connection_to_config_file_and_connect(
+        {"driver": "duckdb", "connectionName": "another", "database": ":memory:"}
+    )
+    manager.delete_section_with_name("lite")
+
+    assert set(ConnectionManager.connections) == {"duck", "another"}
+    assert manager._get_store().get_names() == ["duck", "another"]
+    assert manager.list_connections("another")["total"] == 1
+    # the connections file isn't modified
+    assert Path("jupysql-plugin.ini").read_text() == INI
+
+
+@pytest.mark.parametrize(
+    "section, message",
+    [
+        [
+            None,
+            "The connection 'pg' does not exist in the connections database "
+            "'{path}'",
+        ],
+        [
+            {"drivername": "postgresql", "query": "[1]"},
+            "The connection 'pg' in the connections database '{path}' is invalid. "
+            "Invalid connection: TypeError: ",
+        ],
+    ],
+    ids=["missing", "invalid"],
+)
+def test_manager_errors_refer_to_the_sqlite_store(sqlite_backend, section, message):
+    manager = connections.ConnectorWidgetManager()
+    store = manager._get_store()
+
+    if section is not None:
+        store.save("pg", section)
+
+    with pytest.raises(UsageError) as excinfo:
+        manager.connect_to_database_in_section(connection_name="pg")
+
+    # jupysql's errors would send users to the connections file
+    assert str(excinfo.value).startswith(message.format(path=store.path))
+
+
+def test_manager_uses_events_about_the_sqlite_store(sqlite_backend):
+    manager = connections.ConnectorWidgetManager()
+
+    assert manager.is_connections_store("jupysql-plugin.sqlite")
+    assert not manager.is_connections_store("jupysql-plugin.ini")
+
+
+def test_store_interface_is_abstract():
+    class Incomplete(ConnectionStore):
+        def exists(self):
+            return False
+
+    with pytest.raises(TypeError, match="abstract"):
+        Incomplete()
+
+
+def test_store_save_many(store):
+    store.save("duck", {"drivername": "duckdb"})
+    state = store.get_state()
+
+    skipped = store.save_many(
+        {"duck": {"drivername": "sqlite"}, "lite": {"drivername": "sqlite"}}
+    )
+
+    assert skipped == ["duck"]
+    assert store.get_state() != state
+    assert store.get_names() == ["duck", "lite"]
+    assert store.get_section("duck") == {"drivername": "duckdb"}
+
+    assert store.save_many({"duck": {"drivername": "sqlite"}}, overwrite=True) == []
+    assert store.get_names() == ["duck", "lite"]
+    assert store.get_section("duck") == {"drivername": "sqlite"}
@@ -0,0 +1,280 @@
+import datetime
+import json
+
+import sqlalchemy
+import pytest
+from sql.connection import ConnectionManager
+
+from jupysql_plugin import table_widget
+
+
+@pytest.fixture
+def numbers():
+    ConnectionManager.set("duckdb://", alias="duck", displaycon=False)
+    ConnectionManager.current.execute(
+        "CREATE TABLE numbers AS SELECT range AS x, 'n' || range AS name "
+        "FROM range(25)"
+    )
+
+
+def test_sends_pages_as_json(numbers, comm):
+    data, buffers = comm.request({"id": 3, "table": "numbers", "page": 2, "nRows": 10})
+
+    assert buffers is None
+    assert data.keys() == {"id", "rows"}
+    assert data["id"] == 3
+    assert json.loads(data["rows"]) == [
+        {"x": x, "name": f"n{x}"} for x in range(20, 25)
+    ]
+
+
+def test_sorts_pages(numbers, comm):
+    data, _ = comm.request(
+        {
+            "id": 1,
+            "table": "numbers",
+            "page": 0,
+            "nRows": 2,
+            "sort": {"column": "x", "order": "DESC"},
+        }
+    )
+
+    assert json.loads(data["rows"]) == [
+        {"x": 24, "name": "n24"},
+        {"x": 23, "name": "n23"},
+    ]
+
+
+def test_sends_errors(comm):
+    ConnectionManager.set("duckdb://", alias="duck", displaycon=False)
+
+    data, buffers = comm.request({"id": 7, "table": "missing", "page": 0, "nRows": 1})
+
+    assert data["id"] == 7
+    assert data["error"] == (
+        "UsageError: There is no table with name 'missing' in the default schema"
+    )
+
+
+@pytest.fixture
+def orders():
+    table_widget.paginator.clear()
+
+    # duckdb-engine doesn't reflect primary keys
+    ConnectionManager.set("sqlite://", alias="sqlite", displaycon=False)
+    ConnectionManager.current.execute(
+        "CREATE TABLE orders (id INTEGER PRIMARY KEY, customer VARCHAR NOT NULL, "
+        "note VARCHAR)"
+    )
+
+    for i in range(100):
+        ConnectionManager.current.execute(
+            f"INSERT INTO orders VALUES ({i}, 'c{i % 7}', NULL)"
+        )
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, *args):
+        # only keep the queries that fetch rows
+        if "LIMIT" in statement.upper():
+            statements.append((statement.upper(), parameters))
+
+    engine = ConnectionManager.current.connection_sqlalchemy.engine
+    sqlalchemy.event.listen(engine, "before_cursor_execute", before_cursor_execute)
+
+    yield statements
+
+    sqlalchemy.event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    table_widget.paginator.clear()
+
+
+def _get_ids(page, n_rows=10, sort=None):
+    rows, columns = table_widget.get_page(
+        {"table": "orders", "page": page, "nRows": n_rows, "sort": sort}
+    )
+    return [row[list(columns).index("id")] for row in rows]
+
+
+def test_keyset_pagination_seeks_from_the_previous_page(orders):
+    assert _get_ids(0) == list(range(10))
+    assert _get_ids(1) == list(range(10, 20))
+
+    orders.clear()
+
+    assert _get_ids(2) == list(range(20, 30))
+    statement, parameters = orders[0]
+
+    # SQLite always renders the offset
+    assert "WHERE" in statement
+    assert parameters[-2:] == (10, 0)
+
+
+def test_keyset_pagination_skips_from_the_closest_page(orders):
+    _get_ids(0)
+    orders.clear()
+
+    assert _get_ids(3) == list(range(30, 40))
+
+    statement, parameters = orders[0]
+
+    assert "WHERE" in statement
+    assert parameters[-2:] == (10, 20)
+
+
+def test_get_page_does_not_leave_a_transaction_open(orders):
+    connection = ConnectionManager.current.connection_sqlalchemy
+
+    if connection.in_transaction():
+        connection.commit()
+
+    # the table isn't cached so it's reflected
+    assert _get_ids(0) == list(range(10))
+    assert not connection.in_transaction()
+
+
+@pytest.mark.parametrize("order", ["ASC", "DESC"])
+def test_keyset_pagination_with_sort_column(orders, order):
+    sort = {"column": "customer", "order": order}
+    ids = sorted(range(100), key=lambda i: (f"c{i % 7}", i), reverse=order == "DESC")
+
+    # pages in order, then jumping back and forth
+    for page in [0, 1, 2, 5, 4, 9, 10]:
+        assert _get_ids(page, sort=sort) == ids[page * 10 : page * 10 + 10]
+
+
+def test_falls_back_to_offset_if_sort_column_is_nullable(orders):
+    sort = {"column": "note", "order": "ASC"}
+    _get_ids(0, sort=sort)
+    orders.clear()
+
+    _get_ids(1, sort=sort)
+
+    statement, parameters = orders[0]
+
+    assert "WHERE" not in statement
+    assert parameters[-2:] == (10, 10)
+
+
+def test_falls_back_to_offset_without_primary_key(numbers):
+    rows, _ = table_widget.get_page({"table": "numbers", "page": 1, "nRows": 10})
+
+    assert [row[0] for row in rows] == list(range(10, 20))
+
+
+@pytest.mark.parametrize(
+    "filters, expected",
+    [
+        ([{"column": "id", "op": "lt", "value": 3}], [0, 1, 2]),
+        ([{"column": "id", "op": "in", "value": [5, 50]}], [5, 50]),
+        (
+            [
+                {"column": "customer", "op": "eq", "value": "c3"},
+                {"column": "id", "op": "ge", "value": 80},
+            ],
+            [80, 87, 94],
+        ),
+        ([{"column": "id", "op": "endswith", "value": "99"}], [99]),
+        ([{"column": "customer", "op": "contains", "value": "%"}], []),
+        ([{"column": "note", "op": "not_null"}], []),
+    ],
+)
+def test_filters(orders, filters, expected):
+    rows, columns = table_widget.get_page(
+        {"table": "orders", "page": 0, "nRows": 100, "filters": filters}
+    )
+
+    assert [row[0] for row in rows] == expected
+
+
+def test_filter_values_are_bound_parameters(orders):
+    value = "c1' OR '1'='1"
+
+    rows, _ = table_widget.get_page(
+        {
+            "table": "orders",
+            "page": 0,
+            "nRows": 100,
+            "filters": [{"column": "customer", "op": "eq", "value": value}],
+        }
+    )
+
+    assert rows == []
+    assert value not in orders[0][0]
+
+
+def test_filters_and_keyset_pagination(orders):
+    filters = [{"column": "customer", "op": "eq", "value": "c0"}]
+    sort = {"column": "id", "order": "DESC"}
+    ids = [i for i in range(100) if i % 7 == 0][::-1]
+
+    pages = [
+        table_widget.get_page(
+            {
+                "table": "orders",
+                "page": page,
+                "nRows": 5,
+                "sort": sort,
+                "filters": filters,
+            }
+        )[0]
+        for page in range(3)
+    ]
+
+    assert [[row[0] for row in rows] for rows in pages] == [
+        ids[:5],
+        ids[5:10],
+        ids[10:15],
+    ]
+    assert "WHERE" in orders[-1][0]
+
+
+def test_sort_by_multiple_columns(orders):
+    rows, _ = table_widget.get_page(
+        {
+            "table": "orders",
+            "page": 0,
+            "nRows": 3,
+            "sort": [
+                {"column": "customer", "order": "DESC"},
+                {"column": "id", "order": "DESC"},
+            ],
+        }
+    )
+
+    assert [row[0] for row in rows] == [97, 90, 83]
+
+
+def test_filter_dates():
+    ConnectionManager.set("sqlite://", alias="sqlite", displaycon=False)
+    ConnectionManager.current.execute("CREATE TABLE events (id INTEGER, day DATE)")
+    ConnectionManager.current.execute(
+        "INSERT INTO events VALUES (1, '2023-01-01'), (2, '2023-06-01')"
+    )
+
+    rows, _ = table_widget.get_page(
+        {
+            "table": "events",
+            "page": 0,
+            "nRows": 10,
+            "filters": [{"column": "day", "op": "gt", "value": "2023-03-01"}],
+        }
+    )
+
+    assert rows == [(2, datetime.date(2023, 6, 1))]
+
+
+def test_invalid_sort_column(orders, comm):
+    data, _ = comm.request(
+        {
+            "id": 1,
+            "table": "orders",
+            "page": 0,
+            "nRows": 2,
+            "sort": {"column": "missing", "order": "ASC"},
+        }
+    )
+
+    assert data == {
+        "id": 1,
+        "error": "ValueError: Table 'orders' has no column 'missing'",
+    }